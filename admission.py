@@ -0,0 +1,164 @@
+"""
+Admission Control for the Prediction Endpoints
+Caps the requests handled at once, lets a few more wait briefly and turns
+the rest away immediately with 429 Too Many Requests
+"""
+
+import asyncio
+from collections import deque
+import time
+
+REJECTED_BODY = b'{"detail":"Server is overloaded, retry later"}'
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue
+
+    Up to `limit` requests run at once. Up to `queue_size` more wait for a
+    free slot, each for at most `queue_timeout` seconds; a request finding
+    the queue full, or still waiting at its deadline, is rejected.
+
+    With a `target_latency` (seconds) the limit adapts AIMD-style: each
+    request finishing within the target while the limit is fully used
+    adds 1/limit, one finishing later multiplies it by `backoff` (at most
+    once per target_latency), within [min_limit, max_limit].
+    """
+
+    def __init__(self, limit, queue_size=0, queue_timeout=0.1, target_latency=0.0,
+                 min_limit=1, max_limit=None, backoff=0.9):
+        self.limit = float(limit)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0}
+
+    async def acquire(self):
+        """
+        Wait for a slot
+
+        Returns None once admitted, who must then call release(), or the
+        reason ("queue_full" or "queue_timeout") the request was rejected.
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            self.rejected["queue_full"] += 1
+            return "queue_full"
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        expiry = loop.call_later(self.queue_timeout, self._expire, future)
+        try:
+            admitted = await future
+        except asyncio.CancelledError:
+            # The client went away; give back a slot handed over meanwhile
+            # (an expired wait resolves to False and holds none)
+            if future.done() and not future.cancelled() and future.result():
+                self.release()
+            else:
+                self._discard(future)
+            raise
+        finally:
+            expiry.cancel()
+
+        if not admitted:
+            self.rejected["queue_timeout"] += 1
+            return "queue_timeout"
+        self.admitted += 1
+        return None
+
+    def release(self, latency=None):
+        """Free a slot, passing it to the longest-waiting request"""
+        if self.target_latency and latency is not None:
+            self._adapt(latency)
+
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(True)
+
+    def _adapt(self, latency):
+        if latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target_latency:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self.in_flight >= int(self.limit):
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _expire(self, future):
+        if not future.done():
+            self._discard(future)
+            future.set_result(False)
+
+    def _discard(self, future):
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def stats(self):
+        """Current limit and load, and admitted, queued and shed counters"""
+        return {
+            "limit": int(self.limit),
+            "adaptive": bool(self.target_latency),
+            "queue_size": self.queue_size,
+            "queue_timeout_ms": round(self.queue_timeout * 1000, 3),
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": sum(self.rejected.values()),
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting HTTP requests through an AdmissionController
+
+    Only requests for which `admits(scope)` is true are limited. Rejected
+    requests get 429 with a Retry-After header without reaching the app.
+    """
+
+    def __init__(self, app, controller, admits, retry_after=1):
+        self.app = app
+        self.controller = controller
+        self.admits = admits
+        self.headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(REJECTED_BODY)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.admits(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if await self.controller.acquire() is not None:
+            await send({"type": "http.response.start", "status": 429, "headers": self.headers})
+            await send({"type": "http.response.body", "body": REJECTED_BODY})
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - start)
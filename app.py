@@ -1,32 +1,169 @@
-
 """
 IRIS Classifier API
 Week 6 - Docker & Kubernetes Deployment
 """
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import joblib
+from fastapi import (
+    Depends, FastAPI, Header, HTTPException, Query, Request, Response, WebSocket,
+    WebSocketDisconnect
+)
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from starlette.routing import Match
+import anyio
+from pydantic import BaseModel, ValidationError
 import numpy as np
-from typing import List
+from typing import List, Literal
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+from json import JSONDecodeError
 import os
 
+from admission import AdmissionController, AdmissionMiddleware
+from metrics import (
+    CONTENT_TYPE as METRICS_MEDIA_TYPE, NULL_TIMER,
+    Counter, Gauge, Histogram, MetricsMiddleware, MetricsRegistry, StageTimer
+)
+from micro_batching import MicroBatcher
+from model_registry import ModelRegistry
+from model_reload import ModelReloader
+from prediction_cache import PredictionCache
+from profiler import profile_for
+from serialization import (
+    BINARY_MEDIA_TYPE, JSON_MEDIA_TYPE, NDJSON_MEDIA_TYPE,
+    compress, decode_features, dumps, encode_json, encode_predictions, feature_values,
+    loads, parse_ndjson_row
+)
+from tree_engine import build_engine
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Load and warm up the model before the server accepts connections
+
+    uvicorn only starts listening once startup here has finished, so a new
+    pod never passes its readiness probe with a cold model.
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    
+    # A pre-fork master (prefork.py) has already loaded it for its workers
+    if engine is None:
+        try:
+            loaded = await reload_model()
+            source = "compiled tree" if reloader.compiled else "joblib"
+            print(f"✅ Model loaded from {MODEL_PATH} ({type(loaded.engine).__name__}, "
+                  f"{source}, {loaded.load_seconds * 1000:.1f} ms)")
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+    
+    watcher = None
+    if MODEL_WATCH_INTERVAL > 0:
+        watcher = asyncio.get_running_loop().create_task(watch_model_file())
+    
+    yield
+    
+    if watcher is not None:
+        watcher.cancel()
+    if batcher is not None:
+        await batcher.stop()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="IRIS Classifier API",
     description="Predict iris species using trained ML model",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Load model
 MODEL_PATH = os.getenv("MODEL_PATH", "models/iris_model.joblib")
 
-try:
-    model = joblib.load(MODEL_PATH)
-    print(f"✅ Model loaded from {MODEL_PATH}")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    model = None
+# Trees at least LOOKUP_MIN_DEPTH deep whose decision-region grid fits in
+# LOOKUP_MAX_CELLS cells are served from a precomputed lookup table;
+# LOOKUP_MAX_CELLS=0 always walks the tree
+LOOKUP_MAX_CELLS = int(os.getenv("LOOKUP_MAX_CELLS", "262144"))
+LOOKUP_MIN_DEPTH = int(os.getenv("LOOKUP_MIN_DEPTH", "12"))
+
+# Maximum number of rows scored per model call in batch endpoints
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "1024"))
+
+# "direct" scores each /predict call on its own, "microbatch" queues
+# concurrent calls and scores them together
+PREDICT_MODE = os.getenv("PREDICT_MODE", "direct")
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_US = int(os.getenv("MICROBATCH_MAX_WAIT_US", "500"))
+
+# Rows scored per model call by /predict/stream, and the longest input
+# line it will buffer
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1024"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+
+# /ws/predict scores up to WS_MAX_BATCH queued messages per model call and
+# stops reading from a connection while WS_MAX_PENDING messages wait
+WS_MAX_BATCH = int(os.getenv("WS_MAX_BATCH", "1024"))
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "4096"))
+
+# Batch responses of at least GZIP_MIN_BYTES are gzipped at GZIP_LEVEL when
+# the client sends Accept-Encoding: gzip
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "8192"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "1"))
+
+# Where prediction work runs: "threadpool" always offloads, "inline" runs
+# on the event loop, "auto" runs requests of at most INLINE_MAX_ROWS rows
+# inline and offloads larger ones. THREADPOOL_SIZE caps offloaded work
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "auto")
+INLINE_MAX_ROWS = int(os.getenv("INLINE_MAX_ROWS", "256"))
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+# Admission control of the prediction endpoints: at most
+# ADMISSION_MAX_IN_FLIGHT requests run at once per worker, up to
+# ADMISSION_QUEUE_SIZE more wait ADMISSION_QUEUE_TIMEOUT_MS for a slot and
+# the rest get 429 with Retry-After: ADMISSION_RETRY_AFTER seconds. A
+# non-zero ADMISSION_TARGET_LATENCY_MS adapts the limit (between 1 and
+# ADMISSION_MAX_IN_FLIGHT) to keep requests under that latency.
+# ADMISSION_MAX_IN_FLIGHT=0 disables admission control
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "100"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+ADMISSION_TARGET_LATENCY_MS = float(os.getenv("ADMISSION_TARGET_LATENCY_MS", "0"))
+
+# Extra model variants served under /models/{name}; loaded on first use
+# and evicted least-recently-used beyond MODEL_MEMORY_BUDGET_MB
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models/poisoned")
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "64"))
+
+# Poll MODEL_PATH every MODEL_WATCH_INTERVAL seconds and hot-reload the
+# model when the file changes; 0 disables the watcher. Admin endpoints
+# require the X-Admin-Token header to match ADMIN_TOKEN and are disabled
+# while it is unset
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Longest run of the /admin/profile sampling profiler, in seconds
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# LRU cache of /predict results; features are rounded to CACHE_PRECISION
+# decimals before lookup. PREDICTION_CACHE_SIZE=0 disables it
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+CACHE_PRECISION = int(os.getenv("CACHE_PRECISION", "4"))
+
+prediction_cache = (
+    PredictionCache(PREDICTION_CACHE_SIZE, CACHE_PRECISION)
+    if PREDICTION_CACHE_SIZE > 0 else None
+)
+
+# Prometheus metrics at /metrics: requests, in-flight requests and
+# per-stage latency histograms. METRICS_ENABLED=0 stops recording them
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+registry = ModelRegistry(
+    MODEL_REGISTRY_DIR,
+    memory_budget=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024),
+    engine_factory=lambda m: build_engine(m, LOOKUP_MAX_CELLS, LOOKUP_MIN_DEPTH)
+)
 
 # Request model
 class IrisFeatures(BaseModel):
@@ -45,6 +182,17 @@ class IrisFeatures(BaseModel):
             }
         }
 
+FEATURE_NAMES = list(IrisFeatures.model_fields)
+
+reloader = ModelReloader(
+    MODEL_PATH, FEATURE_NAMES,
+    engine_factory=lambda m: build_engine(m, LOOKUP_MAX_CELLS, LOOKUP_MIN_DEPTH)
+)
+
+# Loaded by lifespan() before the server takes traffic
+model = None
+engine = None
+
 class BatchIrisFeatures(BaseModel):
     samples: List[IrisFeatures]
 
@@ -56,6 +204,138 @@ class PredictionResponse(BaseModel):
 class BatchPredictionResponse(BaseModel):
     predictions: List[PredictionResponse]
 
+# Metrics
+metrics = MetricsRegistry()
+REQUESTS = metrics.register(Counter(
+    "iris_requests_total", "HTTP requests by endpoint, method and status",
+    ("endpoint", "method", "status")
+))
+IN_FLIGHT = metrics.register(Gauge(
+    "iris_requests_in_flight", "HTTP requests being handled", ("endpoint",)
+))
+REQUEST_SECONDS = metrics.register(Histogram(
+    "iris_request_duration_seconds", "Time to handle a request and send the response",
+    ("endpoint",)
+))
+# parse: JSON or binary decoding, validate: pydantic, convert: building
+# the feature array, inference: engine or micro-batcher, serialize:
+# encoding the response, compress: gzip
+STAGE_SECONDS = metrics.register(Histogram(
+    "iris_stage_duration_seconds", "Time spent in each stage of a request",
+    ("endpoint", "stage")
+))
+STAGES = ("parse", "validate", "convert", "inference", "serialize", "compress")
+stage_series = {}
+
+def stage_timer(endpoint):
+    """A StageTimer for one request to `endpoint`, started now"""
+    if not METRICS_ENABLED:
+        return NULL_TIMER
+    series = stage_series.get(endpoint)
+    if series is None:
+        series = {stage: STAGE_SECONDS.labels(endpoint, stage) for stage in STAGES}
+        stage_series[endpoint] = series
+    return StageTimer(series)
+
+static_endpoints = {}
+
+def endpoint_of(scope):
+    """Route path a request matches, e.g. /models/{name}/predict"""
+    endpoint = static_endpoints.get(scope["path"])
+    if endpoint is not None:
+        return endpoint
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            if route.path == scope["path"]:
+                static_endpoints[route.path] = route.path
+            return route.path
+    return "unmatched"
+
+# Prediction routes subject to admission control; health, metrics, stats
+# and admin endpoints always get through
+ADMITTED_ENDPOINTS = {
+    "/predict", "/predict/batch", "/predict/stream",
+    "/models/{name}/predict", "/models/{name}/predict/batch",
+}
+
+admission = (
+    AdmissionController(
+        ADMISSION_MAX_IN_FLIGHT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+        ADMISSION_TARGET_LATENCY_MS / 1000
+    )
+    if ADMISSION_MAX_IN_FLIGHT > 0 else None
+)
+
+if admission is not None:
+    # Added before the metrics middleware so that shed requests are
+    # still counted there, under status 429
+    app.add_middleware(
+        AdmissionMiddleware, controller=admission,
+        admits=lambda scope: endpoint_of(scope) in ADMITTED_ENDPOINTS,
+        retry_after=ADMISSION_RETRY_AFTER
+    )
+
+if METRICS_ENABLED:
+    app.add_middleware(
+        MetricsMiddleware,
+        requests=REQUESTS, in_flight=IN_FLIGHT, duration=REQUEST_SECONDS,
+        endpoint_of=endpoint_of
+    )
+
+def inline_schema(model_cls):
+    """JSON schema of a pydantic model with nested models written out in place"""
+    schema = model_cls.model_json_schema()
+    definitions = schema.pop("$defs", {})
+    
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(definitions[node["$ref"].rsplit("/", 1)[1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+    
+    return resolve(schema)
+
+def json_body(model_cls, body, timer):
+    """
+    Decode and validate a JSON request body as `model_cls`
+
+    Errors are reported exactly as FastAPI reports them for body
+    parameters; the two steps are timed as the parse and validate stages.
+    """
+    try:
+        data = loads(body)
+    except ValueError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", getattr(e, "pos", 0)),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": getattr(e, "msg", str(e))}
+        }])
+    timer.mark("parse")
+    
+    try:
+        features = model_cls.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors()]
+        )
+    timer.mark("validate")
+    return features
+
+def json_openapi(model_cls):
+    """openapi_extra for a JSON request body read with json_body()"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {JSON_MEDIA_TYPE: {"schema": inline_schema(model_cls)}}
+        }
+    }
+
 # Health check endpoint
 @app.get("/")
 def root():
@@ -71,74 +351,606 @@ def health():
         raise HTTPException(status_code=503, detail="Model not loaded")
     return {"status": "healthy"}
 
+async def run_prediction(func, *args, rows=1):
+    """
+    Run prediction work inline or on the threadpool per EXECUTION_MODE
+
+    A four-float tree lookup is cheaper than the thread handoff, so small
+    requests skip the threadpool unless told otherwise.
+    """
+    if EXECUTION_MODE == "inline" or (
+        EXECUTION_MODE == "auto" and rows <= INLINE_MAX_ROWS
+    ):
+        return func(*args)
+    return await run_in_threadpool(func, *args)
+
+def feature_row(features):
+    """Feature tuple of an IrisFeatures request in model column order"""
+    return (
+        features.sepal_length,
+        features.sepal_width,
+        features.petal_length,
+        features.petal_width
+    )
+
+def prediction_response(species, confidence, timer):
+    """Serialize a single prediction"""
+    content = dumps({"species": species, "confidence": confidence})
+    timer.mark("serialize")
+    return Response(content=content, media_type=JSON_MEDIA_TYPE)
+
 # Prediction endpoint
-@app.post("/predict", response_model=PredictionResponse)
-def predict(features: IrisFeatures):
+@app.post(
+    "/predict",
+    response_model=PredictionResponse,
+    openapi_extra=json_openapi(IrisFeatures)
+)
+async def predict(request: Request):
     """
     Predict iris species from flower measurements
     """
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
+    body = await request.body()
+    timer = stage_timer("/predict")
+    features = json_body(IrisFeatures, body, timer)
+    row = feature_row(features)
+    timer.mark("convert")
+    
+    current_engine = engine
+    if prediction_cache is not None:
+        # Score the quantized row the key is made of, so the cached answer
+        # is the same whichever of the rows sharing it came first
+        row = key = prediction_cache.key(row)
+        cached = prediction_cache.get(current_engine, key)
+        if cached is not None:
+            timer.mark("inference")
+            return prediction_response(cached[0], cached[1], timer)
+    
     try:
-        # Prepare features
-        X = np.array([[
-            features.sepal_length,
-            features.sepal_width,
-            features.petal_length,
-            features.petal_width
-        ]])
-        
-        # Make prediction
-        prediction = model.predict(X)[0]
+        if batcher is not None:
+            species, confidence = await batcher.submit(row)
+        else:
+            species, confidence = await run_prediction(current_engine.predict_one, row)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    timer.mark("inference")
+    
+    if prediction_cache is not None:
+        prediction_cache.put(current_engine, key, (species, confidence))
+    
+    return prediction_response(species, confidence, timer)
+
+def predict_indices(engine, X, chunk_size=None):
+    """
+    Score an (N, 4) feature array with one engine call per chunk
+
+    Returns (class_index, confidence) arrays of length N.
+    """
+    chunk_size = chunk_size or BATCH_CHUNK_SIZE
+    class_index = np.empty(len(X), dtype=np.intp)
+    confidence = np.empty(len(X), dtype=np.float64)
+    
+    for start in range(0, len(X), chunk_size):
+        stop = start + chunk_size
+        class_index[start:stop], confidence[start:stop] = engine.predict_index(X[start:stop])
+    
+    return class_index, confidence
+
+def predict_array(engine, X, chunk_size=None):
+    """Like predict_indices, but returns species labels"""
+    class_index, confidence = predict_indices(engine, X, chunk_size)
+    return engine.classes_.take(class_index), confidence
+
+batcher = (
+    MicroBatcher(
+        lambda X: predict_array(engine, X), MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_US
+    )
+    if PREDICT_MODE == "microbatch" else None
+)
+
+def score_samples(engine, samples, layout, timer=NULL_TIMER):
+    """Build the feature array for a batch, score it and encode the JSON"""
+    timer.restart()
+    X = np.array([
+        [
+            sample.sepal_length,
+            sample.sepal_width,
+            sample.petal_length,
+            sample.petal_width
+        ]
+        for sample in samples
+    ], dtype=np.float64).reshape(-1, 4)
+    timer.mark("convert")
+    
+    class_index, confidence = predict_indices(engine, X)
+    timer.mark("inference")
+    content = encode_json(class_index, confidence, engine.classes_, layout)
+    timer.mark("serialize")
+    return content
+
+def score_array(engine, X, as_npy, timer=NULL_TIMER):
+    """Score a binary feature array and pack the predictions the same way"""
+    timer.restart()
+    class_index, confidence = predict_indices(engine, X)
+    timer.mark("inference")
+    content = encode_predictions(class_index, confidence, X.dtype, as_npy)
+    timer.mark("serialize")
+    return content
+
+def encoded_response(content, request, media_type, headers=None, timer=NULL_TIMER):
+    """Wrap already-serialized bytes, gzipped if the client accepts it"""
+    timer.restart()
+    content, encoding_headers = compress(
+        content, request.headers.get("accept-encoding", ""), GZIP_MIN_BYTES, GZIP_LEVEL
+    )
+    if "Content-Encoding" in encoding_headers:
+        timer.mark("compress")
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={**(headers or {}), **encoding_headers}
+    )
+
+async def batch_response(engine, request, layout, endpoint):
+    """Score a JSON or binary batch request with `engine`"""
+    body = await request.body()
+    timer = stage_timer(endpoint)
+    
+    if request.headers.get("content-type", "").startswith(BINARY_MEDIA_TYPE):
+        try:
+            X, as_npy = decode_features(body, request.headers.get("x-array-dtype", "float32"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        timer.mark("parse")
         
-        # Get probability (confidence)
-        probabilities = model.predict_proba(X)[0]
-        confidence = float(max(probabilities))
+        try:
+            content = await run_prediction(score_array, engine, X, as_npy, timer, rows=len(X))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
         
-        return PredictionResponse(
-            species=prediction,
-            confidence=confidence
+        return encoded_response(
+            content, request, BINARY_MEDIA_TYPE,
+            headers={"X-Classes": ",".join(map(str, engine.classes_))}, timer=timer
         )
     
+    features = json_body(BatchIrisFeatures, body, timer)
+    
+    try:
+        content = await run_prediction(
+            score_samples, engine, features.samples, layout, timer, rows=len(features.samples)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return encoded_response(content, request, JSON_MEDIA_TYPE, timer=timer)
+
+# Request body of the batch endpoints: JSON or a binary float array
+BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            JSON_MEDIA_TYPE: {"schema": inline_schema(BatchIrisFeatures)},
+            BINARY_MEDIA_TYPE: {
+                "schema": {
+                    "type": "string",
+                    "format": "binary",
+                    "description": "Raw little-endian float32 rows (float64 with "
+                                   "X-Array-Dtype: float64) or a .npy file of shape (N, 4)"
+                }
+            }
+        }
+    }
+}
 
 # Batch prediction endpoint
-@app.post("/predict/batch", response_model=BatchPredictionResponse)
-def predict_batch(features: BatchIrisFeatures):
+@app.post(
+    "/predict/batch",
+    response_model=BatchPredictionResponse,
+    openapi_extra=BATCH_OPENAPI
+)
+async def predict_batch(
+    request: Request,
+    layout: Literal["rows", "columnar", "indexed"] = Query("rows", alias="format")
+):
     """
     Predict multiple iris samples at once
+
+    JSON requests are answered in the shape chosen by `format`: rows (one
+    object per sample), columnar ({"species": [...], "confidence": [...]})
+    or indexed (class indices plus the class table). An
+    application/octet-stream body of float rows is answered with one
+    (uint16 class_index, float confidence) record per row; the class
+    labels are listed in the X-Classes header. Large responses are
+    gzipped when the client accepts it.
     """
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
-    try:
-        predictions = []
+    return await batch_response(engine, request, layout, "/predict/batch")
+
+def score_lines(engine, lines, first_row):
+    """
+    Score a chunk of NDJSON lines and return the NDJSON output
+
+    Produces exactly one output line per input line, in order; lines that
+    cannot be parsed get {"row": n, "error": ...} instead of a prediction,
+    n counting non-blank input lines from 1.
+    """
+    timer = stage_timer("/predict/stream")
+    rows = []
+    errors = {}
+    for offset, line in enumerate(lines):
+        try:
+            rows.append(parse_ndjson_row(line, FEATURE_NAMES))
+        except ValueError as e:
+            errors[offset] = str(e)
+    timer.mark("parse")
+    
+    if rows:
+        X = np.array(rows, dtype=np.float64)
+        timer.mark("convert")
+        species, confidence = predict_array(engine, X)
+        results = iter(zip(species.tolist(), confidence.tolist()))
+        timer.mark("inference")
+    
+    output = []
+    for offset in range(len(lines)):
+        if offset in errors:
+            record = {"row": first_row + offset, "error": errors[offset]}
+        else:
+            s, c = next(results)
+            record = {"species": s, "confidence": c}
+        output.append(dumps(record))
+    output.append(b"")
+    output = b"\n".join(output)
+    timer.mark("serialize")
+    return output
+
+async def stream_predictions(engine, chunks):
+    """
+    Turn a stream of request body chunks into a stream of NDJSON results
+
+    Holds at most one partial line and STREAM_CHUNK_SIZE complete lines,
+    so memory stays flat however long the input is.
+    """
+    pending = b""
+    lines = []
+    row_number = 1
+    
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
         
-        for sample in features.samples:
-            X = np.array([[
-                sample.sepal_length,
-                sample.sepal_width,
-                sample.petal_length,
-                sample.petal_width
-            ]])
-            
-            prediction = model.predict(X)[0]
-            probabilities = model.predict_proba(X)[0]
-            confidence = float(max(probabilities))
-            
-            predictions.append(
-                PredictionResponse(
-                    species=prediction,
-                    confidence=confidence
-                )
-            )
+        for line in complete:
+            if line.strip():
+                lines.append(line)
+            if len(lines) == STREAM_CHUNK_SIZE:
+                yield await run_prediction(score_lines, engine, lines, row_number, rows=len(lines))
+                row_number += len(lines)
+                lines = []
         
-        return BatchPredictionResponse(predictions=predictions)
+        if len(pending) > STREAM_MAX_LINE_BYTES:
+            if lines:
+                yield await run_prediction(score_lines, engine, lines, row_number, rows=len(lines))
+            yield dumps({
+                "row": row_number + len(lines),
+                "error": f"Line longer than {STREAM_MAX_LINE_BYTES} bytes"
+            }) + b"\n"
+            return
+    
+    if pending.strip():
+        lines.append(pending)
+    if lines:
+        yield await run_prediction(score_lines, engine, lines, row_number, rows=len(lines))
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves receive() to the request body
+
+    Starlette's version listens for disconnects on receive() while it
+    streams, which would swallow body chunks the generator still has to
+    read. A disconnect surfaces as a failed send instead.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+# Streaming prediction endpoint
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Predict newline-delimited JSON rows as they arrive
+
+    Each input line is an IrisFeatures object or a list of four numbers;
+    results are streamed back as NDJSON in input order, one per
+    non-blank line. Results start flowing before the upload finishes, so
+    clients must read the response while still sending the body.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    
+    return RequestStreamingResponse(
+        stream_predictions(engine, request.stream()),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+def score_messages(engine, messages):
+    """
+    Score a group of /ws/predict messages and encode the reply frame
+
+    The reply is a JSON array with one {"id", "species", "confidence"} or
+    {"id", "error"} object per message, in order.
+    """
+    timer = stage_timer("/ws/predict")
+    ids = []
+    rows = []
+    errors = {}
+    for offset, message in enumerate(messages):
+        request_id = None
+        try:
+            request = loads(message)
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            request_id = request.get("id")
+            rows.append(feature_values(request, FEATURE_NAMES))
+        except JSONDecodeError as e:
+            errors[offset] = f"Invalid JSON: {e.msg}"
+        except ValueError as e:
+            errors[offset] = str(e)
+        ids.append(request_id)
+    timer.mark("parse")
     
+    if rows:
+        X = np.array(rows, dtype=np.float64)
+        timer.mark("convert")
+        species, confidence = predict_array(engine, X)
+        results = iter(zip(species.tolist(), confidence.tolist()))
+        timer.mark("inference")
+    
+    replies = []
+    for offset, request_id in enumerate(ids):
+        if offset in errors:
+            replies.append({"id": request_id, "error": errors[offset]})
+        else:
+            s, c = next(results)
+            replies.append({"id": request_id, "species": s, "confidence": c})
+    content = dumps(replies).decode()
+    timer.mark("serialize")
+    return content
+
+# WebSocket prediction endpoint
+@app.websocket("/ws/predict")
+async def ws_predict(websocket: WebSocket):
+    """
+    Predict pipelined messages over one long-lived connection
+
+    Each message is an IrisFeatures object with an optional "id" that is
+    echoed back to correlate the result. Clients can send many messages
+    without waiting; whatever has arrived by the time the model is free
+    is scored in one vectorized call and answered with one JSON array
+    frame (see score_messages), so results come back in send order.
+    """
+    await websocket.accept()
+    if model is None:
+        await websocket.close(code=1013, reason="Model not loaded")
+        return
+    
+    pending = asyncio.Queue(WS_MAX_PENDING)
+    
+    async def receive():
+        # A full queue blocks this task, which stops reading the socket
+        # and lets TCP flow control slow the client down
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                text = message.get("text")
+                await pending.put(message.get("bytes") if text is None else text)
+        except Exception:
+            pass
+        await pending.put(None)
+    
+    reader = asyncio.create_task(receive())
+    try:
+        while True:
+            messages = [await pending.get()]
+            while len(messages) < WS_MAX_BATCH and not pending.empty():
+                messages.append(pending.get_nowait())
+            if messages[-1] is None:
+                break
+            reply = await run_prediction(score_messages, engine, messages, rows=len(messages))
+            await websocket.send_text(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+
+async def registry_model(name):
+    """Look up a registry model, loading it off the event loop if needed"""
+    entry = registry.loaded(name)
+    if entry is not None:
+        return entry
+    
+    try:
+        return await run_in_threadpool(registry.get, name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model {name!r}")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Could not load model {name!r}: {e}")
+
+# Model registry endpoints
+@app.get("/models")
+def list_models():
+    """
+    Models available under /models/{name} with per-model load and memory stats
+    """
+    return registry.stats()
+
+@app.post(
+    "/models/{name}/predict",
+    response_model=PredictionResponse,
+    openapi_extra=json_openapi(IrisFeatures)
+)
+async def predict_with_model(name: str, request: Request):
+    """
+    Predict iris species with the registry model `name`
+    """
+    entry = await registry_model(name)
+    entry.requests += 1
+    
+    body = await request.body()
+    timer = stage_timer("/models/{name}/predict")
+    row = feature_row(json_body(IrisFeatures, body, timer))
+    timer.mark("convert")
+    
+    try:
+        species, confidence = await run_prediction(entry.engine.predict_one, row)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    timer.mark("inference")
+    
+    return prediction_response(species, confidence, timer)
+
+@app.post(
+    "/models/{name}/predict/batch",
+    response_model=BatchPredictionResponse,
+    openapi_extra=BATCH_OPENAPI
+)
+async def predict_batch_with_model(
+    name: str,
+    request: Request,
+    layout: Literal["rows", "columnar", "indexed"] = Query("rows", alias="format")
+):
+    """
+    Predict multiple iris samples with the registry model `name`
+
+    Accepts the same bodies and formats as /predict/batch.
+    """
+    entry = await registry_model(name)
+    entry.requests += 1
+    
+    return await batch_response(entry.engine, request, layout, "/models/{name}/predict/batch")
+
+def require_admin(x_admin_token: str = Header("")):
+    """Reject requests without the admin token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN")
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+async def reload_model():
+    """
+    Load MODEL_PATH again and switch to it once it is validated and warm
+
+    Loading runs on the threadpool; the switch happens here on the event
+    loop, so no handler sees the new model next to the old engine.
+    Requests already scoring keep the engine they started with. Raises if
+    the new file is rejected, in which case the current model stays.
+    """
+    global model, engine
+    classes = engine.classes_ if engine is not None else None
+    loaded, signature = await run_in_threadpool(reloader.load, classes)
+    model, engine = loaded.model, loaded.engine
+    reloader.activated(loaded, signature)
+    return loaded
+
+def preload_model():
+    """Load the model before any event loop runs, e.g. ahead of forking workers"""
+    global model, engine
+    loaded, signature = reloader.load()
+    model, engine = loaded.model, loaded.engine
+    reloader.activated(loaded, signature)
+    return loaded
+
+async def watch_model_file():
+    """Reload the model whenever MODEL_PATH changes on disk"""
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        if not reloader.changed():
+            continue
+        try:
+            loaded = await reload_model()
+            print(f"✅ Model reloaded from {MODEL_PATH} ({type(loaded.engine).__name__})")
+        except Exception as e:
+            print(f"❌ Error reloading model, keeping the current one: {e}")
+
+# Model reload endpoints
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+async def admin_reload():
+    """
+    Reload the model from MODEL_PATH without dropping traffic
+
+    The new model must take the same features and predict the same
+    classes as the current one and pass a warm-up before it is swapped
+    in; otherwise the current model keeps serving.
+    """
+    try:
+        loaded = await reload_model()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Model rejected: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load model: {e}")
+    
+    return {
+        "status": "reloaded",
+        "engine": type(loaded.engine).__name__,
+        "load_time_ms": round(loaded.load_seconds * 1000, 3),
+        **reloader.stats()
+    }
+
+profiling = False
+
+# Profiler endpoint
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    top: int = Query(20, ge=1, le=1000),
+    include_idle: bool = False,
+    output: Literal["json", "collapsed"] = Query("json", alias="format")
+):
+    """
+    Profile this worker for `seconds` while it keeps serving traffic
+
+    Every `interval_ms` of CPU time the Python stack of each thread is
+    sampled (wall time when the app does not run on the main thread). The
+    response holds the `top` hottest functions and the collapsed stacks
+    (one "thread;outer;...;leaf count" line per stack) ready for
+    flamegraph.pl or speedscope; format=collapsed returns only those.
+    Threads waiting for work are left out unless include_idle is set.
+    Nothing is sampled between calls, and one profile runs at a time.
+    """
+    global profiling
+    if profiling:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    profiling = True
+    try:
+        profile = await profile_for(seconds, interval_ms / 1000, include_idle)
+    finally:
+        profiling = False
+    
+    if output == "collapsed":
+        return Response(content=profile.collapsed(), media_type="text/plain")
+    return {
+        "pid": os.getpid(),
+        "duration": round(profile.duration, 3),
+        "clock": profile.clock,
+        "interval_ms": interval_ms,
+        "samples": profile.samples,
+        "top": profile.top(top),
+        "collapsed": profile.collapsed()
+    }
+
+@app.get("/reload/stats")
+def reload_stats():
+    """
+    Version, reload and failure counters of the served model
+    """
+    return {"watch_interval": MODEL_WATCH_INTERVAL, **reloader.stats()}
 
 # Model info endpoint
 @app.get("/model/info")
@@ -150,11 +962,53 @@ def model_info():
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     return {
-        "model_type": type(model).__name__,
+        "model_type": getattr(model, "model_type", type(model).__name__),
         "n_features": model.n_features_in_,
         "classes": model.classes_.tolist()
     }
 
+# Micro-batching stats endpoint
+@app.get("/batching/stats")
+def batching_stats():
+    """
+    Queue depth and batch-size distribution of the micro-batcher
+    """
+    if batcher is None:
+        return {"mode": PREDICT_MODE, "enabled": False}
+    
+    return {"mode": PREDICT_MODE, "enabled": True, **batcher.stats()}
+
+# Admission control stats endpoint
+@app.get("/admission/stats")
+def admission_stats():
+    """
+    Concurrency limit, queue depth and admitted, queued and shed counters
+    """
+    if admission is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **admission.stats()}
+
+# Metrics endpoint
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Request counters, in-flight gauges and per-stage latency histograms
+    in the Prometheus text format
+    """
+    return Response(content=metrics.render(), media_type=METRICS_MEDIA_TYPE)
+
+# Prediction cache stats endpoint
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Hit, miss and eviction counters of the prediction cache
+    """
+    if prediction_cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **prediction_cache.stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the IRIS Classifier API
+
+Run from the repository root, e.g. python -m benchmarks.execution_modes
+"""
@@ -0,0 +1,102 @@
+"""
+Admission Control Benchmark
+Overloads one server with far more concurrent /predict/batch requests
+than it can handle, with admission control off and on, and compares the
+latency of successful requests and how fast excess ones are turned away
+
+Each client sends requests back to back for the whole run, waiting the
+Retry-After time after a 429 as a well-behaved client would.
+
+Usage: python -m benchmarks.admission [seconds] [concurrency]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sys
+import time
+
+import requests
+
+from benchmarks.server import running_server
+
+SAMPLE = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+ROWS = 2000
+BODY = json.dumps({"samples": [SAMPLE] * ROWS}).encode()
+HEADERS = {"Content-Type": "application/json"}
+
+SETTINGS = {
+    "off": {},
+    "static": {"ADMISSION_MAX_IN_FLIGHT": "4", "ADMISSION_QUEUE_SIZE": "8"},
+    "adaptive": {
+        "ADMISSION_MAX_IN_FLIGHT": "16", "ADMISSION_QUEUE_SIZE": "8",
+        "ADMISSION_TARGET_LATENCY_MS": "100",
+    },
+}
+
+# The client timeout of load_test.py
+TIMEOUT = 10
+
+
+def client(url, deadline):
+    """(status, seconds) of each request sent until `deadline`; status 0
+    on timeout or error"""
+    results = []
+    with requests.Session() as session:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            retry_after = 0
+            try:
+                response = session.post(
+                    f"{url}/predict/batch", data=BODY, headers=HEADERS, timeout=TIMEOUT
+                )
+                status = response.status_code
+                retry_after = float(response.headers.get("retry-after", 0))
+            except requests.RequestException:
+                status = 0
+            results.append((status, time.perf_counter() - start))
+            time.sleep(retry_after)
+    return results
+
+
+def percentile(values, q):
+    return sorted(values)[int(len(values) * q)] * 1000 if values else 0.0
+
+
+def overload(env, seconds, concurrency):
+    with running_server(env={"PREDICTION_CACHE_SIZE": "0", **env}) as url:
+        client(url, time.perf_counter())  # warm-up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            runs = list(pool.map(client, [url] * concurrency, [start + seconds] * concurrency))
+        elapsed = time.perf_counter() - start
+
+    results = [result for run in runs for result in run]
+    ok = [seconds for status, seconds in results if status == 200]
+    shed = [seconds for status, seconds in results if status == 429]
+    return {
+        "goodput": len(ok) / elapsed,
+        "ok": len(ok),
+        "shed": len(shed),
+        "failed": len(results) - len(ok) - len(shed),
+        "ok_p50": percentile(ok, 0.5),
+        "ok_p99": percentile(ok, 0.99),
+        "shed_p50": percentile(shed, 0.5),
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 15
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    print(f"{seconds:g}s of {ROWS}-row batches from {concurrency} concurrent clients")
+    print(f"{'Admission':<10} {'OK/s':>7} {'OK':>6} {'429':>6} {'Failed':>7} "
+          f"{'OK P50 ms':>10} {'OK P99 ms':>10} {'429 P50 ms':>11}")
+    print("-" * 74)
+    for name, env in SETTINGS.items():
+        r = overload(env, seconds, concurrency)
+        print(f"{name:<10} {r['goodput']:>7.1f} {r['ok']:>6} {r['shed']:>6} {r['failed']:>7} "
+              f"{r['ok_p50']:>10.1f} {r['ok_p99']:>10.1f} {r['shed_p50']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
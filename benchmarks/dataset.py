@@ -0,0 +1,66 @@
+"""
+Dataset Loading Benchmark
+Time to get a large synthetic IRIS-like CSV into memory with pandas,
+with the dataset cache's first (parse and write) and later (hash and
+memory-map) loads, next to fitting a decision tree on it
+
+Usage: python -m benchmarks.dataset [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.datasets import load_iris
+from sklearn.tree import DecisionTreeClassifier
+
+from dataset import load_dataset
+
+
+def synthetic_csv(path, rows, seed=0):
+    """Iris rows with Gaussian noise, written with two decimals like the real data"""
+    iris = load_iris()
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(iris.data), rows)
+    features = iris.data[picks] + rng.normal(0, 0.1, (rows, 4))
+    frame = pd.DataFrame(features.round(2), columns=[
+        "sepal_length", "sepal_width", "petal_length", "petal_width"
+    ])
+    frame["species"] = iris.target_names[iris.target[picks]]
+    frame.to_csv(path, index=False)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.csv")
+        synthetic_csv(path, rows)
+        size = os.path.getsize(path) / 1e6
+
+        _, read_csv = timed(lambda: pd.read_csv(path))
+        _, first = timed(lambda: load_dataset(path))
+        data, later = timed(lambda: load_dataset(path))
+        _, fit = timed(lambda: DecisionTreeClassifier(max_depth=5, random_state=42).fit(
+            data.features, data.codes
+        ))
+
+    print(f"{rows:,} rows, {size:.0f} MB of CSV")
+    print(f"{'Step':<32} {'Seconds':>8}")
+    print("-" * 41)
+    print(f"{'pd.read_csv':<32} {read_csv:>8.3f}")
+    print(f"{'load_dataset, first (parse)':<32} {first:>8.3f}")
+    print(f"{'load_dataset, later (mmap)':<32} {later:>8.3f}")
+    print(f"{'DecisionTree fit, max_depth=5':<32} {fit:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Execution Mode Benchmark
+Compares p50/p99 of /predict with prediction work inline on the event
+loop, on the threadpool, or chosen automatically by request size
+
+Usage: python -m benchmarks.execution_modes [requests] [concurrency ...]
+"""
+
+from contextlib import redirect_stdout
+import io
+import sys
+
+from load_test import run_load_test
+from benchmarks.server import running_server
+
+MODES = ["threadpool", "inline", "auto"]
+
+# Worker counts used by the bottleneck_demo.py scenarios
+DEFAULT_CONCURRENCY = [5, 10, 20]
+
+
+def benchmark_mode(mode, total_requests, concurrency_levels):
+    """Run load_test.py against a server started in `mode`"""
+    results = {}
+    with running_server(env={"EXECUTION_MODE": mode}) as url:
+        with redirect_stdout(io.StringIO()):
+            run_load_test(url, 50, 5, "warm-up")
+        for workers in concurrency_levels:
+            with redirect_stdout(io.StringIO()):
+                results[workers] = run_load_test(
+                    url, total_requests, workers, f"{mode} x{workers}"
+                )
+    return results
+
+
+def main():
+    total_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency_levels = [int(c) for c in sys.argv[2:]] or DEFAULT_CONCURRENCY
+
+    print(f"{'Mode':<12} {'Workers':<8} {'Req/s':>9} {'P50 ms':>9} {'P99 ms':>9} {'OK %':>7}")
+    print("-" * 58)
+    for mode in MODES:
+        results = benchmark_mode(mode, total_requests, concurrency_levels)
+        for workers, r in results.items():
+            print(f"{mode:<12} {workers:<8} {r['throughput']:>9.1f} {r['p50']:>9.2f} "
+                  f"{r['p99']:>9.2f} {r['success_rate']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Metrics Overhead Benchmark
+Cost of recording the /metrics data: the individual operations, and
+whole in-process requests with METRICS_ENABLED=1 against 0
+
+Usage: python -m benchmarks.metrics_overhead [requests]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from metrics import Counter, Histogram, StageTimer
+
+SAMPLE = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+# Alternating child runs per setting; the fastest run of each is kept to
+# filter out noise from the rest of the machine
+ROUNDS = 7
+
+
+def operation_costs(number=200_000):
+    """Nanoseconds per metric operation"""
+    counter = Counter("c", "", ("endpoint",))
+    histogram = Histogram("h", "", ("endpoint", "stage"))
+    series = {"inference": histogram.labels("/predict", "inference")}
+    timer = StageTimer(series)
+    child = counter.labels("/predict")
+
+    def ns(func):
+        return timeit.timeit(func, number=number) / number * 1e9
+
+    return {
+        "counter.inc": ns(child.inc),
+        "counter.labels().inc": ns(lambda: counter.labels("/predict").inc()),
+        "histogram.observe": ns(lambda: series["inference"].observe(0.0001)),
+        "timer.mark": ns(lambda: timer.mark("inference")),
+    }
+
+
+async def time_requests(total):
+    """Microseconds per request for /predict and a 100-row /predict/batch"""
+    import app
+    from benchmarks.asgi import call
+
+    requests = {
+        "/predict": json.dumps(SAMPLE).encode(),
+        "/predict/batch": json.dumps({"samples": [SAMPLE] * 100}).encode(),
+    }
+    headers = [("content-type", "application/json")]
+    timings = {}
+    async with app.app.router.lifespan_context(app.app):
+        for path, body in requests.items():
+            for _ in range(200):
+                await call(app.app, "POST", path, body, headers)
+            samples = []
+            for _ in range(total):
+                start = time.perf_counter()
+                status, _, _ = await call(app.app, "POST", path, body, headers)
+                samples.append((time.perf_counter() - start) * 1e6)
+                assert status == 200
+            timings[path] = statistics.median(samples)
+    return timings
+
+
+def run_child(enabled, total):
+    env = {**os.environ, "METRICS_ENABLED": "1" if enabled else "0", "PREDICTION_CACHE_SIZE": "0"}
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-m", "benchmarks.metrics_overhead", "--child", str(total)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(asyncio.run(time_requests(int(sys.argv[2])))))
+        return
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    print("Metric operations")
+    for name, cost in operation_costs().items():
+        print(f"   {name:<22} {cost:>7.0f} ns")
+
+    runs = {True: [], False: []}
+    for _ in range(ROUNDS):
+        for enabled in (False, True):
+            runs[enabled].append(run_child(enabled, total))
+
+    print(f"\nMedian in-process request time, best of {ROUNDS} runs of {total}")
+    print(f"{'Endpoint':<16} {'metrics off us':>15} {'metrics on us':>14} {'overhead us':>12}")
+    for path in runs[True][0]:
+        off = min(run[path] for run in runs[False])
+        on = min(run[path] for run in runs[True])
+        print(f"{path:<16} {off:>15.1f} {on:>14.1f} {on - off:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
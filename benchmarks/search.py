@@ -0,0 +1,50 @@
+"""
+Hyperparameter Search Scaling Benchmark
+Fits per second of the parallel search over the wide decision tree grid
+with 1, 2, 4, ... worker processes, up to one per CPU, and the speedup
+over the first worker count
+
+Usage: python -m benchmarks.search [workers ...]
+"""
+
+import os
+import sys
+
+from sklearn.datasets import load_iris
+from sklearn.model_selection import train_test_split
+
+from hyperparameter_search import candidates, load_space, run_search
+
+SPACE_PATH = os.path.join(os.path.dirname(__file__), "..", "search_spaces", "decision_tree_grid.json")
+
+
+def default_workers():
+    workers = [1]
+    while workers[-1] * 2 <= os.cpu_count():
+        workers.append(workers[-1] * 2)
+    if workers[-1] != os.cpu_count():
+        workers.append(os.cpu_count())
+    return workers
+
+
+def main():
+    worker_counts = [int(w) for w in sys.argv[1:]] or default_workers()
+    X, y = load_iris(return_X_y=True)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+    params_list = candidates(load_space(SPACE_PATH))
+
+    print(f"{len(params_list)} candidates on {os.cpu_count()} CPUs")
+    print(f"{'Workers':<8} {'Seconds':>8} {'Fits/s':>9} {'Speedup':>8}")
+    print("-" * 36)
+    baseline = None
+    for workers in worker_counts:
+        outcome = run_search(params_list, X_train, y_train, X_test, y_test,
+                             workers=workers, log=lambda _: None)
+        seconds = outcome["seconds"]
+        baseline = baseline or seconds
+        print(f"{workers:<8} {seconds:>8.2f} {len(params_list) / seconds:>9.0f} "
+              f"{baseline / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Helpers for running app.py under uvicorn during benchmarks
+"""
+
+from contextlib import contextmanager
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(url, timeout=30):
+    """Poll /health until the server answers 200"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"Server at {url} did not become healthy in {timeout}s")
+
+
+@contextmanager
+def running_server(env=None, port=None, args=(), quiet=True, workers=None):
+    """
+    Start `uvicorn app:app` in a subprocess and yield its base URL
+
+    `env` entries are added to the current environment, `args` are extra
+    uvicorn command-line arguments. With `workers`, the server is started
+    through prefork.py instead.
+    """
+    with server_process(env, port, args, quiet, workers) as (url, _):
+        yield url
+
+
+@contextmanager
+def server_process(env=None, port=None, args=(), quiet=True, workers=None):
+    """Like running_server, but yields (base URL, subprocess.Popen)"""
+    port = port or free_port()
+    if workers is None:
+        server = ["-m", "uvicorn", "app:app"]
+    else:
+        server = ["prefork.py", "--workers", str(workers)]
+    command = [
+        sys.executable, *server,
+        "--host", "127.0.0.1", "--port", str(port), "--no-access-log",
+        *args
+    ]
+    output = subprocess.DEVNULL if quiet else None
+    process = subprocess.Popen(
+        command, env={**os.environ, **(env or {})}, stdout=output, stderr=output
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_healthy(url)
+        yield url, process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,102 @@
+"""
+Cold Start Benchmark
+Time to first prediction of a fresh process: app import, model load and
+warm-up (the lifespan startup), first and second /predict, and the time
+until a new uvicorn server passes /health - with the model read through
+joblib and from its compiled tree file
+
+Usage: python -m benchmarks.startup [runs]
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.server import running_server
+from model_reload import compile_model_file
+
+SAMPLE = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+COLUMNS = ["import_ms", "load_ms", "first_request_ms", "warm_request_ms", "ready_ms"]
+
+
+async def measure_in_process():
+    """Phase timings of `import app` through the second request, in ms"""
+    import httpx  # the client is not part of the service's start-up
+
+    start = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+
+    timings = {"import_ms": (imported - start) * 1000}
+    async with app.app.router.lifespan_context(app.app):
+        timings["load_ms"] = (time.perf_counter() - imported) * 1000
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            for name in ("first_request_ms", "warm_request_ms"):
+                sent = time.perf_counter()
+                response = await client.post("/predict", json=SAMPLE)
+                timings[name] = (time.perf_counter() - sent) * 1000
+                response.raise_for_status()
+    timings["sklearn_imported"] = "sklearn" in sys.modules
+    return timings
+
+
+def run_child(model_path):
+    """Measure one cold start in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-m", "benchmarks.startup", "--child"],
+        env={**os.environ, "MODEL_PATH": model_path},
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_to_ready(model_path):
+    """Milliseconds from spawning uvicorn until /health answers 200"""
+    start = time.perf_counter()
+    with running_server(env={"MODEL_PATH": model_path}):
+        return (time.perf_counter() - start) * 1000
+
+
+def benchmark(model_path, runs):
+    samples = []
+    for _ in range(runs):
+        timings = run_child(model_path)
+        timings["ready_ms"] = time_to_ready(model_path)
+        samples.append(timings)
+    result = {column: statistics.median(s[column] for s in samples) for column in COLUMNS}
+    result["sklearn_imported"] = any(s["sklearn_imported"] for s in samples)
+    return result
+
+
+def main():
+    if sys.argv[1:] == ["--child"]:
+        print(json.dumps(asyncio.run(measure_in_process())))
+        return
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    source = os.getenv("MODEL_PATH", "models/iris_model.joblib")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = shutil.copy(source, os.path.join(tmp, "joblib_model.joblib"))
+        compiled = shutil.copy(source, os.path.join(tmp, "compiled_model.joblib"))
+        compile_model_file(compiled)
+
+        print(f"Median of {runs} cold starts")
+        print(f"{'Model file':<10} " + " ".join(f"{c:>17}" for c in COLUMNS) + "  sklearn")
+        print("-" * 108)
+        for name, path in (("joblib", plain), ("compiled", compiled)):
+            r = benchmark(path, runs)
+            print(f"{name:<10} " + " ".join(f"{r[c]:>17.1f}" for c in COLUMNS)
+                  + f"  {'yes' if r['sklearn_imported'] else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
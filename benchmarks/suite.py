@@ -0,0 +1,219 @@
+"""
+In-Process Benchmark Suite
+Throughput and latency percentiles of the API called through ASGI in this
+process (no server, sockets or client library), compared against a
+stored JSON baseline
+
+Cases: /predict, /predict/batch with 1, 100 and 10,000 rows, /model/info
+and loading the model as a worker does at start-up. Every case runs for
+ROUNDS rounds of at least its minimum iterations and MIN_SECONDS, with
+the rounds of different cases interleaved; the best round of each case
+is kept, so a noisy neighbour has to slow every round to register as a
+regression.
+
+A run fails (exit status 1) when a case's throughput or p50 is more than
+--threshold worse than the baseline, or its p99 more than
+--tail-threshold worse. Baselines only compare runs on the same machine;
+record one with --save before making a change, then rerun. On shared or
+throttled machines run-to-run noise can reach 30%; raise --rounds or the
+thresholds there.
+
+Usage: python -m benchmarks.suite [--save] [--baseline PATH]
+           [--threshold 0.25] [--tail-threshold 0.5] [--cases NAME,...]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.asgi import call
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+SAMPLE = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+JSON_HEADERS = [("content-type", "application/json")]
+
+ROUNDS = 5
+MIN_SECONDS = 0.3
+
+# Higher is better for throughput, lower for the latencies
+GATED = {"throughput": "higher", "p50_us": "lower", "p99_us": "lower"}
+
+
+def batch_body(rows):
+    """A batch of distinct dataset rows, repeated to `rows`"""
+    from sklearn.datasets import load_iris
+    X = np.resize(load_iris().data, (rows, 4))
+    samples = [dict(zip(SAMPLE, map(float, row))) for row in X]
+    return json.dumps({"samples": samples}).encode()
+
+
+def make_cases(app_module):
+    """name -> (async step, minimum iterations)"""
+    app = app_module.app
+
+    def post(path, body):
+        async def step():
+            status, _, _ = await call(app, "POST", path, body, JSON_HEADERS)
+            assert status == 200, f"{path} returned {status}"
+        return step
+
+    async def model_info():
+        status, _, _ = await call(app, "GET", "/model/info")
+        assert status == 200, f"/model/info returned {status}"
+
+    async def model_load():
+        app_module.preload_model()
+
+    return {
+        "predict": (post("/predict", json.dumps(SAMPLE).encode()), 2000),
+        "batch_1": (post("/predict/batch", batch_body(1)), 2000),
+        "batch_100": (post("/predict/batch", batch_body(100)), 500),
+        "batch_10000": (post("/predict/batch", batch_body(10_000)), 20),
+        "model_info": (model_info, 2000),
+        "model_load": (model_load, 10),
+    }
+
+
+async def time_case(step, min_iterations):
+    """Latency samples (seconds) and throughput of one round"""
+    for _ in range(max(1, min_iterations // 10)):
+        await step()
+
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < min_iterations or time.perf_counter() - start < MIN_SECONDS:
+        sent = time.perf_counter()
+        await step()
+        samples.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(samples) * 1e6
+    return {
+        "iterations": len(samples),
+        "throughput": len(samples) / elapsed,
+        "mean_us": float(latencies.mean()),
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p95_us": float(np.percentile(latencies, 95)),
+        "p99_us": float(np.percentile(latencies, 99)),
+    }
+
+
+async def run_suite(names=None, rounds=ROUNDS):
+    """Best-of-`rounds` results per case"""
+    # Measure the app's own work rather than repeated cache hits
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+    import app as app_module
+
+    results = {}
+    async with app_module.app.router.lifespan_context(app_module.app):
+        cases = make_cases(app_module)
+        names = names or list(cases)
+        runs = {name: [] for name in names}
+        for _ in range(rounds):
+            for name in names:
+                runs[name].append(await time_case(*cases[name]))
+
+    for name in names:
+        best = min(runs[name], key=lambda run: run["p50_us"])
+        results[name] = {**best, "throughput": max(run["throughput"] for run in runs[name])}
+    return results
+
+
+def compare(results, baseline, threshold, tail_threshold):
+    """
+    Relative change of each gated metric against the baseline
+
+    Returns ({case: {metric: change}}, [regression messages]); a positive
+    change is always a slowdown.
+    """
+    changes = {}
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("cases", {}).get(name)
+        if before is None:
+            continue
+        changes[name] = {}
+        for metric, better in GATED.items():
+            if better == "higher":
+                change = before[metric] / result[metric] - 1
+            else:
+                change = result[metric] / before[metric] - 1
+            changes[name][metric] = change
+            limit = tail_threshold if metric == "p99_us" else threshold
+            if change > limit:
+                regressions.append(
+                    f"{name} {metric}: {before[metric]:.1f} -> {result[metric]:.1f} "
+                    f"({change:+.0%}, limit {limit:.0%})"
+                )
+    return changes, regressions
+
+
+def environment():
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the in-process API benchmarks")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown of throughput and p50 (default: 0.25)")
+    parser.add_argument("--tail-threshold", type=float, default=0.5,
+                        help="allowed slowdown of p99 (default: 0.5)")
+    parser.add_argument("--cases", help="comma-separated subset of cases to run")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args()
+
+    names = args.cases.split(",") if args.cases else None
+    results = asyncio.run(run_suite(names, args.rounds))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    changes, regressions = compare(results, baseline, args.threshold, args.tail_threshold)
+
+    print(f"{'Case':<13} {'Iter':>6} {'Ops/s':>9} {'P50 us':>9} {'P95 us':>9} {'P99 us':>9} "
+          f"{'Slowdown ops/s, p50, p99':>27}")
+    print("-" * 87)
+    for name, r in results.items():
+        if name in changes:
+            c = changes[name]
+            versus = f"{c['throughput']:+.0%} {c['p50_us']:+.0%} {c['p99_us']:+.0%}"
+        else:
+            versus = "-"
+        print(f"{name:<13} {r['iterations']:>6} {r['throughput']:>9.1f} {r['p50_us']:>9.1f} "
+              f"{r['p95_us']:>9.1f} {r['p99_us']:>9.1f} {versus:>27}")
+
+    if args.save:
+        saved = {**environment(), "cases": {**baseline.get("cases", {}), **results}}
+        with open(args.baseline, "w") as f:
+            json.dump(saved, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+    elif not baseline:
+        print(f"\nNo baseline at {args.baseline}; record one with --save")
+
+    if regressions and not args.save:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+WebSocket Benchmark
+Single predictions over pipelined /ws/predict messages on one connection
+against HTTP /predict requests on keep-alive connections, with the same
+number of predictions in flight
+
+Usage: python -m benchmarks.websocket [requests] [concurrency ...]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import httpx
+import websockets
+
+from benchmarks.server import running_server
+
+SAMPLE = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+DEFAULT_CONCURRENCY = [1, 10, 50]
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+async def run_http(url, total, concurrency):
+    """`concurrency` connections each sending one /predict at a time"""
+    body = json.dumps(SAMPLE).encode()
+    headers = {"Content-Type": "application/json"}
+    latencies = []
+
+    async def worker(client, count):
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.post(f"{url}/predict", content=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await worker(client, 50)  # warm-up
+        latencies.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, total // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed)
+
+
+async def run_websocket(url, total, concurrency):
+    """One connection with up to `concurrency` messages awaiting replies"""
+    total = total // concurrency * concurrency
+    sent = {}
+    latencies = []
+    window = asyncio.Semaphore(concurrency)
+
+    async with websockets.connect(url.replace("http", "ws", 1) + "/ws/predict") as ws:
+        async def send():
+            for i in range(total):
+                await window.acquire()
+                sent[i] = time.perf_counter()
+                await ws.send(json.dumps({"id": i, **SAMPLE}))
+
+        async def receive():
+            while len(latencies) < total:
+                for reply in json.loads(await ws.recv()):
+                    latencies.append(time.perf_counter() - sent.pop(reply["id"]))
+                    window.release()
+
+        start = time.perf_counter()
+        await asyncio.gather(send(), receive())
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency_levels = [int(c) for c in sys.argv[2:]] or DEFAULT_CONCURRENCY
+
+    print(f"{'Transport':<11} {'In flight':<10} {'Req/s':>9} {'P50 ms':>9} {'P99 ms':>9}")
+    print("-" * 52)
+    with running_server(env={"PREDICTION_CACHE_SIZE": "0"}) as url:
+        for concurrency in concurrency_levels:
+            for name, run in (("http", run_http), ("websocket", run_websocket)):
+                r = asyncio.run(run(url, total, concurrency))
+                print(f"{name:<11} {concurrency:<10} {r['throughput']:>9.1f} "
+                      f"{r['p50']:>9.2f} {r['p99']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
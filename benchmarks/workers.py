@@ -0,0 +1,116 @@
+"""
+Multi-Worker Benchmark
+Throughput and memory of prefork.py with 1, 2, 4 and 8 workers, against
+`uvicorn --workers`, which starts every worker from scratch
+
+Memory is summed over the server's whole process tree. RSS counts
+shared pages once per process; PSS splits them between the processes
+sharing them, so its total is what the pod actually uses.
+
+Usage: python -m benchmarks.workers [requests] [worker counts ...]
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+import time
+
+from load_test import run_load_test
+from benchmarks.server import server_process
+
+DEFAULT_WORKERS = [1, 2, 4, 8]
+
+# Client processes and threads per process driving the load, enough to
+# keep 8 workers busy without the client's GIL becoming the limit
+CLIENT_PROCESSES = 4
+CLIENT_THREADS = 16
+
+
+def children(pid):
+    """PIDs of the direct children of `pid`"""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name may contain spaces; the ppid follows it
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    found.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            pass
+    return found
+
+
+def process_tree_memory(pid):
+    """(RSS, PSS) in MB summed over `pid` and its children"""
+    rss = pss = 0
+    for process in [pid, *children(pid)]:
+        try:
+            with open(f"/proc/{process}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return rss / 1024, pss / 1024
+
+
+def client(url, total_requests):
+    with redirect_stdout(io.StringIO()):
+        return run_load_test(url, total_requests, CLIENT_THREADS, "client")
+
+
+def drive(url, total_requests):
+    """Run the load from several client processes; returns (req/s, p50, p99)"""
+    per_client = total_requests // CLIENT_PROCESSES
+    with ProcessPoolExecutor(CLIENT_PROCESSES) as pool:
+        list(pool.map(client, [url] * CLIENT_PROCESSES, [20] * CLIENT_PROCESSES))  # warm-up
+        start = time.perf_counter()
+        results = list(pool.map(client, [url] * CLIENT_PROCESSES, [per_client] * CLIENT_PROCESSES))
+        elapsed = time.perf_counter() - start
+    return (
+        per_client * CLIENT_PROCESSES / elapsed,
+        sorted(r["p50"] for r in results)[len(results) // 2],
+        max(r["p99"] for r in results),
+    )
+
+
+def benchmark(server, workers, total_requests):
+    if server == "prefork":
+        options = {"workers": workers}
+    else:
+        options = {"args": ("--workers", str(workers))}
+
+    with server_process(**options) as (url, process):
+        time.sleep(0.5)  # let uvicorn's spawned workers finish starting
+        idle_rss, idle_pss = process_tree_memory(process.pid)
+        throughput, p50, p99 = drive(url, total_requests)
+        rss, pss = process_tree_memory(process.pid)
+    return {
+        "throughput": throughput, "p50": p50, "p99": p99,
+        "idle_pss": idle_pss, "rss": rss, "pss": pss,
+    }
+
+
+def main():
+    total_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    worker_counts = [int(w) for w in sys.argv[2:]] or DEFAULT_WORKERS
+
+    print(f"{os.cpu_count()} CPUs, {CLIENT_PROCESSES}x{CLIENT_THREADS} client threads")
+    print(f"{'Server':<9} {'Workers':<8} {'Req/s':>8} {'P50 ms':>8} {'P99 ms':>8} "
+          f"{'Idle PSS MB':>12} {'RSS MB':>8} {'PSS MB':>8}")
+    print("-" * 78)
+    for server in ("prefork", "uvicorn"):
+        for workers in worker_counts:
+            r = benchmark(server, workers, total_requests)
+            print(f"{server:<9} {workers:<8} {r['throughput']:>8.1f} {r['p50']:>8.2f} "
+                  f"{r['p99']:>8.2f} {r['idle_pss']:>12.1f} {r['rss']:>8.1f} {r['pss']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
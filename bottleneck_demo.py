@@ -2,11 +2,19 @@
 """
 Week 7: Bottleneck Demonstration
 Shows auto-scaling and bottleneck when restricted to 1 pod
+
+Against the GKE service it drives the HPA with kubectl, pausing between
+scenarios. With --local it runs the same scenarios without pausing on
+replicas started on this machine (see local_cluster.py) and reports
+throughput and latency per replica count.
 """
 
+import argparse
 import subprocess
 import time
 import sys
+import os
+from datetime import datetime
 
 def print_section(title):
     """Print formatted section header"""
@@ -29,13 +37,94 @@ def run_kubectl_command(command, description):
         print(f"Note: {result.stderr}")
     print()
 
+def run_scenario_load(service_url, requests, workers, run_dir, scenario):
+    """Run load_test.py, recording its per-second time series"""
+    subprocess.run([
+        'python', 'load_test.py', service_url, str(requests), str(workers),
+        '--record', os.path.join(run_dir, f"scenario{scenario}.jsonl")
+    ])
+
+# (title, requests, workers, maxReplicas or None to keep the HPA's, expectation)
+SCENARIOS = [
+    ("NORMAL LOAD", 100, 5, None, "1 replica, CPU <50%, no scaling"),
+    ("HIGH LOAD WITH AUTO-SCALING", 1000, 10, None, "Scales from 1 → 2 → 3 replicas"),
+    ("BOTTLENECK - RESTRICTED TO 1 REPLICA", 1000, 10, 1, "1 replica at its CPU limit"),
+    ("EXTREME BOTTLENECK", 2000, 20, 1, "High failures, timeouts, degraded performance"),
+]
+
+def print_replica_report(rows):
+    """Print throughput and latency per ready replica count"""
+    print(f"\n{'Replicas':>8} {'Seconds':>8} {'OK':>6} {'429':>5} {'Errors':>6} "
+          f"{'Req/s':>8} {'P50 ms':>8} {'P99 ms':>8}")
+    for row in rows:
+        print(f"{row['replicas']:>8} {row['seconds']:>8.1f} {row['ok']:>6} {row['shed']:>5} "
+              f"{row['errors']:>6} {row['throughput']:>8.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f}")
+
+def run_local(args, run_dir):
+    """Run the scenarios against replicas on this machine"""
+    from local_cluster import LocalCluster
+
+    print_section("WEEK 7: AUTO-SCALING & BOTTLENECK DEMONSTRATION (LOCAL)")
+    cluster = LocalCluster(
+        cpu_limit=args.cpu_limit, balance=args.balance,
+        sync_period=args.sync_period, time_scale=args.time_scale
+    )
+    limit = f"{cluster.cpu_limit:g} CPU" if cluster.cpu_limit else "no CPU limit"
+    print(f"🚀 Starting replicas ({limit} each, {cluster.cpu_request:g} CPU requested, "
+          f"{args.balance} balancing)...")
+    url = cluster.start()
+    print(f"   Proxy ready at {url}")
+
+    reports = []
+    try:
+        for number, (title, requests, workers, max_replicas, expected) in enumerate(SCENARIOS, 1):
+            print_section(f"SCENARIO {number}: {title} ({requests} requests)")
+            print(f"Expected: {expected}\n")
+            if max_replicas:
+                print(f"📝 Setting maxReplicas to {max_replicas} and scaling to {max_replicas}")
+                cluster.set_max_replicas(max_replicas)
+                cluster.scale(max_replicas)
+            cluster.mark()
+            run_scenario_load(url, requests, workers, run_dir, number)
+            reports.append(cluster.report())
+            print_replica_report(reports[-1])
+    finally:
+        cluster.stop()
+
+    print_section("DEMONSTRATION COMPLETE")
+    for (title, *_), rows in zip(SCENARIOS, reports):
+        print(f"📊 {title}")
+        print_replica_report(rows)
+        print()
+    print(f"📁 Per-second time series recorded in {run_dir}/")
+
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Auto-scaling and bottleneck demonstration")
+    parser.add_argument("service_url", nargs="?", help="service URL, e.g. http://34.123.45.67")
+    parser.add_argument("--local", action="store_true",
+                        help="run replicas on this machine instead of the GKE cluster")
+    parser.add_argument("--balance", choices=["round_robin", "least_connections"],
+                        default="round_robin", help="local proxy's balancing (default: round_robin)")
+    parser.add_argument("--cpu-limit", type=float,
+                        help="CPU cores per local replica (default: k8s/deployment.yaml's limit, 0 for none)")
+    parser.add_argument("--sync-period", type=float, default=15.0,
+                        help="seconds between local autoscaler runs (default: 15)")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="run the local autoscaler's clock this many times faster (default: 1)")
+    args = parser.parse_args()
+
+    run_dir = os.path.join("load_runs", datetime.now().strftime("%Y%m%d-%H%M%S"))
+    if args.local:
+        run_local(args, run_dir)
+        return
+    if not args.service_url:
         print("Usage: python bottleneck_demo.py <SERVICE-IP>")
+        print("       python bottleneck_demo.py --local")
         print("Example: python bottleneck_demo.py http://34.123.45.67")
         sys.exit(1)
     
-    service_url = sys.argv[1].rstrip('/')
+    service_url = args.service_url.rstrip('/')
     
     print_section("WEEK 7: AUTO-SCALING & BOTTLENECK DEMONSTRATION")
     
@@ -56,9 +145,7 @@ def main():
     print_section("SCENARIO 1: NORMAL LOAD (100 requests)")
     print("Expected: 1 pod, CPU <50%, no scaling\n")
     
-    subprocess.run([
-        'python', 'load_test.py', service_url, '100', '5'
-    ])
+    run_scenario_load(service_url, 100, 5, run_dir, 1)
     
     time.sleep(5)
     run_kubectl_command("get hpa iris-classifier-hpa", "HPA After Normal Load")
@@ -69,9 +156,7 @@ def main():
     print_section("SCENARIO 2: HIGH LOAD WITH AUTO-SCALING (1000 requests)")
     print("Expected: Scales from 1 → 2 → 3 pods\n")
     
-    subprocess.run([
-        'python', 'load_test.py', service_url, '1000', '10'
-    ])
+    run_scenario_load(service_url, 1000, 10, run_dir, 2)
     
     print("\n⏳ Waiting 10 seconds for scaling to occur...")
     time.sleep(10)
@@ -100,9 +185,7 @@ def main():
     run_kubectl_command("get hpa iris-classifier-hpa", "HPA (maxReplicas=1)")
     
     print("\n🔥 Running 1000 requests with only 1 pod allowed...")
-    subprocess.run([
-        'python', 'load_test.py', service_url, '1000', '10'
-    ])
+    run_scenario_load(service_url, 1000, 10, run_dir, 3)
     
     time.sleep(5)
     run_kubectl_command("get hpa iris-classifier-hpa", "HPA Status (Bottlenecked)")
@@ -113,9 +196,7 @@ def main():
     print_section("SCENARIO 4: EXTREME BOTTLENECK (2000 requests, 1 pod)")
     print("Expected: High failures, timeouts, degraded performance\n")
     
-    subprocess.run([
-        'python', 'load_test.py', service_url, '2000', '20'
-    ])
+    run_scenario_load(service_url, 2000, 20, run_dir, 4)
     
     time.sleep(5)
     run_kubectl_command("get hpa iris-classifier-hpa", "HPA Final State")
@@ -136,6 +217,8 @@ def main():
     print("   • Scenario 2: Auto-scaling works (1→3 pods)")
     print("   • Scenario 3: Bottleneck with 1 pod restriction")
     print("   • Scenario 4: Severe degradation at 2000 requests")
+    print(f"\n📁 Per-second time series recorded in {run_dir}/")
+    print(f"   Compare: python load_runs.py compare {run_dir}/scenario2.jsonl {run_dir}/scenario3.jsonl")
     print("\n📝 Results ready for documentation!")
 
 if __name__ == "__main__":
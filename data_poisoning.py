@@ -7,6 +7,8 @@ import pandas as pd
 import numpy as np
 from typing import Tuple
 
+from dataset import load_frame
+
 def poison_data(df: pd.DataFrame, poison_rate: float, random_state: int = 42) -> Tuple[pd.DataFrame, list]:
     """
     Poison dataset by randomly corrupting feature values
@@ -59,7 +61,13 @@ def create_poisoned_datasets(original_csv: str, poison_rates: list = [0.05, 0.10
         Dictionary of {rate: (poisoned_df, indices)}
     """
     # Load clean data
-    df_clean = pd.read_csv(original_csv)
+    df_clean = load_frame(original_csv)
+    # The cache holds float32 features; their shortest decimal form gives
+    # back the CSV's values, so clean rows are written out unchanged
+    feature_cols = ['sepal_length', 'sepal_width', 'petal_length', 'petal_width']
+    df_clean = df_clean.assign(**{
+        col: df_clean[col].to_numpy().astype(str).astype(np.float64) for col in feature_cols
+    })
     print(f"📊 Loaded clean data: {len(df_clean)} samples\n")
     
     poisoned_datasets = {}
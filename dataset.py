@@ -0,0 +1,141 @@
+"""
+Dataset Loading with a Parsed Cache
+Parses a CSV once into binary columns and memory-maps them on later loads
+
+The first load of a CSV parses it with pandas and writes a cache entry:
+the features as a float32 matrix (features.npy), the species as
+categorical codes (species.npy) and the column and class names
+(meta.json). Entries live in a .cache directory next to the CSV (or in
+DATASET_CACHE_DIR) and are named after a hash of the file's contents, so
+editing the CSV changes the key and the stale entry is replaced. Later
+loads hash the file, which is much cheaper than parsing it, and
+memory-map the arrays, so nothing is parsed or copied up front.
+
+Decision trees train on float32 features whatever they are given, so
+the cache loses nothing that training uses.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+LABEL = "species"
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR")
+HASH_CHUNK = 1 << 20
+
+
+class Dataset:
+    """Float32 feature matrix, species codes and class names of a CSV file"""
+
+    def __init__(self, features, feature_names, codes, classes, source=None):
+        self.features = features
+        self.feature_names = feature_names
+        self.codes = codes
+        self.classes = classes
+        self.source = source
+
+    def __len__(self):
+        return len(self.features)
+
+    def labels(self):
+        """Species names, one per row"""
+        return np.asarray(self.classes, dtype=object)[self.codes]
+
+    def frame(self):
+        """DataFrame of the features (sharing the mapped matrix) and a categorical species column"""
+        frame = pd.DataFrame(self.features, columns=self.feature_names, copy=False)
+        frame[LABEL] = pd.Categorical.from_codes(self.codes, self.classes)
+        return frame
+
+
+def content_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(path, digest, cache_dir=None):
+    directory = cache_dir or CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(path)), ".cache")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(directory, f"{stem}-{digest}")
+
+
+def parse_csv(path):
+    """Dataset of a CSV: every column but species must be numeric"""
+    data = pd.read_csv(path)
+    if LABEL not in data.columns:
+        raise ValueError(f"{path} has no {LABEL} column")
+    feature_names = [name for name in data.columns if name != LABEL]
+    non_numeric = [name for name in feature_names if not pd.api.types.is_numeric_dtype(data[name])]
+    if non_numeric:
+        raise ValueError(f"Non-numeric feature columns in {path}: {', '.join(non_numeric)}")
+
+    species = pd.Categorical(data[LABEL])
+    return Dataset(
+        np.ascontiguousarray(data[feature_names].to_numpy(np.float32)),
+        feature_names, species.codes, [str(name) for name in species.categories], path
+    )
+
+
+def write_cache(dataset, entry):
+    """Write an entry atomically and remove older entries of the same file"""
+    directory, name = os.path.split(entry)
+    os.makedirs(directory, exist_ok=True)
+    staging = f"{entry}.tmp-{os.getpid()}"
+    os.makedirs(staging, exist_ok=True)
+    np.save(os.path.join(staging, "features.npy"), dataset.features)
+    np.save(os.path.join(staging, "species.npy"), dataset.codes)
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump({
+            "feature_names": dataset.feature_names,
+            "classes": dataset.classes,
+            "rows": len(dataset),
+            "source": dataset.source,
+        }, f)
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        # another process cached the same contents first
+        shutil.rmtree(staging, ignore_errors=True)
+
+    stem = name.rsplit("-", 1)[0]
+    for other in os.listdir(directory):
+        if other != name and other.rsplit("-", 1)[0] == stem and ".tmp-" not in other:
+            shutil.rmtree(os.path.join(directory, other), ignore_errors=True)
+
+
+def read_cache(entry, source=None):
+    with open(os.path.join(entry, "meta.json")) as f:
+        meta = json.load(f)
+    return Dataset(
+        np.load(os.path.join(entry, "features.npy"), mmap_mode="r"),
+        meta["feature_names"],
+        np.load(os.path.join(entry, "species.npy"), mmap_mode="r"),
+        meta["classes"],
+        source,
+    )
+
+
+def load_dataset(path, cache_dir=None):
+    """Dataset of a CSV, from the cache when its contents were loaded before"""
+    entry = cache_path(path, content_hash(path), cache_dir)
+    if not os.path.isdir(entry):
+        dataset = parse_csv(path)
+        try:
+            write_cache(dataset, entry)
+        except OSError as e:
+            # a read-only data directory only costs the speed-up
+            print(f"⚠️  Could not cache {path}: {e}")
+            return dataset
+    return read_cache(entry, path)
+
+
+def load_frame(path, cache_dir=None):
+    """load_dataset(path) as a DataFrame"""
+    return load_dataset(path, cache_dir).frame()
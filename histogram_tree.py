@@ -0,0 +1,408 @@
+"""
+Out-of-Core Histogram Tree Training
+Grows a decision tree from per-bin class counts of a dataset streamed in
+chunks, so that memory stays bounded however many rows there are
+
+Training reads the data twice and never holds more than one chunk of it:
+
+1. A pass counts the rows, collects the class names and keeps a uniform
+   reservoir sample of SAMPLE_ROWS rows, whose quantiles become at most
+   `max_bins` bins per feature (every distinct value gets its own bin
+   when there are few enough, as in the IRIS measurements).
+2. A pass bins every row into a one byte code per feature and writes the
+   codes, the class and whether the row is held out for evaluation to
+   scratch files on disk (in a temporary directory under `scratch_dir`),
+   6 bytes per row.
+
+The tree then grows a level at a time. Each level is one pass over the
+scratch files, read back a chunk at a time, that routes every training
+row to its node and adds it to that node's [feature, bin, class] count
+histogram; the best Gini split of every node comes out of cumulative
+sums over its histogram, so a level costs the same whatever the number
+of candidate thresholds. Nodes are histogrammed in groups that fit in
+HISTOGRAM_BYTES. Thresholds sit halfway between the largest value of the
+last bin going left and the smallest of the first bin going right, as
+scikit-learn places them between neighbouring values, so the exported
+tree sends every row exactly where training did.
+
+The result is a plain scikit-learn DecisionTreeClassifier, which the API,
+model_reload.py and tree_engine.py load like any other.
+
+Usage: python train.py --out-of-core [--data PATH] [--chunk-rows N]
+           [--max-depth 3] [--min-samples-split 2] [--min-samples-leaf 1]
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.tree._tree import NODE_DTYPE, Tree
+
+FEATURE_NAMES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+LABEL = "species"
+
+MAX_BINS = 255
+CHUNK_ROWS = 1_000_000
+SAMPLE_ROWS = 200_000
+HISTOGRAM_BYTES = 256 << 20
+SCRATCH_FILES = ("codes", "labels", "held_out")
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+def csv_chunks(path, feature_names=FEATURE_NAMES, chunk_rows=CHUNK_ROWS):
+    """Callable starting a new stream of (float32 features, labels) chunks of a CSV"""
+    def chunks():
+        reader = pd.read_csv(path, usecols=[*feature_names, LABEL], chunksize=chunk_rows)
+        for frame in reader:
+            yield frame[feature_names].to_numpy(np.float32), frame[LABEL].to_numpy()
+    return chunks
+
+
+def array_chunks(features, labels, chunk_rows=CHUNK_ROWS):
+    """The same for arrays, e.g. a memory-mapped dataset cache entry"""
+    def chunks():
+        for start in range(0, len(features), chunk_rows):
+            yield (np.asarray(features[start:start + chunk_rows], dtype=np.float32),
+                   np.asarray(labels[start:start + chunk_rows]))
+    return chunks
+
+
+def bin_edges(sample, max_bins=MAX_BINS):
+    """
+    Upper edges of each feature's bins, from a sample of rows
+
+    Bin b of a feature holds the values in (edges[b - 1], edges[b]], the
+    last bin everything above the last edge.
+    """
+    edges = []
+    for column in sample.T:
+        distinct = np.unique(column)
+        if len(distinct) <= max_bins:
+            upper = distinct[:-1]
+        else:
+            quantiles = np.linspace(0, 1, max_bins + 1)[1:-1]
+            upper = np.unique(np.quantile(column, quantiles, method="inverted_cdf"))
+        edges.append(upper.astype(np.float32))
+    return edges
+
+
+class HistogramTreeTrainer:
+    """Level-wise Gini decision tree trained from streamed chunks"""
+
+    def __init__(self, max_depth=3, min_samples_split=2, min_samples_leaf=1,
+                 max_bins=MAX_BINS, holdout=0.3, sample_rows=SAMPLE_ROWS,
+                 histogram_bytes=HISTOGRAM_BYTES, chunk_rows=CHUNK_ROWS, random_state=42,
+                 scratch_dir=None, log=print):
+        if max_depth is not None and max_depth < 1:
+            raise ValueError("max_depth must be at least 1")
+        if min_samples_split < 2:
+            raise ValueError("min_samples_split must be at least 2")
+        if min_samples_leaf < 1:
+            raise ValueError("min_samples_leaf must be at least 1")
+        if not 2 <= max_bins <= 256:
+            raise ValueError("max_bins must be between 2 and 256")
+        if not 0 <= holdout < 1:
+            raise ValueError("holdout must be in [0, 1)")
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be at least 1")
+        self.max_depth = max_depth
+        self.min_samples_split = min_samples_split
+        self.min_samples_leaf = min_samples_leaf
+        self.max_bins = max_bins
+        self.holdout = holdout
+        self.sample_rows = sample_rows
+        self.histogram_bytes = histogram_bytes
+        self.chunk_rows = chunk_rows
+        self.random_state = random_state
+        self.scratch_dir = scratch_dir
+        self.log = log
+
+    def fit(self, chunks, feature_names=FEATURE_NAMES):
+        """
+        Train on the rows of `chunks()`, a callable starting a new stream
+        of (features, labels) chunks (see csv_chunks and array_chunks)
+
+        Sets n_rows_, n_train_, n_holdout_, holdout_accuracy_ (None
+        without held-out rows) and passes_ (over the scratch files).
+        """
+        start = time.perf_counter()
+        self.feature_names = list(feature_names)
+        sample = self._sketch(chunks)
+        self.edges = bin_edges(sample, self.max_bins)
+        self.n_bins = max(len(edges) for edges in self.edges) + 1
+
+        with tempfile.TemporaryDirectory(dir=self.scratch_dir) as scratch:
+            self._bin(chunks, scratch)
+            self.log(f"   Binned {self.n_rows_:,} rows into at most {self.n_bins} bins "
+                     f"per feature ({time.perf_counter() - start:.1f}s)")
+            self._grow()
+            self.holdout_accuracy_ = self._evaluate() if self.n_holdout_ else None
+        self.log(f"   {self.node_count} nodes, depth {self.depth}, {self.passes_} passes "
+                 f"({time.perf_counter() - start:.1f}s)")
+        return self
+
+    def _sketch(self, chunks):
+        """First pass: row count, class names and a reservoir sample of the features"""
+        rng = np.random.default_rng(self.random_state)
+        n_features = len(self.feature_names)
+        sample = np.empty((self.sample_rows, n_features), np.float32)
+        classes = set()
+        seen = 0
+        for X, labels in chunks():
+            if X.shape[1] != n_features:
+                raise ValueError(f"Chunks have {X.shape[1]} features, expected {n_features}")
+            if np.isnan(X).any():
+                raise ValueError("Features must not be missing")
+            classes.update(pd.unique(labels).tolist())
+
+            fill = max(0, min(len(X), self.sample_rows - seen))
+            sample[seen:seen + fill] = X[:fill]
+            rest = X[fill:]
+            if len(rest):
+                # Algorithm R: row i replaces a random slot with probability size / (i + 1)
+                index = np.arange(seen + fill, seen + len(X))
+                slots = (rng.random(len(rest)) * (index + 1)).astype(np.int64)
+                keep = slots < self.sample_rows
+                sample[slots[keep]] = rest[keep]
+            seen += len(X)
+
+        if not seen:
+            raise ValueError("No rows to train on")
+        if len(classes) > 255:
+            raise ValueError(f"{len(classes)} classes, at most 255 are supported")
+        self.n_rows_ = seen
+        self.classes = sorted(classes)
+        return sample[:min(seen, self.sample_rows)]
+
+    def _bin(self, chunks, scratch):
+        """Second pass: bin codes, class codes and the held-out mask, to scratch files"""
+        n_features = len(self.feature_names)
+        self.bin_min = np.full((n_features, self.n_bins), np.inf, np.float32)
+        self.bin_max = np.full((n_features, self.n_bins), -np.inf, np.float32)
+        self._scratch = {name: os.path.join(scratch, name) for name in SCRATCH_FILES}
+
+        # One draw per row in order, so the held-out rows do not depend on the chunk size
+        rng = np.random.default_rng(self.random_state)
+        rows = held_out_rows = 0
+        files = {name: open(path, "wb") for name, path in self._scratch.items()}
+        try:
+            for X, labels in chunks():
+                codes = np.empty(X.shape, np.uint8)
+                for f, edges in enumerate(self.edges):
+                    codes[:, f] = np.searchsorted(edges, X[:, f], side="left")
+                    np.minimum.at(self.bin_min[f], codes[:, f], X[:, f])
+                    np.maximum.at(self.bin_max[f], codes[:, f], X[:, f])
+                held_out = rng.random(len(X)) < self.holdout
+                files["codes"].write(codes.tobytes())
+                files["labels"].write(
+                    pd.Categorical(labels, categories=self.classes).codes.astype(np.uint8).tobytes()
+                )
+                files["held_out"].write(held_out.tobytes())
+                rows += len(X)
+                held_out_rows += int(np.count_nonzero(held_out))
+        finally:
+            for f in files.values():
+                f.close()
+        if rows != self.n_rows_:
+            raise ValueError(f"The second pass read {rows} rows, the first {self.n_rows_}")
+
+        self.n_holdout_ = held_out_rows
+        self.n_train_ = rows - held_out_rows
+        if not self.n_train_:
+            raise ValueError("Every row was held out")
+
+    def _binned_chunks(self):
+        """(codes, class codes, held-out mask) chunks of the scratch files"""
+        n_features = len(self.feature_names)
+        for start in range(0, self.n_rows_, self.chunk_rows):
+            count = min(self.chunk_rows, self.n_rows_ - start)
+            yield (
+                np.fromfile(self._scratch["codes"], np.uint8, count * n_features,
+                            offset=start * n_features).reshape(count, n_features),
+                np.fromfile(self._scratch["labels"], np.uint8, count, offset=start),
+                np.fromfile(self._scratch["held_out"], np.bool_, count, offset=start),
+            )
+
+    def _grow(self):
+        """Split every node of a level from its histogram, one pass per level"""
+        self._feature = [TREE_UNDEFINED]
+        self._split_bin = [0]
+        self._left = [TREE_LEAF]
+        self._right = [TREE_LEAF]
+        self._counts = [None]
+        self.passes_ = 0
+        self.depth = 0
+
+        n_features, n_classes = len(self.feature_names), len(self.classes)
+        group = max(1, self.histogram_bytes // (n_features * self.n_bins * n_classes * 8))
+        frontier = [0]
+        depth = 0
+        while frontier:
+            level = []
+            for first in range(0, len(frontier), group):
+                nodes = frontier[first:first + group]
+                histograms = self._histograms(nodes)
+                for node, histogram in zip(nodes, histograms):
+                    level.extend(self._split(node, histogram, depth))
+            frontier = level
+            depth += 1
+            if level:
+                self.depth = depth
+
+    def _arrays(self):
+        return (np.array(self._feature, np.intp), np.array(self._split_bin, np.intp),
+                np.array(self._left, np.intp), np.array(self._right, np.intp))
+
+    def _route(self, codes, arrays):
+        """Node of every row of a chunk of codes: a leaf, or a node not split yet"""
+        feature, split_bin, left, right = arrays
+        node = np.zeros(len(codes), np.intp)
+        rows = np.arange(len(codes))
+        while len(rows):
+            at = node[rows]
+            internal = feature[at] >= 0
+            rows, at = rows[internal], at[internal]
+            go_left = codes[rows, feature[at]] <= split_bin[at]
+            node[rows] = np.where(go_left, left[at], right[at])
+        return node
+
+    def _histograms(self, nodes):
+        """[node, feature, bin, class] counts of the training rows reaching `nodes`"""
+        n_features, n_bins, n_classes = len(self.feature_names), self.n_bins, len(self.classes)
+        arrays = self._arrays()
+        slot = np.full(len(self._feature), -1, np.intp)
+        slot[nodes] = np.arange(len(nodes))
+        size = len(nodes) * n_features * n_bins * n_classes
+        counts = np.zeros(size, np.int64)
+
+        for codes, labels, held_out in self._binned_chunks():
+            at = slot[self._route(codes, arrays)]
+            keep = (at >= 0) & ~held_out
+            codes, labels, at = codes[keep], labels[keep].astype(np.intp), at[keep]
+            for f in range(n_features):
+                index = ((at * n_features + f) * n_bins + codes[:, f]) * n_classes + labels
+                # in place: a bincount per feature would be a second histogram
+                np.add.at(counts, index, 1)
+        self.passes_ += 1
+        return counts.reshape(len(nodes), n_features, n_bins, n_classes)
+
+    def _split(self, node, histogram, depth):
+        """Make `node` a leaf or split it, returning its children"""
+        counts = histogram[0].sum(axis=0)
+        self._counts[node] = counts
+        n = counts.sum()
+        if (self.max_depth is not None and depth >= self.max_depth
+                or n < self.min_samples_split or n < 2 * self.min_samples_leaf
+                or gini(counts) <= 0):
+            return []
+
+        best = self._best_split(histogram, counts)
+        if best is None:
+            return []
+        feature, split_bin = best
+        left, right = len(self._feature), len(self._feature) + 1
+        self._feature[node], self._split_bin[node] = feature, split_bin
+        self._left[node], self._right[node] = left, right
+        for _ in (left, right):
+            self._feature.append(TREE_UNDEFINED)
+            self._split_bin.append(0)
+            self._left.append(TREE_LEAF)
+            self._right.append(TREE_LEAF)
+            self._counts.append(None)
+        return [left, right]
+
+    def _best_split(self, histogram, counts):
+        """(feature, last bin going left) of the lowest weighted Gini impurity, or None"""
+        n = counts.sum()
+        left = np.cumsum(histogram, axis=1)[:, :-1].astype(np.float64)
+        right = counts - left
+        n_left, n_right = left.sum(axis=2), right.sum(axis=2)
+        valid = (n_left >= self.min_samples_leaf) & (n_right >= self.min_samples_leaf)
+        if not valid.any():
+            return None
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            impurity = (
+                n_left - (left ** 2).sum(axis=2) / n_left
+                + n_right - (right ** 2).sum(axis=2) / n_right
+            ) / n
+        impurity[~valid] = np.inf
+        feature, split_bin = np.unravel_index(np.argmin(impurity), impurity.shape)
+        if gini(counts) - impurity[feature, split_bin] <= 1e-12:
+            return None
+        return int(feature), int(split_bin)
+
+    def threshold(self, feature, split_bin):
+        """Midpoint between the values on either side of a split's bins"""
+        below = self.bin_max[feature, :split_bin + 1]
+        above = self.bin_min[feature, split_bin + 1:]
+        low = float(below[np.isfinite(below)].max())
+        high = float(above[np.isfinite(above)].min())
+        threshold = (low + high) / 2
+        return low if threshold == high else threshold
+
+    def _evaluate(self):
+        """Accuracy on the held-out rows, routed by their bin codes"""
+        arrays = self._arrays()
+        predicted = np.array([
+            np.argmax(counts) if counts is not None else 0 for counts in self._counts
+        ])
+        correct = 0
+        for codes, labels, held_out in self._binned_chunks():
+            leaves = self._route(codes[held_out], arrays)
+            correct += np.count_nonzero(predicted[leaves] == labels[held_out])
+        self.passes_ += 1
+        return correct / self.n_holdout_
+
+    @property
+    def node_count(self):
+        return len(self._feature)
+
+    def to_sklearn(self):
+        """The tree as a fitted scikit-learn DecisionTreeClassifier"""
+        n_features, n_classes = len(self.feature_names), len(self.classes)
+        nodes = np.zeros(self.node_count, dtype=NODE_DTYPE)
+        values = np.zeros((self.node_count, 1, n_classes))
+        for node in range(self.node_count):
+            counts = self._counts[node]
+            feature = self._feature[node]
+            record = nodes[node]
+            record["left_child"] = self._left[node]
+            record["right_child"] = self._right[node]
+            record["feature"] = feature
+            record["threshold"] = (
+                self.threshold(feature, self._split_bin[node]) if feature >= 0 else TREE_UNDEFINED
+            )
+            record["impurity"] = gini(counts)
+            record["n_node_samples"] = counts.sum()
+            record["weighted_n_node_samples"] = counts.sum()
+            values[node, 0] = counts
+
+        tree = Tree(n_features, np.array([n_classes], dtype=np.intp), 1)
+        tree.__setstate__({
+            "max_depth": self.depth, "node_count": self.node_count,
+            "nodes": nodes, "values": values,
+        })
+
+        model = DecisionTreeClassifier(
+            max_depth=self.max_depth, min_samples_split=self.min_samples_split,
+            min_samples_leaf=self.min_samples_leaf, random_state=self.random_state,
+        )
+        model.tree_ = tree
+        model.classes_ = np.array(self.classes, dtype=object)
+        model.n_classes_ = n_classes
+        model.n_outputs_ = 1
+        model.n_features_in_ = n_features
+        model.feature_names_in_ = np.array(self.feature_names, dtype=object)
+        model.max_features_ = n_features
+        return model
+
+
+def gini(counts):
+    n = counts.sum()
+    return 1.0 - float(((counts / n) ** 2).sum())
@@ -0,0 +1,256 @@
+"""
+Parallel Hyperparameter Search
+Spreads decision tree candidates over a process pool, can discard weak
+ones early by successive halving, and logs each worker's share of the
+search as its own MLflow run
+
+A search space is declarative, a dict or a JSON file such as
+search_spaces/decision_tree_grid.json:
+
+    {
+      "strategy": "grid",
+      "params": {
+        "max_depth": {"range": [1, 21]},
+        "min_samples_leaf": [1, 2, 4, 8],
+        "criterion": ["gini", "entropy"]
+      }
+    }
+
+"grid" tries every combination of the values, given as lists or as
+{"range": [start, stop(, step)]}. "random" draws `samples` candidates
+(seeded by `seed`), each value from a list or from {"randint": [low,
+high]} (inclusive), {"uniform": [low, high]} or {"loguniform": [low,
+high]}.
+
+Worker processes receive the data once, when they start, and each round
+hands every worker a single interleaved share of the candidates, so the
+overhead per round does not grow with the number of candidates. With
+successive halving every rung fits the remaining candidates on `eta`
+times more training rows than the one before and keeps the best 1/eta,
+the last rung using the whole training set.
+
+Usage: python hyperparameter_search.py [--space PATH] [--workers N]
+           [--halving] [--eta 3] [--no-mlflow]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import math
+import os
+import random
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+from dataset import load_frame
+
+FEATURE_NAMES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+RANDOM_STATE = 42
+
+DEFAULT_SPACE = {
+    "strategy": "grid",
+    "params": {
+        "max_depth": [3, 5, 7, 10, None],
+        "min_samples_split": [2, 5, 10],
+        "min_samples_leaf": [1, 2, 4],
+        "criterion": ["gini", "entropy"],
+    },
+}
+
+
+def load_space(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def grid_values(values):
+    if isinstance(values, dict):
+        return list(range(*values["range"]))
+    return list(values)
+
+
+def draw(values, rng):
+    """One value of a random search parameter"""
+    if isinstance(values, list):
+        return rng.choice(values)
+    (kind, (low, high)), = values.items()
+    if kind == "randint":
+        return rng.randint(low, high)
+    if kind == "uniform":
+        return rng.uniform(low, high)
+    if kind == "loguniform":
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    raise ValueError(f"Unknown distribution {kind!r}")
+
+
+def candidates(space):
+    """Parameter dicts of a search space"""
+    params = space["params"]
+    strategy = space.get("strategy", "grid")
+    if strategy == "grid":
+        names = list(params)
+        grids = [grid_values(params[name]) for name in names]
+        return [dict(zip(names, values)) for values in itertools.product(*grids)]
+    if strategy == "random":
+        rng = random.Random(space.get("seed", 0))
+        return [
+            {name: draw(values, rng) for name, values in params.items()}
+            for _ in range(space["samples"])
+        ]
+    raise ValueError(f"Unknown search strategy {strategy!r}")
+
+
+def rung_sizes(n_candidates, n_train, eta, min_resources):
+    """Training rows of each successive halving rung, ending with n_train"""
+    rungs = 1
+    while eta ** rungs <= n_candidates and min_resources * eta ** rungs <= n_train:
+        rungs += 1
+    return [n_train // eta ** (rungs - 1 - rung) for rung in range(rungs)]
+
+
+# Per worker process, set by _init_worker
+_data = None
+_tracking = None
+
+
+def _init_worker(data, tracking):
+    global _data, _tracking
+    _data = data
+    _tracking = tracking
+
+
+def _evaluate(task):
+    """Fit and score one share of the candidates on the first n_samples training rows"""
+    rung, worker, n_samples, share = task
+    X_train, y_train, X_val, y_val = _data
+    X_fit, y_fit = X_train[:n_samples], y_train[:n_samples]
+
+    start = time.perf_counter()
+    results = []
+    for candidate_id, params in share:
+        model = DecisionTreeClassifier(random_state=RANDOM_STATE, **params).fit(X_fit, y_fit)
+        accuracy = float(np.mean(model.predict(X_val) == y_val))
+        results.append({"id": candidate_id, "params": params, "accuracy": accuracy})
+    elapsed = time.perf_counter() - start
+
+    if _tracking:
+        _log_share(rung, worker, n_samples, results, elapsed)
+    return results
+
+
+def _log_share(rung, worker, n_samples, results, elapsed):
+    """One MLflow run, a child of the search's run, per share"""
+    import mlflow
+
+    mlflow.set_tracking_uri(_tracking["uri"])
+    with mlflow.start_run(
+        experiment_id=_tracking["experiment_id"],
+        run_name=f"rung{rung}-worker{worker}",
+        tags={"mlflow.parentRunId": _tracking["parent_run_id"]},
+    ):
+        mlflow.log_params({
+            "rung": rung, "worker": worker, "train_samples": n_samples,
+            "candidates": len(results),
+        })
+        accuracies = [result["accuracy"] for result in results]
+        mlflow.log_metrics({
+            "best_accuracy": max(accuracies),
+            "mean_accuracy": sum(accuracies) / len(accuracies),
+            "fit_seconds": elapsed,
+        })
+        mlflow.log_dict({"candidates": results}, "candidates.json")
+
+
+def ranked(results):
+    """Best accuracy first; ties keep the candidates' order"""
+    return sorted(results, key=lambda result: (-result["accuracy"], result["id"]))
+
+
+def run_search(params_list, X_train, y_train, X_val, y_val, workers=None, halving=False,
+               eta=3, min_resources=None, tracking=None, log=print):
+    """
+    Score every candidate in `params_list` on the validation set
+
+    `tracking` ({"uri", "experiment_id", "parent_run_id"}) makes every
+    worker log each share it evaluates as an MLflow run. Returns
+    {"results": the last rung's results, best first, "rungs": per rung
+    rows, candidates and seconds, "seconds": total}.
+    """
+    X_train, y_train = np.asarray(X_train), np.asarray(y_train)
+    X_val, y_val = np.asarray(X_val), np.asarray(y_val)
+    workers = workers or os.cpu_count()
+    survivors = list(enumerate(params_list))
+    if halving:
+        min_resources = min_resources or 10 * len(np.unique(y_train))
+        sizes = rung_sizes(len(survivors), len(X_train), eta, min_resources)
+    else:
+        sizes = [len(X_train)]
+
+    rungs = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=((X_train, y_train, X_val, y_val), tracking)
+    ) as pool:
+        for rung, n_samples in enumerate(sizes):
+            rung_start = time.perf_counter()
+            tasks = [
+                (rung, worker, n_samples, survivors[worker::workers])
+                for worker in range(min(workers, len(survivors)))
+            ]
+            results = ranked([result for share in pool.map(_evaluate, tasks) for result in share])
+            rungs.append({
+                "rung": rung, "train_samples": n_samples, "candidates": len(results),
+                "seconds": time.perf_counter() - rung_start,
+            })
+            log(f"   Rung {rung}: {len(results)} candidates on {n_samples} rows, "
+                f"best {results[0]['accuracy']:.3f} ({rungs[-1]['seconds']:.1f}s)")
+            if rung < len(sizes) - 1:
+                keep = max(1, math.ceil(len(results) / eta))
+                survivors = [(result["id"], result["params"]) for result in results[:keep]]
+
+    return {"results": results, "rungs": rungs, "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel decision tree hyperparameter search")
+    parser.add_argument("--space", help="JSON search space (default: a small built-in grid)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--halving", action="store_true", help="discard candidates by successive halving")
+    parser.add_argument("--eta", type=int, default=3, help="halving factor (default: 3)")
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--no-mlflow", dest="mlflow", action="store_false",
+                        help="only print the results")
+    args = parser.parse_args()
+
+    space = load_space(args.space) if args.space else DEFAULT_SPACE
+    data = load_frame(args.data)
+    X_train, X_test, y_train, y_test = train_test_split(
+        data[FEATURE_NAMES], data["species"], test_size=0.3, random_state=RANDOM_STATE
+    )
+
+    if args.mlflow:
+        from train_mlflow import hyperparameter_tuning_with_mlflow
+        hyperparameter_tuning_with_mlflow(
+            X_train, y_train, X_test, y_test, space=space,
+            workers=args.workers, halving=args.halving, eta=args.eta
+        )
+        return
+
+    params_list = candidates(space)
+    print(f"🔬 {len(params_list)} candidates")
+    outcome = run_search(
+        params_list, X_train, y_train, X_test, y_test,
+        workers=args.workers, halving=args.halving, eta=args.eta
+    )
+    print(f"\n🏆 Best Parameters: {outcome['results'][0]['params']}")
+    print(f"🏆 Best Accuracy: {outcome['results'][0]['accuracy']:.3f}")
+    print(f"⏱️  {outcome['seconds']:.1f}s, "
+          f"{sum(rung['candidates'] for rung in outcome['rungs']) / outcome['seconds']:.0f} fits/s")
+
+
+if __name__ == "__main__":
+    main()
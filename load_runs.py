@@ -0,0 +1,290 @@
+"""
+Load Test Run Recording
+Per-second time series of load test runs, saved as JSON Lines next to the
+run's metadata, and a report lining up several runs
+
+A run file holds one {"run": metadata} line, one line per second of the
+run - completed requests, rows scored, errors, 429s and latency
+percentiles of the requests that finished in that second - and a final
+{"summary": ...} line with the run's overall results. Plain text with one
+line per second keeps the files small, diffable and easy to plot.
+
+Usage: python load_runs.py show RUN
+       python load_runs.py compare RUN RUN [RUN ...] [--metrics ok,p99_ms] [--every N]
+"""
+
+import argparse
+from datetime import datetime
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+
+# Per-second latency percentiles written to run files, in ms
+SECOND_PERCENTILES = (50, 90, 99)
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram
+
+    Latencies are counted per microsecond up to 256us; above that each
+    power-of-two range is split into 128 equal buckets, so every value is
+    kept to within 1% from microseconds to hours in a few thousand
+    counters, however long the run.
+    """
+
+    SIGNIFICANT_BITS = 8
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = max(0, round(seconds * 1_000_000))
+        shift = max(0, micros.bit_length() - self.SIGNIFICANT_BITS)
+        key = (shift, micros >> shift)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Latency in seconds that `percent` of the recorded values do not exceed"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for (shift, top), count in sorted(self.counts.items()):
+            seen += count
+            if seen >= rank:
+                # the highest value the bucket stands for, like HdrHistogram
+                return min(self.max, (((top + 1) << shift) - 1) / 1_000_000)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+def run_metadata(**fields):
+    """Metadata of a run: `fields` plus when, where and from which commit"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        **fields,
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "commit": commit,
+    }
+
+
+class RunRecorder:
+    """
+    Per-second time series of one run
+
+    Requests are counted in the second they finish in, counted from
+    start(). Only successful requests contribute to latency.
+    """
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.started = None
+        self.buckets = {}
+
+    def start(self, started):
+        """Set the run's time origin (a perf_counter time)"""
+        self.started = started
+
+    def record(self, finished, latency, status, rows=1):
+        second = max(0, int(finished - self.started))
+        bucket = self.buckets.get(second)
+        if bucket is None:
+            bucket = self.buckets[second] = {
+                "ok": 0, "rows": 0, "errors": 0, "shed": 0, "latency": LatencyHistogram()
+            }
+        if status == 200:
+            bucket["ok"] += 1
+            bucket["rows"] += rows
+            bucket["latency"].record(latency)
+        elif status == 429:
+            bucket["shed"] += 1
+        else:
+            bucket["errors"] += 1
+
+    def seconds(self):
+        """One record per second of the run, including seconds with no completions"""
+        records = []
+        for second in range(max(self.buckets, default=-1) + 1):
+            bucket = self.buckets.get(second)
+            if bucket is None:
+                records.append({"second": second, "ok": 0, "rows": 0, "errors": 0, "shed": 0})
+                continue
+            latency = bucket["latency"]
+            record = {key: bucket[key] for key in ("ok", "rows", "errors", "shed")}
+            for percent in SECOND_PERCENTILES:
+                record[f"p{percent}_ms"] = round(latency.percentile(percent) * 1000, 3)
+            record["max_ms"] = round(latency.max * 1000, 3)
+            records.append({"second": second, **record})
+        return records
+
+    def save(self, path, summary):
+        """Write the run file; `summary` values that are not JSON are left out"""
+        summary = {
+            key: value for key, value in summary.items()
+            if isinstance(value, (int, float, str, bool)) or value is None
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(json.dumps({"run": self.metadata}) + "\n")
+            for record in self.seconds():
+                f.write(json.dumps(record) + "\n")
+            f.write(json.dumps({"summary": summary}) + "\n")
+
+
+def load_run(path):
+    """{"path", "run", "seconds", "summary"} of a run file"""
+    run = {"path": path, "run": {}, "seconds": [], "summary": {}}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if "run" in record:
+                run["run"] = record["run"]
+            elif "summary" in record:
+                run["summary"] = record["summary"]
+            else:
+                run["seconds"].append(record)
+    return run
+
+
+def describe(run):
+    meta = run["run"]
+    if meta.get("mode") == "open":
+        load = f"open {meta.get('rate')} req/s x {meta.get('duration')}s"
+    else:
+        load = f"closed {meta.get('requests')} req x {meta.get('workers')} workers"
+    profile = meta.get("profile")
+    if profile:
+        load += f", {os.path.basename(profile)} seed {meta.get('seed')}"
+    return f"{meta.get('name', '?')} | {load} | {meta.get('started', '?')} | commit {meta.get('commit')}"
+
+
+def delta(value, reference):
+    if not reference or value is None:
+        return ""
+    return f" ({(value / reference - 1) * 100:+.0f}%)"
+
+
+# Summary rows of the comparison: (label, summary key)
+SUMMARY_ROWS = [
+    ("Duration s", "total_time"),
+    ("Throughput req/s", "throughput"),
+    ("Success %", "success_rate"),
+    ("Avg ms", "avg_response"),
+    ("P50 ms", "p50"),
+    ("P95 ms", "p95"),
+    ("P99 ms", "p99"),
+    ("P99.9 ms", "p999"),
+    ("Max ms", "max"),
+]
+
+
+def format_cell(value, reference=None):
+    if value is None:
+        return "-"
+    return f"{value:.1f}" + (delta(value, reference) if reference is not None else "")
+
+
+def compare(runs, metrics=("ok", "p99_ms"), every=1):
+    """Print the runs' summaries and per-second metrics side by side, with
+    each run's change relative to the first"""
+    names = [chr(ord("A") + i) for i in range(len(runs))]
+    width = 20
+    print("Runs:")
+    for name, run in zip(names, runs):
+        print(f"   {name}  {run['path']}")
+        print(f"      {describe(run)}")
+
+    header = f"{'':<18}" + "".join(f"{name:>{width}}" for name in names)
+    print(f"\nSummary (change vs A)\n{header}")
+    for label, key in SUMMARY_ROWS:
+        values = [run["summary"].get(key) for run in runs]
+        if all(value is None for value in values):
+            continue
+        cells = [format_cell(values[0])] + [format_cell(v, values[0]) for v in values[1:]]
+        print(f"{label:<18}" + "".join(f"{cell:>{width}}" for cell in cells))
+
+    length = max(len(run["seconds"]) for run in runs)
+    for metric in metrics:
+        print(f"\nPer second: {metric}\n{'Second':<18}" + "".join(f"{n:>{width}}" for n in names))
+        for second in range(0, length, every):
+            values = []
+            for run in runs:
+                window = run["seconds"][second:second + every]
+                found = [record.get(metric) for record in window if record.get(metric) is not None]
+                if not found:
+                    values.append(None)
+                elif metric.endswith("_ms"):
+                    values.append(max(found))
+                else:
+                    values.append(sum(found) / len(window))
+            cells = [format_cell(values[0])] + [format_cell(v, values[0]) for v in values[1:]]
+            print(f"{second:<18}" + "".join(f"{cell:>{width}}" for cell in cells))
+
+
+def show(run):
+    print(describe(run))
+    columns = ["ok", "rows", "errors", "shed"] + [f"p{p}_ms" for p in SECOND_PERCENTILES] + ["max_ms"]
+    print(f"{'second':>6} " + " ".join(f"{c:>9}" for c in columns))
+    for record in run["seconds"]:
+        print(f"{record['second']:>6} " + " ".join(
+            f"{record.get(c, 0):>9}" if not isinstance(record.get(c), float)
+            else f"{record[c]:>9.2f}" for c in columns
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and compare recorded load test runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show_parser = commands.add_parser("show", help="per-second table of one run")
+    show_parser.add_argument("run")
+    compare_parser = commands.add_parser("compare", help="line up two or more runs")
+    compare_parser.add_argument("runs", nargs="+")
+    compare_parser.add_argument("--metrics", default="ok,p99_ms",
+                                help="per-second columns to compare (default: ok,p99_ms)")
+    compare_parser.add_argument("--every", type=int, default=1,
+                                help="aggregate this many seconds per row (default: 1)")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        show(load_run(args.run))
+    else:
+        if len(args.runs) < 2:
+            parser.error("compare needs at least two runs")
+        compare([load_run(path) for path in args.runs], args.metrics.split(","), args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,58 +9,141 @@ import time
 import concurrent.futures
 import statistics
 from datetime import datetime
-import sys
+import argparse
+import asyncio
+import json
+import threading
 
-def make_request(url, request_id):
+import httpx
+
+from load_runs import LatencyHistogram, RunRecorder, run_metadata
+from workload import Request, Workload
+
+SAMPLE = {
+    "sepal_length": 5.1,
+    "sepal_width": 3.5,
+    "petal_length": 1.4,
+    "petal_width": 0.2
+}
+
+DEFAULT_REQUEST = Request("/predict", json.dumps(SAMPLE).encode(), 1)
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# One keep-alive session per worker thread; a Session is not safe to
+# share between threads, but reusing one avoids a new TCP connection
+# (and TIME_WAIT socket) per request
+sessions = threading.local()
+
+def session():
+    current = getattr(sessions, "session", None)
+    if current is None:
+        current = sessions.session = requests.Session()
+    return current
+
+def make_request(url, request_id, request=DEFAULT_REQUEST):
     """Make a single prediction request"""
-    start = time.time()
+    start = time.perf_counter()
     try:
-        response = requests.post(
-            f"{url}/predict",
-            json={
-                "sepal_length": 5.1,
-                "sepal_width": 3.5,
-                "petal_length": 1.4,
-                "petal_width": 0.2
-            },
+        response = session().post(
+            f"{url}{request.path}",
+            data=request.body,
+            headers=JSON_HEADERS,
             timeout=10
         )
-        duration = time.time() - start
+        finished = time.perf_counter()
         return {
             'success': response.status_code == 200,
-            'duration': duration,
-            'status': response.status_code
+            'duration': finished - start,
+            'finished': finished,
+            'status': response.status_code,
+            'endpoint': request.path,
+            'rows': request.rows
         }
     except Exception as e:
+        finished = time.perf_counter()
         return {
             'success': False,
-            'duration': time.time() - start,
+            'duration': finished - start,
+            'finished': finished,
             'status': 0,
+            'endpoint': request.path,
+            'rows': request.rows,
             'error': str(e)
         }
 
-def run_load_test(url, total_requests, concurrent_workers, test_name):
-    """Run load test with specified parameters"""
+def describe_workload(workload):
+    if workload is None:
+        return "fixed /predict sample"
+    name = workload.profile.get("description") or "custom profile"
+    return f"{name} (seed {workload.seed})"
+
+def print_endpoint_breakdown(samples, total_time):
+    """Per-endpoint counts and percentiles of (endpoint, rows, seconds) successes"""
+    by_endpoint = {}
+    for endpoint, rows, seconds in samples:
+        histogram, scored = by_endpoint.setdefault(endpoint, (LatencyHistogram(), [0]))
+        histogram.record(seconds)
+        scored[0] += rows
+    
+    print(f"\n🔀 By Endpoint:")
+    for endpoint, (histogram, scored) in sorted(by_endpoint.items()):
+        print(f"   {endpoint}: {histogram.count} ok | {scored[0]/total_time:.1f} rows/s | "
+              f"P50 {histogram.percentile(50)*1000:.2f}ms | "
+              f"P99 {histogram.percentile(99)*1000:.2f}ms")
+
+def workload_metadata(workload):
+    if workload is None:
+        return {"profile": None, "seed": None}
+    return {"profile": workload.source, "seed": workload.seed}
+
+def run_load_test(url, total_requests, concurrent_workers, test_name, workload=None, record=None):
+    """
+    Run load test with specified parameters
+
+    Requests come from `workload` when given, else every request posts
+    the same sample to /predict. With `record`, the per-second time
+    series and the results are saved to that run file (see load_runs.py).
+    """
     print(f"\n{'='*70}")
     print(f"🔥 {test_name}")
     print(f"{'='*70}")
     print(f"Target: {url}")
     print(f"Requests: {total_requests}")
     print(f"Workers: {concurrent_workers}")
+    print(f"Workload: {describe_workload(workload)}")
     print(f"Started: {datetime.now().strftime('%H:%M:%S')}")
     print(f"{'='*70}\n")
     
+    if workload is None:
+        planned = [DEFAULT_REQUEST] * total_requests
+    else:
+        planned = workload.requests(total_requests)
+    
+    recorder = None
+    if record:
+        recorder = RunRecorder(run_metadata(
+            name=test_name, url=url, mode="closed", requests=total_requests,
+            workers=concurrent_workers, **workload_metadata(workload)
+        ))
+    
     start_time = time.time()
+    if recorder:
+        recorder.start(time.perf_counter())
     results = []
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=concurrent_workers) as executor:
-        futures = [executor.submit(make_request, url, i) for i in range(total_requests)]
+        futures = [
+            executor.submit(make_request, url, i, request)
+            for i, request in enumerate(planned)
+        ]
         
         completed = 0
         for future in concurrent.futures.as_completed(futures):
             result = future.result()
             results.append(result)
             completed += 1
+            if recorder:
+                recorder.record(result['finished'], result['duration'], result['status'], result['rows'])
             
             if completed % 100 == 0:
                 elapsed = time.time() - start_time
@@ -105,12 +188,18 @@ def run_load_test(url, total_requests, concurrent_workers, test_name):
     print(f"   P99: {p99:.2f}ms")
     print(f"   Max: {max_d:.2f}ms")
     
+    if workload is not None:
+        print_endpoint_breakdown(
+            ((r['endpoint'], r['rows'], r['duration']) for r in successful), total_time
+        )
+    
     if failed:
+        shed = sum(1 for r in failed if r['status'] == 429)
         print(f"\n❌ Failed Requests: {len(failed)}")
+        if shed:
+            print(f"   Shed by admission control (429): {shed}")
     
-    print(f"{'='*70}\n")
-    
-    return {
+    summary = {
         'total_time': total_time,
         'throughput': total_requests/total_time,
         'success_rate': len(successful)/total_requests * 100,
@@ -119,15 +208,204 @@ def run_load_test(url, total_requests, concurrent_workers, test_name):
         'p95': p95,
         'p99': p99
     }
+    if recorder:
+        recorder.save(record, summary)
+        print(f"\n📁 Recorded to {record}")
+    
+    print(f"{'='*70}\n")
+    
+    return summary
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python load_test.py <URL> [requests] [workers]")
-        print("Example: python load_test.py http://34.123.45.67 1000 10")
-        sys.exit(1)
+PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99)
+
+async def timed_request(client, url, request, intended):
+    """
+    POST one request scheduled for `intended` (a perf_counter time)
+
+    Returns (status, latency, response time): latency runs from the
+    intended send time, response time from when the request was issued.
+    """
+    issued = time.perf_counter()
+    try:
+        response = await client.post(
+            f"{url}{request.path}",
+            content=request.body,
+            headers=JSON_HEADERS
+        )
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    done = time.perf_counter()
+    return status, done - intended, done - issued
+
+async def open_loop(url, planned, rate, connections, timeout):
+    """Issue the planned requests at fixed intervals, however the server keeps up"""
+    total_requests = len(planned)
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        await timed_request(client, url, DEFAULT_REQUEST, time.perf_counter())  # open a connection
+
+        start = time.perf_counter()
+        tasks = []
+        max_lag = 0.0
+        next_report = 1.0
+        for i, request in enumerate(planned):
+            intended = start + i / rate
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+            tasks.append(asyncio.create_task(timed_request(client, url, request, intended)))
+
+            if intended - start >= next_report:
+                next_report += 1.0
+                completed = sum(task.done() for task in tasks)
+                print(f"Progress: {i + 1}/{total_requests} sent | "
+                      f"{completed} completed | {i + 1 - completed} in flight")
+
+        results = await asyncio.gather(*tasks)
+        total_time = time.perf_counter() - start
+    return results, start, total_time, max_lag
+
+def run_open_loop_test(url, rate, duration, connections, test_name, timeout=10, workload=None,
+                       record=None):
+    """
+    Run an open-loop load test: a constant arrival rate from one asyncio
+    client over at most `connections` keep-alive connections
+
+    Requests are sent on schedule even while earlier ones are still
+    waiting, so a stalling server shows up as latency instead of a slower
+    client (coordinated omission). Latency percentiles are measured from
+    each request's intended send time. Requests come from `workload` when
+    given, and are all built before the first one is sent. With `record`,
+    the per-second time series and the results are saved to that run
+    file (see load_runs.py).
+    """
+    print(f"\n{'='*70}")
+    print(f"🔥 {test_name}")
+    print(f"{'='*70}")
+    print(f"Target: {url}")
+    print(f"Rate: {rate:g} req/s for {duration:g}s (open loop)")
+    print(f"Connections: {connections}")
+    print(f"Workload: {describe_workload(workload)}")
+    print(f"Started: {datetime.now().strftime('%H:%M:%S')}")
+    print(f"{'='*70}\n")
+    
+    total_requests = int(rate * duration)
+    if workload is None:
+        planned = [DEFAULT_REQUEST] * total_requests
+    else:
+        planned = workload.requests(total_requests)
     
-    url = sys.argv[1].rstrip('/')
-    requests_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
-    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    results, start, total_time, max_lag = asyncio.run(
+        open_loop(url, planned, rate, connections, timeout)
+    )
+    recorder = None
+    if record:
+        recorder = RunRecorder(run_metadata(
+            name=test_name, url=url, mode="open", rate=rate, duration=duration,
+            connections=connections, **workload_metadata(workload)
+        ))
+        recorder.start(start)
     
-    run_load_test(url, requests_count, workers, "LOAD TEST")
+    latency = LatencyHistogram()
+    response_time = LatencyHistogram()
+    successful = []
+    shed = 0
+    for i, (request, (status, from_intended, from_issued)) in enumerate(zip(planned, results)):
+        if recorder:
+            recorder.record(start + i / rate + from_intended, from_intended, status, request.rows)
+        if status == 200:
+            successful.append((request.path, request.rows, from_intended))
+            latency.record(from_intended)
+            response_time.record(from_issued)
+        elif status == 429:
+            shed += 1
+    failed = total_requests - len(successful)
+    
+    print(f"\n{'='*70}")
+    print(f"📊 RESULTS")
+    print(f"{'='*70}")
+    print(f"\n⏱️  Duration & Throughput:")
+    print(f"   Total Time: {total_time:.2f}s")
+    print(f"   Target Rate: {rate:.2f} req/s")
+    print(f"   Achieved Rate: {total_requests/total_time:.2f} req/s")
+    print(f"   Max Send Lag: {max_lag*1000:.2f}ms")
+    
+    print(f"\n✅ Success Rate:")
+    print(f"   Successful: {len(successful)}/{total_requests} ({len(successful)/total_requests*100:.1f}%)")
+    print(f"   Failed: {failed}/{total_requests} ({failed/total_requests*100:.1f}%)")
+    if shed:
+        print(f"   Shed by admission control (429): {shed}")
+    
+    print(f"\n📈 Latency Percentiles (from intended send time):")
+    print(f"   Min: {latency.min*1000 if successful else 0:.2f}ms")
+    for percent in PERCENTILES:
+        print(f"   P{percent:g}: {latency.percentile(percent)*1000:.2f}ms")
+    print(f"   Max: {latency.max*1000:.2f}ms")
+    print(f"\n   Response time from actual send: "
+          f"P50 {response_time.percentile(50)*1000:.2f}ms | "
+          f"P99 {response_time.percentile(99)*1000:.2f}ms")
+    
+    if workload is not None:
+        print_endpoint_breakdown(successful, total_time)
+    
+    summary = {
+        'total_time': total_time,
+        'throughput': total_requests/total_time,
+        'success_rate': len(successful)/total_requests * 100,
+        'avg_response': latency.mean() * 1000,
+        'p50': latency.percentile(50) * 1000,
+        'p95': latency.percentile(95) * 1000,
+        'p99': latency.percentile(99) * 1000,
+        'p999': latency.percentile(99.9) * 1000,
+        'max': latency.max * 1000,
+        'max_send_lag': max_lag * 1000,
+        'latency': latency,
+        'response_time': response_time
+    }
+    if recorder:
+        recorder.save(record, summary)
+        print(f"\n📁 Recorded to {record}")
+    
+    print(f"{'='*70}\n")
+    
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the /predict endpoint",
+        epilog="Examples: python load_test.py http://34.123.45.67 1000 10\n"
+               "          python load_test.py http://34.123.45.67 --rate 200 --duration 30\n"
+               "          python load_test.py http://34.123.45.67 --profile workloads/mixed.json",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("url")
+    parser.add_argument("requests", nargs="?", type=int, default=1000,
+                        help="closed loop: total requests (default: 1000)")
+    parser.add_argument("workers", nargs="?", type=int, default=10,
+                        help="closed loop: concurrent threads (default: 10)")
+    parser.add_argument("--rate", type=float,
+                        help="send this many requests per second in an open loop instead")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="open loop: seconds to send for (default: 10)")
+    parser.add_argument("--connections", type=int, default=100,
+                        help="open loop: keep-alive connection pool size (default: 100)")
+    parser.add_argument("--profile",
+                        help="workload profile to replay, e.g. workloads/mixed.json")
+    parser.add_argument("--seed", type=int,
+                        help="override the profile's random seed")
+    parser.add_argument("--record", metavar="PATH",
+                        help="save the per-second time series to this run file; "
+                             "compare runs with load_runs.py")
+    args = parser.parse_args()
+    
+    url = args.url.rstrip('/')
+    workload = Workload.from_file(args.profile, args.seed) if args.profile else None
+    if args.rate:
+        run_open_loop_test(url, args.rate, args.duration, args.connections,
+                           "OPEN-LOOP LOAD TEST", workload=workload, record=args.record)
+    else:
+        run_load_test(url, args.requests, args.workers, "LOAD TEST", workload=workload,
+                      record=args.record)
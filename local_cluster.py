@@ -0,0 +1,735 @@
+"""
+Local Replica Cluster
+Runs app.py replicas as processes on one machine behind a load-balancing
+proxy, scaled by the CPU policy of k8s/hpa.yaml, to study scaling and
+bottlenecks without a Kubernetes cluster
+
+Each replica is started like the container (prefork.py with one worker
+and the container's environment from k8s/deployment.yaml) and can be
+capped to a share of a CPU like a container's CPU limit: a throttler
+stops (SIGSTOP) a replica that has used up its quota of the current
+100ms period until the period ends, as CFS bandwidth control does for a
+cgroup. Replicas join the proxy once /health answers, like a readiness
+probe. The proxy speaks HTTP/1.1 with keep-alive on both sides and picks
+a ready replica for every request, round-robin or with the fewest
+requests in flight.
+
+Every sync period the autoscaler applies the HorizontalPodAutoscaler
+algorithm: desired = ceil(CPU used / (target utilization x CPU request)),
+left alone within a 10% tolerance, stabilized over the behavior windows,
+rate-limited by the scale-up and scale-down policies and kept within
+minReplicas and maxReplicas.
+
+The load generator, the proxy and the replicas share the machine's CPUs,
+so cap the replicas well below the machine's capacity. Linux only: CPU
+time is read from /proc.
+"""
+
+import asyncio
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import yaml
+
+from benchmarks.server import free_port
+from load_runs import LatencyHistogram
+
+K8S_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "k8s")
+HPA_PATH = os.path.join(K8S_DIR, "hpa.yaml")
+DEPLOYMENT_PATH = os.path.join(K8S_DIR, "deployment.yaml")
+
+# The HorizontalPodAutoscaler's defaults for what a manifest leaves out
+DEFAULT_BEHAVIOR = {
+    "scaleUp": {
+        "stabilizationWindowSeconds": 0,
+        "selectPolicy": "Max",
+        "policies": [
+            {"type": "Percent", "value": 100, "periodSeconds": 15},
+            {"type": "Pods", "value": 4, "periodSeconds": 15},
+        ],
+    },
+    "scaleDown": {
+        "stabilizationWindowSeconds": 300,
+        "selectPolicy": "Max",
+        "policies": [{"type": "Percent", "value": 100, "periodSeconds": 15}],
+    },
+}
+TOLERANCE = 0.1
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+HEALTH_REQUEST = b"GET /health HTTP/1.1\r\nhost: localhost\r\nconnection: close\r\n\r\n"
+
+
+def error_response(status, reason, detail, close=False):
+    """Raw HTTP/1.1 response with a JSON error body like the app's"""
+    body = json.dumps({"detail": detail}).encode()
+    connection = "connection: close\r\n" if close else ""
+    return (f"HTTP/1.1 {status} {reason}\r\ncontent-type: application/json\r\n"
+            f"content-length: {len(body)}\r\n{connection}\r\n").encode() + body
+
+
+NO_BACKEND = error_response(503, "Service Unavailable", "No replica is ready")
+BAD_GATEWAY = error_response(502, "Bad Gateway", "Replica did not answer")
+NOT_IMPLEMENTED = error_response(501, "Not Implemented", "Upgrades are not proxied", close=True)
+
+
+def load_hpa(path=HPA_PATH):
+    """Replica bounds, CPU target and scaling behavior of a HorizontalPodAutoscaler manifest"""
+    with open(path) as f:
+        spec = yaml.safe_load(f)["spec"]
+    targets = [
+        metric["resource"]["target"] for metric in spec.get("metrics", [])
+        if metric["type"] == "Resource" and metric["resource"]["name"] == "cpu"
+    ]
+    if not targets:
+        raise ValueError(f"{path} has no CPU utilization target")
+    behavior = spec.get("behavior") or {}
+    return {
+        "min_replicas": spec.get("minReplicas", 1),
+        "max_replicas": spec["maxReplicas"],
+        "target_utilization": targets[0]["averageUtilization"],
+        **{
+            direction: {**DEFAULT_BEHAVIOR[direction], **(behavior.get(direction) or {})}
+            for direction in ("scaleUp", "scaleDown")
+        },
+    }
+
+
+def cpu_quantity(value):
+    """Cores in a Kubernetes CPU quantity such as "200m" or "1.5" """
+    value = str(value)
+    return int(value[:-1]) / 1000 if value.endswith("m") else float(value)
+
+
+def load_container(path=DEPLOYMENT_PATH):
+    """Environment and CPU request and limit (cores, or None) of a Deployment's first container"""
+    with open(path) as f:
+        deployment = next(
+            doc for doc in yaml.safe_load_all(f) if doc and doc.get("kind") == "Deployment"
+        )
+    container = deployment["spec"]["template"]["spec"]["containers"][0]
+    resources = container.get("resources", {})
+    request = resources.get("requests", {}).get("cpu")
+    limit = resources.get("limits", {}).get("cpu")
+    return {
+        "env": {var["name"]: str(var["value"]) for var in container.get("env", []) if "value" in var},
+        "cpu_request": cpu_quantity(request) if request else None,
+        "cpu_limit": cpu_quantity(limit) if limit else None,
+    }
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time of a process, or None once it has gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # the command name in parentheses may contain spaces
+            fields = f.read().rpartition(")")[2].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class Autoscaler:
+    """
+    Replica counts the HorizontalPodAutoscaler would choose for a CPU target
+
+    `policy` is as returned by load_hpa(). Times are seconds on any
+    monotonic clock.
+    """
+
+    def __init__(self, policy, cpu_request):
+        self.policy = policy
+        self.min_replicas = policy["min_replicas"]
+        self.max_replicas = policy["max_replicas"]
+        # CPU cores per replica at the target utilization
+        self.target = policy["target_utilization"] / 100 * cpu_request
+        self.recommendations = []
+        self.scale_ups = []
+        self.scale_downs = []
+
+    def desired_replicas(self, now, current, ready, cpu_used):
+        """
+        Replica count for `current` replicas, `ready` of them using
+        `cpu_used` cores between them
+
+        Replicas that are not ready yet count as idle when scaling up and
+        are left out when scaling down; a recommendation that changes
+        direction once they are counted keeps the current count.
+        """
+        if not self.min_replicas <= current <= self.max_replicas:
+            desired = min(max(current, self.min_replicas), self.max_replicas)
+        else:
+            proposed = current
+            if ready:
+                ratio = cpu_used / (self.target * ready)
+                counted = cpu_used / (self.target * current) if ratio > 1 else ratio
+                if abs(counted - 1) > TOLERANCE and (ratio > 1) == (counted > 1):
+                    proposed = math.ceil(cpu_used / self.target)
+            desired = self._rate_limit(now, current, self._stabilize(now, current, proposed))
+
+        if desired > current:
+            self.scale_ups.append((now, desired - current))
+        elif desired < current:
+            self.scale_downs.append((now, current - desired))
+        longest = max(policy["periodSeconds"] for direction in ("scaleUp", "scaleDown")
+                      for policy in self.policy[direction]["policies"])
+        self.scale_ups = [(t, n) for t, n in self.scale_ups if now - t < longest]
+        self.scale_downs = [(t, n) for t, n in self.scale_downs if now - t < longest]
+        return desired
+
+    def _stabilize(self, now, current, proposed):
+        """Scale up to the lowest and down to the highest recommendation of each window"""
+        up_window = self.policy["scaleUp"]["stabilizationWindowSeconds"]
+        down_window = self.policy["scaleDown"]["stabilizationWindowSeconds"]
+        self.recommendations = [
+            (t, replicas) for t, replicas in self.recommendations
+            if now - t < max(up_window, down_window)
+        ]
+        up = min([proposed] + [r for t, r in self.recommendations if now - t < up_window])
+        down = max([proposed] + [r for t, r in self.recommendations if now - t < down_window])
+        self.recommendations.append((now, proposed))
+        return min(max(current, up), down)
+
+    def _rate_limit(self, now, current, desired):
+        if desired > current:
+            return min(desired, self._limit(now, current, self.policy["scaleUp"], 1),
+                       self.max_replicas)
+        if desired < current:
+            return max(desired, self._limit(now, current, self.policy["scaleDown"], -1),
+                       self.min_replicas)
+        return desired
+
+    def _limit(self, now, current, rules, direction):
+        """Furthest the policies allow scaling from `current`, up (+1) or down (-1)"""
+        if rules["selectPolicy"] == "Disabled":
+            return current
+        limits = []
+        for policy in rules["policies"]:
+            period = policy["periodSeconds"]
+            added = sum(n for t, n in self.scale_ups if now - t < period)
+            removed = sum(n for t, n in self.scale_downs if now - t < period)
+            period_start = current - added + removed
+            if policy["type"] == "Pods":
+                limits.append(period_start + direction * policy["value"])
+            elif direction > 0:
+                limits.append(math.ceil(period_start * (1 + policy["value"] / 100)))
+            else:
+                limits.append(int(period_start * (1 - policy["value"] / 100)))
+        # "Max" selects the policy allowing the biggest change, "Min" the smallest
+        if (rules["selectPolicy"] == "Max") == (direction > 0):
+            return max(limits)
+        return min(limits)
+
+
+class CpuThrottler:
+    """
+    CFS-style CPU limit for local processes
+
+    In each `period` a process may use `limit` x period seconds of CPU;
+    once it has, it is stopped until the period ends. CPU time is only
+    sampled every `poll` seconds and counted in clock ticks, so what a
+    process overshoots its quota by is taken off its next quota.
+    """
+
+    def __init__(self, limit, period=0.1, poll=0.005):
+        self.quota = limit * period
+        self.period = period
+        self.poll = poll
+        self.debts = {}
+        self.throttled_periods = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def add(self, pid):
+        with self._lock:
+            self.debts[pid] = 0.0
+
+    def remove(self, pid):
+        with self._lock:
+            self.debts.pop(pid, None)
+            self._signal(pid, signal.SIGCONT)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            for pid in self.debts:
+                self._signal(pid, signal.SIGCONT)
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            end = time.monotonic() + self.period
+            with self._lock:
+                budgets = {pid: self.quota - debt for pid, debt in self.debts.items()}
+            started = {pid: cpu_seconds(pid) for pid in budgets}
+            used = dict.fromkeys(budgets, 0.0)
+            stopped = set()
+            while (remaining := end - time.monotonic()) > 0:
+                for pid, budget in budgets.items():
+                    if pid in stopped or started[pid] is None:
+                        continue
+                    used[pid] = (cpu_seconds(pid) or started[pid]) - started[pid]
+                    if used[pid] >= budget:
+                        with self._lock:
+                            if pid in self.debts:
+                                self._signal(pid, signal.SIGSTOP)
+                                stopped.add(pid)
+                time.sleep(min(self.poll, remaining))
+
+            with self._lock:
+                self.throttled_periods += len(stopped)
+                for pid, budget in budgets.items():
+                    if pid in self.debts and started[pid] is not None:
+                        now = cpu_seconds(pid) or started[pid]
+                        self.debts[pid] = max(0.0, now - started[pid] - budget)
+                    if pid in stopped:
+                        self._signal(pid, signal.SIGCONT)
+
+
+async def read_head(reader):
+    """(start line, lower-cased headers, raw bytes) of an HTTP/1.1 message head"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    start_line, *lines = head[:-4].split(b"\r\n")
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip()
+    return start_line, headers, head
+
+
+async def read_body(reader, headers):
+    """The raw body framed by `headers`, or None when they do not frame one"""
+    if b"chunked" in headers.get(b"transfer-encoding", b"").lower():
+        parts = []
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            parts.append(size_line)
+            size = int(size_line.split(b";")[0], 16)
+            if size == 0:
+                # optional trailers, then an empty line
+                while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+                    parts.append(line)
+                parts.append(line)
+                return b"".join(parts)
+            parts.append(await reader.readexactly(size + 2))
+    if b"content-length" in headers:
+        return await reader.readexactly(int(headers[b"content-length"]))
+    return None
+
+
+def wants_close(start_line, headers):
+    connection = headers.get(b"connection", b"").lower()
+    return connection == b"close" or (start_line.endswith(b"HTTP/1.0") and connection != b"keep-alive")
+
+
+class Backend:
+    """An upstream server of the LoadBalancer and its idle keep-alive connections"""
+
+    def __init__(self, port, host="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.in_flight = 0
+        self.idle = []
+
+    async def connection(self):
+        """((reader, writer), reused) to send one request over"""
+        if self.idle:
+            return self.idle.pop(), True
+        return await asyncio.open_connection(self.host, self.port), False
+
+    def close_idle(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+class LoadBalancer:
+    """
+    HTTP/1.1 reverse proxy spreading requests over `backends`
+
+    Each request goes to the next backend in turn ("round_robin") or to
+    the one with the fewest requests in flight ("least_connections"),
+    so a keep-alive client also reaches backends added after it
+    connected. `on_response(backend, seconds, status)` is called after
+    each response; `backend` is None when none was ready.
+    """
+
+    POLICIES = ("round_robin", "least_connections")
+
+    def __init__(self, policy="round_robin", on_response=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown balancing policy {policy!r}")
+        self.policy = policy
+        self.on_response = on_response
+        self.backends = []
+        self.server = None
+        self._turn = 0
+
+    def choose(self):
+        if not self.backends:
+            return None
+        first = self._turn % len(self.backends)
+        self._turn += 1
+        # rotating the starting point also spreads ties between the least loaded
+        ordered = self.backends[first:] + self.backends[:first]
+        if self.policy == "least_connections":
+            return min(ordered, key=lambda backend: backend.in_flight)
+        return ordered[0]
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Listen on host:port, returning the port"""
+        self.server = await asyncio.start_server(self._serve_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    start_line, headers, head = await read_head(reader)
+                    body = await read_body(reader, headers)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                start = time.perf_counter()
+                if b"upgrade" in headers:
+                    writer.write(NOT_IMPLEMENTED)
+                    await writer.drain()
+                    break
+
+                backend = self.choose()
+                if backend is None:
+                    status, response, close = 503, NO_BACKEND, False
+                else:
+                    backend.in_flight += 1
+                    try:
+                        status, response, close = await self._forward(
+                            backend, head + (body or b""), start_line.startswith(b"HEAD ")
+                        )
+                    finally:
+                        backend.in_flight -= 1
+                writer.write(response)
+                await writer.drain()
+                if self.on_response:
+                    self.on_response(backend, time.perf_counter() - start, status)
+                if close or wants_close(start_line, headers):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _forward(self, backend, request, head_only):
+        """(status, raw response, whether the client connection must close)"""
+        while True:
+            try:
+                (reader, writer), reused = await backend.connection()
+            except OSError:
+                return 502, BAD_GATEWAY, False
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line, headers, head = await read_head(reader)
+                status = int(status_line.split()[1])
+                if head_only or status in (204, 304) or status < 200:
+                    body = b""
+                else:
+                    body = await read_body(reader, headers)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                writer.close()
+                if reused and not getattr(e, "partial", b""):
+                    # the replica had closed the idle connection; use a new one
+                    continue
+                return 502, BAD_GATEWAY, False
+
+            # A body delimited by closing the connection is passed on the same way
+            close = body is None
+            if close:
+                body = await reader.read()
+            if close or wants_close(status_line, headers) or backend not in self.backends:
+                writer.close()
+            else:
+                backend.idle.append((reader, writer))
+            return status, head + body, close
+
+
+class Replica(Backend):
+    """A server process started like the container, on a free local port"""
+
+    def __init__(self, env=None, quiet=True):
+        super().__init__(free_port())
+        command = [
+            sys.executable, "prefork.py", "--workers", "1",
+            "--host", self.host, "--port", str(self.port), "--no-access-log"
+        ]
+        output = subprocess.DEVNULL if quiet else None
+        self.process = subprocess.Popen(
+            command, cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={**os.environ, **(env or {})}, stdout=output, stderr=output
+        )
+
+    def cpu_seconds(self):
+        return cpu_seconds(self.process.pid)
+
+    async def wait_ready(self, timeout):
+        """Poll /health until it answers 200; False if the process exits or time runs out"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and self.process.poll() is None:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                try:
+                    writer.write(HEALTH_REQUEST)
+                    status_line, _, _ = await read_head(reader)
+                finally:
+                    writer.close()
+                if status_line.split()[1] == b"200":
+                    return True
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            await asyncio.sleep(0.1)
+        return False
+
+    def terminate(self):
+        """Stop gracefully, letting requests in flight finish"""
+        self.close_idle()
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class LocalCluster:
+    """
+    Replicas of app.py behind a LoadBalancer, scaled by an Autoscaler
+
+    Runs its own event loop in a background thread. Settings default to
+    k8s/hpa.yaml and k8s/deployment.yaml; a `cpu_limit` of 0 leaves the
+    replicas uncapped. With `time_scale` above 1 the autoscaler's sync
+    period, windows and policy periods all pass that many times faster.
+    """
+
+    def __init__(self, policy=None, cpu_request=None, cpu_limit=None, balance="round_robin",
+                 sync_period=15.0, time_scale=1.0, port=0, env=None, quiet=True,
+                 ready_timeout=120.0, log=print):
+        container = load_container()
+        self.policy = policy or load_hpa()
+        self.cpu_request = cpu_request or container["cpu_request"] or 1.0
+        self.cpu_limit = container["cpu_limit"] if cpu_limit is None else cpu_limit
+        self.env = {**container["env"], **(env or {})}
+        self.sync_period = sync_period
+        self.time_scale = time_scale
+        self.port = port
+        self.quiet = quiet
+        self.ready_timeout = ready_timeout
+        self.log = log
+
+        self.autoscaler = Autoscaler(self.policy, self.cpu_request)
+        self.balancer = LoadBalancer(balance, self._on_response)
+        self.throttler = CpuThrottler(self.cpu_limit) if self.cpu_limit else None
+        self.replicas = []
+        self.url = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._sync_task = None
+        self._cpu = {}
+        self._started = None
+        self._marked = None
+        self.timeline = []
+        self.stats = {}
+
+    # Called from other threads
+
+    def start(self):
+        """Start minReplicas replicas and the proxy; the proxy's URL once they are ready"""
+        self._thread.start()
+        self._call(self._start())
+        return self.url
+
+    def stop(self):
+        self._call(self._stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def scale(self, replicas):
+        """Set the replica count now, as `kubectl scale` does; the autoscaler may change it later"""
+        self._call(self._scale_to(replicas))
+
+    def set_max_replicas(self, replicas):
+        """Change maxReplicas, as patching the HPA does"""
+        self._loop.call_soon_threadsafe(setattr, self.autoscaler, "max_replicas", replicas)
+
+    def mark(self):
+        """Start a new report period"""
+        self._call(self._mark())
+
+    def report(self):
+        """Per ready-replica count since mark(): rows of seconds, requests, latency"""
+        return self._call(self._report())
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    # In the cluster's event loop
+
+    async def _start(self):
+        port = await self.balancer.start(port=self.port)
+        self.url = f"http://127.0.0.1:{port}"
+        self._started = time.monotonic()
+        if self.throttler:
+            self.throttler.start()
+        self._changed()
+        await self._scale_to(self.autoscaler.min_replicas, wait=True)
+        await self._mark()
+        self._sync_task = asyncio.create_task(self._autoscale())
+
+    async def _stop(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+        await self.balancer.close()
+        replicas, self.replicas = self.replicas, []
+        await asyncio.gather(*(self._retire(replica) for replica in replicas))
+        if self.throttler:
+            self.throttler.stop()
+
+    async def _autoscale(self):
+        while True:
+            await asyncio.sleep(self.sync_period / self.time_scale)
+            await self._sync()
+
+    async def _sync(self):
+        now = time.monotonic()
+        used = 0.0
+        for replica in self.balancer.backends:
+            cpu = replica.cpu_seconds()
+            if cpu is None:
+                continue
+            last_time, last_cpu = self._cpu[replica]
+            used += (cpu - last_cpu) / (now - last_time)
+            self._cpu[replica] = (now, cpu)
+
+        current = len(self.replicas)
+        ready = len(self.balancer.backends)
+        desired = self.autoscaler.desired_replicas(now * self.time_scale, current, ready, used)
+        utilization = used / (ready * self.cpu_request) if ready else 0.0
+        message = (f"[{now - self._started:7.1f}s] HPA: cpu {utilization:.0%}/"
+                   f"{self.policy['target_utilization']}%, replicas {current} "
+                   f"({ready} ready, max {self.autoscaler.max_replicas})")
+        if desired != current:
+            message += f" -> scaling to {desired}"
+        self.log(message)
+        await self._scale_to(desired)
+
+    async def _scale_to(self, replicas, wait=False):
+        starting = []
+        while len(self.replicas) < replicas:
+            replica = Replica(self.env, self.quiet)
+            self.replicas.append(replica)
+            if self.throttler:
+                self.throttler.add(replica.process.pid)
+            starting.append(asyncio.create_task(self._admit(replica)))
+
+        retiring = []
+        while len(self.replicas) > replicas:
+            # replicas that are not ready yet go first, then the newest
+            replica = next(
+                (r for r in reversed(self.replicas) if r not in self.balancer.backends),
+                self.replicas[-1]
+            )
+            self.replicas.remove(replica)
+            retiring.append(self._retire(replica))
+        await asyncio.gather(*retiring)
+        if wait:
+            await asyncio.gather(*starting)
+
+    async def _admit(self, replica):
+        if not await replica.wait_ready(self.ready_timeout):
+            if replica in self.replicas:
+                self.log(f"Replica on port {replica.port} did not become ready")
+                self.replicas.remove(replica)
+                await self._retire(replica)
+            return
+        if replica in self.replicas:
+            self._cpu[replica] = (time.monotonic(), replica.cpu_seconds())
+            self.balancer.backends.append(replica)
+            self._changed()
+
+    async def _retire(self, replica):
+        if replica in self.balancer.backends:
+            self.balancer.backends.remove(replica)
+            self._changed()
+        self._cpu.pop(replica, None)
+        if self.throttler:
+            self.throttler.remove(replica.process.pid)
+        await asyncio.to_thread(replica.terminate)
+
+    def _changed(self):
+        self.timeline.append((time.monotonic(), len(self.balancer.backends)))
+
+    def _on_response(self, backend, seconds, status):
+        ready = len(self.balancer.backends)
+        stats = self.stats.get(ready)
+        if stats is None:
+            stats = self.stats[ready] = {"ok": 0, "shed": 0, "errors": 0, "latency": LatencyHistogram()}
+        if status == 200:
+            stats["ok"] += 1
+            stats["latency"].record(seconds)
+        elif status == 429:
+            stats["shed"] += 1
+        else:
+            stats["errors"] += 1
+
+    async def _mark(self):
+        self._marked = time.monotonic()
+        self.stats = {}
+
+    async def _report(self):
+        now = time.monotonic()
+        seconds = {}
+        ready, since = None, self._marked
+        for t, count in self.timeline:
+            if t > self._marked and ready is not None:
+                seconds[ready] = seconds.get(ready, 0.0) + t - since
+                since = t
+            ready = count
+        seconds[ready] = seconds.get(ready, 0.0) + now - since
+
+        rows = []
+        for count in sorted(set(seconds) | set(self.stats)):
+            stats = self.stats.get(count, {"ok": 0, "shed": 0, "errors": 0,
+                                           "latency": LatencyHistogram()})
+            duration = seconds.get(count, 0.0)
+            rows.append({
+                "replicas": count,
+                "seconds": duration,
+                "ok": stats["ok"],
+                "shed": stats["shed"],
+                "errors": stats["errors"],
+                "throughput": stats["ok"] / duration if duration else 0.0,
+                "p50_ms": stats["latency"].percentile(50) * 1000,
+                "p99_ms": stats["latency"].percentile(99) * 1000,
+            })
+        return rows
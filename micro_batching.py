@@ -0,0 +1,129 @@
+"""
+Dynamic Micro-Batching for Single Predictions
+Groups concurrent /predict calls into one vectorized model call
+"""
+
+import asyncio
+import time
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Queue single rows and score them together
+
+    A background task takes the first queued row, keeps collecting until
+    either max_batch_size rows are waiting or max_wait_us microseconds have
+    passed, scores the batch with one predict_fn call and resolves every
+    caller's future with its own (species, confidence).
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_us=500):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1_000_000
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+        self.requests = 0
+        self.batches = 0
+        self.batch_sizes = {size: 0 for size in self._buckets()}
+
+    def _buckets(self):
+        """Power-of-two histogram buckets up to max_batch_size"""
+        size = 1
+        buckets = []
+        while size < self.max_batch_size:
+            buckets.append(size)
+            size *= 2
+        buckets.append(self.max_batch_size)
+        return buckets
+
+    def _ensure_worker(self):
+        # The queue and worker belong to one event loop; recreate them if
+        # the server (or a test client) is now running a different one
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, row):
+        """Queue one feature row and wait for its (species, confidence)"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((row, future))
+        return await future
+
+    async def stop(self):
+        """Cancel the background worker"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            batch = [(row, future) for row, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            self.requests += len(batch)
+            self.batches += 1
+            for bucket in self.batch_sizes:
+                if len(batch) <= bucket:
+                    self.batch_sizes[bucket] += 1
+                    break
+
+            try:
+                X = np.array([row for row, _ in batch], dtype=np.float64)
+                species, confidence = self.predict_fn(X)
+                results = zip(species.tolist(), confidence.tolist())
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        """Queue depth and batch-size distribution"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_us": round(self.max_wait * 1_000_000),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "batch_size_histogram": {
+                f"le_{bucket}": count for bucket, count in self.batch_sizes.items()
+            },
+        }
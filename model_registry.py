@@ -0,0 +1,169 @@
+"""
+Multi-Model Registry for the API
+Lazily loads the model variants in a directory and keeps the most
+recently used ones in memory under a byte budget
+"""
+
+from collections import OrderedDict
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+from tree_engine import build_engine
+
+
+def _nbytes(obj):
+    """Approximate memory held by the arrays and lists of an object"""
+    total = 0
+    for value in vars(obj).values():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, list):
+            # one pointer per item; the items themselves are mostly shared
+            total += 8 * len(value)
+    return total
+
+
+def model_nbytes(model, engine):
+    """Estimate resident bytes of a fitted model plus its engine"""
+    total = _nbytes(engine)
+    tree = getattr(model, "tree_", None)
+    if tree is not None:
+        state = tree.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def _is_mmapped(model):
+    return any(isinstance(value, np.memmap) for value in vars(model).values())
+
+
+class LoadedModel:
+    """A model variant in memory, with the engine that serves it"""
+
+    def __init__(self, name, path, model, engine, load_seconds):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.engine = engine
+        self.load_seconds = load_seconds
+        self.memory_bytes = model_nbytes(model, engine)
+        self.mmapped = _is_mmapped(model)
+        self.requests = 0
+
+
+class ModelRegistry:
+    """
+    Serve every *.joblib file in `model_dir` by name (the file stem)
+
+    Models are loaded on first use with joblib's mmap_mode, so array
+    payloads that the estimator keeps as-is stay in the page cache instead
+    of being copied into each process. When the loaded models exceed
+    `memory_budget` bytes, the least recently used ones are dropped.
+    """
+
+    def __init__(self, model_dir, memory_budget, mmap_mode="r",
+                 engine_factory=build_engine):
+        self.model_dir = model_dir
+        self.memory_budget = memory_budget
+        self.mmap_mode = mmap_mode
+        self.engine_factory = engine_factory
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.evictions = 0
+
+    def available(self):
+        """Names of the model files in model_dir"""
+        paths = glob.glob(os.path.join(self.model_dir, "*.joblib"))
+        return sorted(os.path.splitext(os.path.basename(path))[0] for path in paths)
+
+    def path(self, name):
+        if os.path.basename(name) != name or name.startswith("."):
+            raise KeyError(name)
+        path = os.path.join(self.model_dir, f"{name}.joblib")
+        if not os.path.isfile(path):
+            raise KeyError(name)
+        return path
+
+    def loaded(self, name):
+        """Return the model if it is already in memory, else None"""
+        entry = self._loaded.get(name)
+        if entry is not None:
+            try:
+                self._loaded.move_to_end(name)
+            except KeyError:  # evicted by another thread just now
+                pass
+        return entry
+
+    def get(self, name):
+        """
+        Return the loaded model `name`, loading it first if needed
+
+        Blocks for the duration of joblib.load on a miss; raises KeyError
+        for unknown names.
+        """
+        entry = self.loaded(name)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                return entry
+
+            import joblib  # imports sklearn while unpickling
+
+            path = self.path(name)
+            start = time.perf_counter()
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+            engine = self.engine_factory(model)
+            entry = LoadedModel(name, path, model, engine, time.perf_counter() - start)
+
+            self._loaded[name] = entry
+            self.loads += 1
+            self._evict(keep=name)
+            return entry
+
+    def _evict(self, keep):
+        # OrderedDict order is recency: least recently used first
+        for name in list(self._loaded):
+            if self.memory_used() <= self.memory_budget:
+                break
+            if name != keep:
+                del self._loaded[name]
+                self.evictions += 1
+
+    def memory_used(self):
+        return sum(entry.memory_bytes for entry in self._loaded.values())
+
+    def stats(self):
+        """Per-model load time, memory and usage"""
+        loaded = dict(self._loaded)
+        models = {}
+        for name in self.available():
+            entry = loaded.get(name)
+            if entry is None:
+                models[name] = {"loaded": False}
+                continue
+            models[name] = {
+                "loaded": True,
+                "load_time_ms": round(entry.load_seconds * 1000, 3),
+                "memory_bytes": entry.memory_bytes,
+                "mmapped": entry.mmapped,
+                "engine": type(entry.engine).__name__,
+                "requests": entry.requests,
+            }
+
+        return {
+            "model_dir": self.model_dir,
+            "memory_budget_bytes": self.memory_budget,
+            "memory_used_bytes": self.memory_used(),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "models": models,
+        }
@@ -0,0 +1,217 @@
+"""
+Model Hot Reload
+Loads a replacement for the served model to one side, checks and warms it
+up, and hands it over only once it is ready to take traffic
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from model_registry import LoadedModel
+from tree_engine import CompiledTree, build_engine, save_compiled
+
+# Warm-up inputs: a fixed spread of rows over the range of iris
+# measurements, so every reload exercises the same paths
+WARMUP_ROWS = np.random.default_rng(0).uniform(0.0, 8.0, size=(256, 4))
+
+
+def file_signature(path):
+    """(mtime, size, inode) of `path`, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compiled_path(path):
+    """Where the compiled tree of the model file `path` is kept"""
+    return os.path.splitext(path)[0] + ".engine.npz"
+
+
+def compile_model_file(path):
+    """
+    Write the compiled tree of the model file `path` next to it
+
+    The file records the SHA-256 of `path`, so it is ignored once the
+    model file is replaced.
+    """
+    import joblib
+    save_compiled(joblib.load(path), compiled_path(path), source_sha256=file_sha256(path))
+    return compiled_path(path)
+
+
+class CompiledModel:
+    """
+    Stand-in for an estimator served from its compiled tree file
+
+    Carries what the API reads from a model (type, classes and features)
+    without unpickling it, which would import sklearn.
+    """
+
+    def __init__(self, tree, metadata):
+        self.model_type = str(metadata.get("model_type", type(tree).__name__))
+        self.classes_ = tree.classes_
+        self.n_features_in_ = tree.n_features_in_
+        feature_names = metadata.get("feature_names")
+        if feature_names is not None and len(feature_names):
+            self.feature_names_in_ = feature_names
+
+
+def read_model(path):
+    """
+    Load the model file `path`, from its compiled tree when that is current
+
+    Returns (model, engine source): the estimator twice, or a
+    CompiledModel and the CompiledTree to build the engine from.
+    """
+    compiled = compiled_path(path)
+    if os.path.exists(compiled):
+        try:
+            tree, metadata = CompiledTree.load(compiled)
+        except (OSError, ValueError, KeyError):
+            tree, metadata = None, {}
+        if tree is not None and metadata.get("source_sha256") == file_sha256(path):
+            return CompiledModel(tree, metadata), tree
+
+    import joblib  # imports sklearn while unpickling
+    model = joblib.load(path)
+    return model, model
+
+
+def validate_model(model, feature_names, classes=None):
+    """
+    Check that `model` can replace the served one
+
+    It must take the API's features in the API's order and, when
+    `classes` is given, predict exactly those classes. Raises ValueError.
+    """
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features != len(feature_names):
+        raise ValueError(f"Model expects {n_features} features, the API sends {len(feature_names)}")
+
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and list(names) != list(feature_names):
+        raise ValueError(f"Model features {list(names)} do not match {list(feature_names)}")
+
+    if classes is not None and not np.array_equal(model.classes_, classes):
+        raise ValueError(
+            f"Model classes {model.classes_.tolist()} do not match the served "
+            f"{np.asarray(classes).tolist()}"
+        )
+
+
+def warm_up(engine, rows=WARMUP_ROWS):
+    """
+    Score `rows` through both the single-row and the batch path
+
+    Fails with ValueError if the engine returns anything but a known
+    class and a confidence in [0, 1].
+    """
+    for row in rows[:16].tolist():
+        species, confidence = engine.predict_one(row)
+        if species not in engine.classes_ or not 0.0 <= confidence <= 1.0:
+            raise ValueError(f"Warm-up prediction {species!r}, {confidence!r} is invalid")
+
+    class_index, confidence = engine.predict_index(rows)
+    if len(class_index) != len(rows) or not (
+        (0 <= class_index).all() and (class_index < len(engine.classes_)).all()
+        and (0.0 <= confidence).all() and (confidence <= 1.0).all()
+    ):
+        raise ValueError("Warm-up batch returned invalid predictions")
+
+
+class ModelReloader:
+    """
+    Load, validate and warm up new versions of the model file at `path`
+
+    load() blocks and is meant to run off the event loop; the caller
+    swaps the returned model in. Concurrent loads are serialized, and
+    the file signature of the last successful load tells a watcher
+    whether the file has changed since.
+    """
+
+    def __init__(self, path, feature_names, engine_factory=build_engine):
+        self.path = path
+        self.feature_names = list(feature_names)
+        self.engine_factory = engine_factory
+        self._lock = threading.Lock()
+
+        self.signature = None
+        self.compiled = False
+        self.version = 0
+        self.loaded_at = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+    def changed(self):
+        """Whether the file differs from the last version loaded"""
+        signature = file_signature(self.path)
+        return signature is not None and signature != self.signature
+
+    def load(self, classes=None):
+        """
+        Load the current file; returns (LoadedModel, file signature)
+
+        `classes` are the classes of the model being replaced, if any.
+        Raises (and counts a failure) if the file cannot be loaded, does
+        not fit the API or fails its warm-up.
+        """
+        with self._lock:
+            signature = file_signature(self.path)
+            start = time.perf_counter()
+            try:
+                model, source = read_model(self.path)
+                validate_model(model, self.feature_names, classes)
+                engine = self.engine_factory(source)
+                warm_up(engine)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                # Don't retry the same broken file until it changes again
+                self.signature = signature
+                raise
+
+            name = os.path.splitext(os.path.basename(self.path))[0]
+            return LoadedModel(name, self.path, model, engine, time.perf_counter() - start), signature
+
+    def activated(self, loaded, signature):
+        """Record that the model from load() is now being served"""
+        self.compiled = isinstance(loaded.model, CompiledModel)
+        self.signature = signature
+        self.version += 1
+        self.loaded_at = time.time()
+        if self.version > 1:
+            self.reloads += 1
+        self.last_error = None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "compiled": self.compiled,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+if __name__ == "__main__":
+    # python model_reload.py models/iris_model.joblib [...]
+    for model_path in sys.argv[1:]:
+        print(f"✅ Compiled {model_path} to {compile_model_file(model_path)}")
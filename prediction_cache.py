@@ -0,0 +1,83 @@
+"""
+LRU Prediction Cache
+Answers repeated /predict calls without touching the model
+"""
+
+from collections import OrderedDict
+import threading
+
+
+class PredictionCache:
+    """
+    Size-bounded LRU cache of (species, confidence) keyed on feature rows
+
+    Features are rounded to `precision` decimal places before lookup, so
+    measurements that differ only below that precision share an entry,
+    and a miss should score the key rather than the row it came from.
+    The cache remembers which model filled it and empties itself as soon
+    as it is asked about a different one.
+    """
+
+    def __init__(self, maxsize=4096, precision=4):
+        self.maxsize = maxsize
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._model = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, row):
+        """Quantize a feature row to the cache precision"""
+        precision = self.precision
+        return tuple([round(value, precision) for value in row])
+
+    def _check_model(self, model):
+        if model is not self._model:
+            self._entries.clear()
+            self._model = model
+
+    def get(self, model, key):
+        """Return the cached prediction for `key`, or None"""
+        with self._lock:
+            self._check_model(model)
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, model, key, result):
+        """Store a prediction, evicting the least recently used entry if full"""
+        with self._lock:
+            if self._model is None:
+                self._model = model
+            # A result computed by a model that has since been replaced
+            # must not land in the new model's cache
+            if model is not self._model or self.maxsize <= 0:
+                return
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "precision": self.precision,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
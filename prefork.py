@@ -0,0 +1,107 @@
+"""
+Pre-fork Multi-Worker Server
+Loads the model once, then forks uvicorn workers that share it
+
+The master imports the app and loads the model before forking, so every
+worker starts with the interpreter, the libraries and the model arrays
+already in memory. Those pages are shared copy-on-write instead of being
+loaded again per worker; gc.freeze() keeps the garbage collector from
+writing to (and so copying) the objects created before the fork. All
+workers accept connections from one listening socket.
+
+Usage: python prefork.py [--workers N] [--host HOST] [--port PORT]
+"""
+
+import argparse
+import gc
+import os
+import signal
+import time
+
+import uvicorn
+
+import app as app_module
+
+# Workers that exit within this many seconds of starting are restarted
+# only after the same delay, so a crashing app does not fork in a loop
+RESTART_DELAY = 1.0
+
+
+def run_worker(config, sock):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(config, workers):
+    """Fork `workers` processes serving `config` and keep them running"""
+    sock = config.bind_socket()
+
+    try:
+        loaded = app_module.preload_model()
+        print(f"✅ Model loaded from {app_module.MODEL_PATH} ({type(loaded.engine).__name__}) "
+              f"for {workers} workers")
+    except Exception as e:
+        # Workers retry in their own lifespan, like a single server would
+        print(f"❌ Error loading model: {e}")
+
+    if workers == 1:
+        uvicorn.Server(config).run(sockets=[sock])
+        return
+
+    gc.freeze()
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(config, sock)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        pid, status = os.wait()
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        print(f"❌ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - started < RESTART_DELAY:
+            time.sleep(RESTART_DELAY)
+        spawn()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve app.py with pre-forked workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")),
+                        help="worker processes (default: $WORKERS or 1)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args()
+
+    config = uvicorn.Config(
+        app_module.app, host=args.host, port=args.port, access_log=args.access_log
+    )
+    serve(config, max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
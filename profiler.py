@@ -0,0 +1,170 @@
+"""
+Sampling Profiler for the Running Service
+Periodically records the Python stack of every thread for a fixed time
+and aggregates the samples into collapsed stacks and a hot-function table
+"""
+
+import asyncio
+from collections import Counter
+from contextlib import contextmanager
+import os
+import signal
+import sys
+import threading
+import time
+
+# Leaf frames of threads that are waiting rather than working: the event
+# loop blocked in select/epoll and idle threadpool workers
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("base_events.py", "run_forever"),
+    ("runners.py", "run"),
+}
+
+
+def frame_label(code):
+    """function (file.py:first line) - stable across the lines it executes"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def is_idle(code):
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+class Profile:
+    """Stack samples collected by a Sampler"""
+
+    def __init__(self, stacks, samples, duration, interval, clock):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+        self.clock = clock
+
+    def collapsed(self):
+        """One 'thread;outer;...;leaf count' line per distinct stack, as
+        consumed by flamegraph.pl, speedscope and similar tools"""
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def top(self, n=20):
+        """
+        The n functions with the most samples
+
+        `self` counts samples with the function at the top of the stack,
+        `total` samples with it anywhere on the stack.
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack[1:]):
+                total[label] += count
+
+        recorded = sum(self.stacks.values()) or 1
+        ranked = sorted(total.items(), key=lambda item: (-own[item[0]], -item[1]))
+        return [
+            {
+                "function": label,
+                "self": own[label],
+                "total": count,
+                "self_percent": round(100 * own[label] / recorded, 2),
+                "total_percent": round(100 * count / recorded, 2),
+            }
+            for label, count in ranked[:n]
+        ]
+
+
+class Sampler:
+    """Aggregates snapshots of thread stacks"""
+
+    def __init__(self, interval, clock, include_idle=False):
+        self.interval = interval
+        self.clock = clock
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+
+    def take(self, frames):
+        """Record one snapshot; `frames` maps thread ids to current frames"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in frames.items():
+            if frame is None or (not self.include_idle and is_idle(frame.f_code)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def profile(self):
+        duration = time.perf_counter() - self.started
+        return Profile(self.stacks, self.samples, duration, self.interval, self.clock)
+
+
+def sample(duration, interval=0.005, include_idle=False):
+    """
+    Sample the stacks of all other threads every `interval` seconds of
+    wall time, from the calling thread, for `duration` seconds
+
+    Works from any thread, but a thread can only look while it holds the
+    GIL, so busy pure-Python code is under-sampled; prefer cpu_sampling.
+    """
+    sampler = Sampler(interval, "wall", include_idle)
+    me = threading.get_ident()
+    deadline = sampler.started + duration
+    while True:
+        frames = sys._current_frames()
+        frames.pop(me, None)
+        sampler.take(frames)
+        now = time.perf_counter()
+        if now >= deadline:
+            return sampler.profile()
+        time.sleep(min(interval, deadline - now))
+
+
+@contextmanager
+def cpu_sampling(interval=0.005, include_idle=False):
+    """
+    Sample all threads every `interval` seconds of process CPU time
+
+    A SIGPROF timer interrupts the main thread wherever it is executing,
+    so samples land where the CPU time goes and an idle process takes
+    none. Must be entered from the main thread; yields the Sampler. The
+    timer and handler exist only inside the block.
+    """
+    sampler = Sampler(interval, "cpu", include_idle)
+    main = threading.main_thread().ident
+
+    def handler(signum, frame):
+        frames = sys._current_frames()
+        frames[main] = frame  # the interrupted frame rather than this handler
+        sampler.take(frames)
+
+    previous = signal.signal(signal.SIGPROF, handler)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        yield sampler
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+
+
+async def profile_for(seconds, interval=0.005, include_idle=False):
+    """
+    Profile the process for `seconds` without blocking the event loop
+
+    Uses CPU-time sampling when running on the main thread (as under
+    uvicorn), wall-clock sampling from a helper thread otherwise.
+    """
+    if threading.current_thread() is threading.main_thread() and hasattr(signal, "setitimer"):
+        with cpu_sampling(interval, include_idle) as sampler:
+            await asyncio.sleep(seconds)
+        return sampler.profile()
+    return await asyncio.to_thread(sample, seconds, interval, include_idle)
@@ -0,0 +1,188 @@
+"""
+Request and Response Encoding for Batch Prediction
+Binary and NDJSON feature rows in; JSON, NDJSON or binary predictions out
+"""
+
+import gzip
+import io
+import json
+import math
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # stdlib json is several times slower on large batches
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NPY_MAGIC = b"\x93NUMPY"
+
+# Shapes of a JSON batch response:
+#   rows      {"predictions": [{"species": ..., "confidence": ...}, ...]}
+#   columnar  {"species": [...], "confidence": [...]}
+#   indexed   {"classes": [...], "class_index": [...], "confidence": [...]}
+JSON_LAYOUTS = ("rows", "columnar", "indexed")
+
+# Little-endian float rows accepted in binary request bodies
+BINARY_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+}
+
+
+def decode_features(body, dtype="float32", n_features=4):
+    """
+    View a binary request body as an (N, n_features) float array
+
+    `body` is either raw little-endian rows of `dtype` or a complete .npy
+    file (detected by its magic string, dtype taken from its header). The
+    returned array shares memory with `body`. Returns (X, is_npy) and
+    raises ValueError for anything that is not a C-ordered float array.
+    """
+    if body[:len(NPY_MAGIC)] == NPY_MAGIC:
+        stream = io.BytesIO(body)
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, array_dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, array_dtype = np.lib.format.read_array_header_2_0(stream)
+
+        if array_dtype not in BINARY_DTYPES.values():
+            raise ValueError(f"Unsupported .npy dtype {array_dtype.str}, expected <f4 or <f8")
+        if fortran_order:
+            raise ValueError("Fortran-ordered .npy arrays are not supported")
+        if len(shape) != 2 or shape[1] != n_features:
+            raise ValueError(f"Expected an array of shape (N, {n_features}), got {shape}")
+
+        count = shape[0] * shape[1]
+        offset = stream.tell()
+        if len(body) - offset != count * array_dtype.itemsize:
+            raise ValueError("Truncated or oversized .npy payload")
+        X = np.frombuffer(body, dtype=array_dtype, count=count, offset=offset)
+        return X.reshape(shape), True
+
+    if dtype not in BINARY_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype!r}, expected one of {sorted(BINARY_DTYPES)}")
+    array_dtype = BINARY_DTYPES[dtype]
+    row_size = array_dtype.itemsize * n_features
+    if len(body) % row_size:
+        raise ValueError(
+            f"Body of {len(body)} bytes is not a whole number of {row_size}-byte {dtype} rows"
+        )
+    return np.frombuffer(body, dtype=array_dtype).reshape(-1, n_features), False
+
+
+def prediction_dtype(feature_dtype):
+    """Record layout of binary predictions: class index plus confidence"""
+    return np.dtype([("class_index", "<u2"), ("confidence", feature_dtype.newbyteorder("<"))])
+
+
+def encode_predictions(class_index, confidence, feature_dtype, as_npy=False):
+    """
+    Pack predictions into the binary form matching the request
+
+    One record per row holding the uint16 class index and the confidence
+    in the request's float type; raw records for raw requests, a .npy
+    file for .npy requests.
+    """
+    records = np.empty(len(class_index), dtype=prediction_dtype(feature_dtype))
+    records["class_index"] = class_index
+    records["confidence"] = confidence
+
+    if not as_npy:
+        return records.tobytes()
+    buffer = io.BytesIO()
+    np.save(buffer, records, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def feature_values(row, feature_names):
+    """
+    Validate one parsed input row and return it as a tuple of floats
+
+    A row is either an object keyed by feature name (other keys are
+    ignored) or a plain list of numbers in feature order. Raises
+    ValueError for anything else.
+    """
+    if isinstance(row, dict):
+        try:
+            row = [row[name] for name in feature_names]
+        except KeyError as e:
+            raise ValueError(f"Missing feature {e.args[0]!r}")
+    elif not isinstance(row, list) or len(row) != len(feature_names):
+        raise ValueError(f"Expected an object or a list of {len(feature_names)} numbers")
+
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in row):
+        raise ValueError("Feature values must be numbers")
+    row = tuple(float(v) for v in row)
+    if not all(math.isfinite(v) for v in row):
+        raise ValueError("Feature values must be finite")
+    return row
+
+
+def parse_ndjson_row(line, feature_names):
+    """Parse one NDJSON input line into a tuple of floats, see feature_values"""
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e.msg}")
+    return feature_values(row, feature_names)
+
+
+def loads(data):
+    """Parse JSON bytes with the fastest decoder available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """Serialize to JSON bytes with the fastest encoder available"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def encode_json(class_index, confidence, classes, layout="rows"):
+    """Serialize batch predictions straight to JSON bytes in `layout`"""
+    confidence = confidence.tolist()
+    if layout == "indexed":
+        return dumps({
+            "classes": np.asarray(classes).tolist(),
+            "class_index": class_index.tolist(),
+            "confidence": confidence,
+        })
+
+    species = np.asarray(classes, dtype=object).take(class_index).tolist()
+    if layout == "columnar":
+        return dumps({"species": species, "confidence": confidence})
+    if layout == "rows":
+        return dumps({"predictions": [
+            {"species": s, "confidence": c} for s, c in zip(species, confidence)
+        ]})
+    raise ValueError(f"Unknown layout {layout!r}, expected one of {JSON_LAYOUTS}")
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows a gzip response"""
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.partition(";")
+        if name.strip() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def compress(body, accept_encoding, min_size, level):
+    """
+    Gzip `body` if the client accepts it and it is at least `min_size`
+
+    Returns (body, extra response headers).
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= min_size and accepts_gzip(accept_encoding):
+        headers["Content-Encoding"] = "gzip"
+        return gzip.compress(body, compresslevel=level), headers
+    return body, headers
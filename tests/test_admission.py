@@ -0,0 +1,99 @@
+"""
+Unit tests for admission control
+"""
+
+import asyncio
+
+from admission import AdmissionController
+
+
+def test_queue_hands_slots_over_in_order():
+    """Test waiters are admitted first come first served as slots free up"""
+    controller = AdmissionController(limit=1, queue_size=2, queue_timeout=1.0)
+
+    async def run():
+        assert await controller.acquire() is None
+        waiters = [asyncio.create_task(controller.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert waiters[2].done() and waiters[2].result() == "queue_full"
+
+        controller.release()
+        assert await waiters[0] is None and not waiters[1].done()
+        controller.release()
+        assert await waiters[1] is None
+        controller.release()
+
+    asyncio.run(run())
+    stats = controller.stats()
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    assert (stats["admitted"], stats["queued"], stats["shed"]) == (3, 2, 1)
+    assert stats["rejected"] == {"queue_full": 1, "queue_timeout": 0}
+
+
+def test_waiters_are_rejected_at_deadline():
+    """Test a request still queued after queue_timeout is turned away"""
+    controller = AdmissionController(limit=1, queue_size=4, queue_timeout=0.01)
+
+    async def run():
+        await controller.acquire()
+        reason = await controller.acquire()
+        controller.release()
+        return reason
+
+    assert asyncio.run(run()) == "queue_timeout"
+    assert controller.stats()["queue_depth"] == 0
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_gives_slot_back():
+    """Test a client disconnecting while queued neither leaks nor blocks a slot"""
+    controller = AdmissionController(limit=1, queue_size=4, queue_timeout=1.0)
+
+    async def run():
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        controller.release()
+        assert await controller.acquire() is None
+        controller.release()
+
+    asyncio.run(run())
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_waiter_cancelled_after_expiry_releases_nothing():
+    """Test a client disconnecting once its wait has timed out returns no slot"""
+    controller = AdmissionController(limit=1, queue_size=4, queue_timeout=1.0)
+
+    async def run():
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        controller._expire(controller._waiters[0])
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert controller.stats()["in_flight"] == 1
+        controller.release()
+
+    asyncio.run(run())
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_adaptive_limit_follows_latency():
+    """Test slow requests shrink the limit and fast ones at the limit grow it"""
+    controller = AdmissionController(limit=8, target_latency=0.05, min_limit=2)
+
+    async def run(latency, times):
+        for _ in range(times):
+            for _ in range(int(controller.limit)):
+                await controller.acquire()
+            for _ in range(int(controller.limit)):
+                controller.release(latency)
+                controller._last_decrease = 0.0
+
+    asyncio.run(run(0.2, 20))
+    assert controller.stats()["limit"] == 2
+    asyncio.run(run(0.001, 50))
+    assert controller.stats()["limit"] == 8
@@ -0,0 +1,626 @@
+"""
+Unit tests for the IRIS Classifier API
+"""
+
+import asyncio
+import io
+import json
+import threading
+
+import pytest
+import numpy as np
+import pandas as pd
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from sklearn.datasets import load_iris
+from sklearn.tree import DecisionTreeClassifier
+
+import app as app_module
+from admission import AdmissionController, AdmissionMiddleware
+from micro_batching import MicroBatcher
+from model_registry import ModelRegistry
+from model_reload import ModelReloader, compile_model_file
+from prediction_cache import PredictionCache
+from serialization import prediction_dtype
+from tree_engine import build_engine
+
+FEATURES = ['sepal_length', 'sepal_width', 'petal_length', 'petal_width']
+
+
+@pytest.fixture(scope="module")
+def iris_data():
+    """Full IRIS dataset with the column names used by train.py"""
+    iris = load_iris(as_frame=True)
+    X = iris.data.copy()
+    X.columns = FEATURES
+    y = pd.Series(iris.target_names[iris.target], name='species')
+    return X, y
+
+
+@pytest.fixture
+def iris_model(iris_data, monkeypatch):
+    """Serve a depth-5 tree trained on the full dataset"""
+    X, y = iris_data
+    model = DecisionTreeClassifier(max_depth=5, random_state=42).fit(X, y)
+    monkeypatch.setattr(app_module, "model", model)
+    monkeypatch.setattr(app_module, "engine", build_engine(model))
+    return model
+
+
+@pytest.fixture
+def client(iris_model):
+    return TestClient(app_module.app)
+
+
+def test_predict(client, iris_model, iris_data):
+    """Test single prediction matches the model"""
+    X, _ = iris_data
+    row = X.iloc[0]
+    response = client.post("/predict", json=row.to_dict())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["species"] == iris_model.predict(X.iloc[[0]])[0]
+    assert 0 <= body["confidence"] <= 1
+
+
+def test_predict_batch_matches_model(client, iris_model, iris_data):
+    """Test batch endpoint returns the same answers as sklearn row by row"""
+    X, _ = iris_data
+    response = client.post("/predict/batch", json={"samples": X.to_dict(orient="records")})
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+
+    assert len(predictions) == len(X)
+    expected = iris_model.predict(X)
+    expected_conf = iris_model.predict_proba(X).max(axis=1)
+    assert [p["species"] for p in predictions] == expected.tolist()
+    assert np.allclose([p["confidence"] for p in predictions], expected_conf)
+
+
+@pytest.mark.parametrize("layout", ["columnar", "indexed"])
+def test_predict_batch_layouts(client, iris_model, iris_data, layout):
+    """Test columnar and indexed response shapes carry the same predictions"""
+    X, _ = iris_data
+    response = client.post(
+        f"/predict/batch?format={layout}", json={"samples": X.to_dict(orient="records")}
+    )
+    assert response.status_code == 200
+    body = response.json()
+
+    if layout == "indexed":
+        species = [body["classes"][i] for i in body["class_index"]]
+    else:
+        species = body["species"]
+    assert species == iris_model.predict(X).tolist()
+    assert np.allclose(body["confidence"], iris_model.predict_proba(X).max(axis=1))
+
+
+def test_predict_batch_unknown_layout(client):
+    response = client.post("/predict/batch?format=xml", json={"samples": []})
+    assert response.status_code == 422
+
+
+def test_predict_batch_gzip(client, iris_data, monkeypatch):
+    """Test large responses are gzipped only when the client asks"""
+    monkeypatch.setattr(app_module, "GZIP_MIN_BYTES", 1000)
+    X, _ = iris_data
+    payload = {"samples": X.to_dict(orient="records")}
+
+    compressed = client.post("/predict/batch", json=payload, headers={"accept-encoding": "gzip"})
+    plain = client.post("/predict/batch", json=payload, headers={"accept-encoding": "identity"})
+    small = client.post("/predict/batch", json={"samples": payload["samples"][:1]},
+                        headers={"accept-encoding": "gzip"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert "content-encoding" not in small.headers
+    assert compressed.json() == plain.json()
+
+
+def test_predict_batch_chunking(iris_model, iris_data):
+    """Test chunked scoring gives identical results for any chunk size"""
+    X, _ = iris_data
+    X = X.to_numpy()
+    engine = app_module.engine
+    species, confidence = app_module.predict_array(engine, X, chunk_size=len(X))
+    for chunk_size in (1, 7, 64):
+        chunked_species, chunked_confidence = app_module.predict_array(engine, X, chunk_size=chunk_size)
+        assert chunked_species.tolist() == species.tolist()
+        assert np.array_equal(chunked_confidence, confidence)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_predict_batch_binary(client, iris_model, iris_data, dtype):
+    """Test raw float rows are scored and answered in binary"""
+    X, _ = iris_data
+    features = X.to_numpy().astype(dtype)
+    response = client.post(
+        "/predict/batch",
+        content=features.tobytes(),
+        headers={"content-type": "application/octet-stream", "x-array-dtype": dtype}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+
+    classes = response.headers["x-classes"].split(",")
+    records = np.frombuffer(response.content, dtype=prediction_dtype(features.dtype))
+    species = [classes[i] for i in records["class_index"]]
+    assert species == iris_model.predict(features).tolist()
+    assert np.allclose(records["confidence"], iris_model.predict_proba(features).max(axis=1))
+
+
+def test_predict_batch_npy(client, iris_model, iris_data):
+    """Test .npy bodies are answered with a .npy of prediction records"""
+    X, _ = iris_data
+    buffer = io.BytesIO()
+    np.save(buffer, X.to_numpy()[:10])
+    response = client.post(
+        "/predict/batch",
+        content=buffer.getvalue(),
+        headers={"content-type": "application/octet-stream"}
+    )
+    assert response.status_code == 200
+    records = np.load(io.BytesIO(response.content))
+    assert len(records) == 10
+    assert records.dtype == prediction_dtype(np.dtype("<f8"))
+
+
+def test_predict_batch_binary_bad_body(client):
+    """Test malformed binary bodies are rejected with 400"""
+    response = client.post(
+        "/predict/batch",
+        content=b"\x00" * 10,
+        headers={"content-type": "application/octet-stream"}
+    )
+    assert response.status_code == 400
+
+
+def test_predict_batch_invalid_json(client):
+    """Test invalid JSON samples still give a 422 validation error"""
+    response = client.post("/predict/batch", json={"samples": [{"sepal_length": 1.0}]})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][:2] == ["body", "samples"]
+
+
+def test_predict_malformed_json(client):
+    """Test undecodable bodies are rejected the way FastAPI rejects them"""
+    response = client.post("/predict", content=b'{"sepal_length": ',
+                           headers={"content-type": "application/json"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "json_invalid"
+    assert response.json()["detail"][0]["loc"][0] == "body"
+
+
+def test_metrics_endpoint(client, iris_data):
+    """Test requests are counted per route and timed per stage"""
+    X, _ = iris_data
+    before = client.get("/metrics").text
+    client.post("/predict", json=X.iloc[0].to_dict())
+    client.post("/predict/batch?format=columnar", json={"samples": X.head(5).to_dict(orient="records")})
+    client.post("/models/nope/predict", json=X.iloc[0].to_dict())
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    def sample(text, name):
+        for line in text.splitlines():
+            if line.startswith(name + " "):
+                return float(line.rsplit(" ", 1)[1])
+        return 0.0
+
+    def delta(name):
+        return sample(response.text, name) - sample(before, name)
+
+    assert delta('iris_requests_total{endpoint="/predict",method="POST",status="200"}') == 1
+    assert delta('iris_requests_total{endpoint="/models/{name}/predict",method="POST",status="404"}') == 1
+    for stage in ("parse", "validate", "convert", "inference", "serialize"):
+        assert delta(f'iris_stage_duration_seconds_count{{endpoint="/predict/batch",stage="{stage}"}}') == 1
+    assert sample(response.text, 'iris_requests_in_flight{endpoint="/metrics"}') == 1
+
+
+def test_predict_stream(client, iris_model, iris_data, monkeypatch):
+    """Test NDJSON rows are scored in chunks and answered in order"""
+    monkeypatch.setattr(app_module, "STREAM_CHUNK_SIZE", 7)
+    X, _ = iris_data
+    records = X.to_dict(orient="records")
+    lines = [json.dumps(r) for r in records[:20]] + [json.dumps(list(r.values())) for r in records[20:]]
+    body = "\n".join(lines[:50]) + "\n\n" + "\n".join(lines[50:])
+
+    response = client.post("/predict/stream", content=body.encode())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["species"] for r in results] == iris_model.predict(X).tolist()
+    assert np.allclose([r["confidence"] for r in results], iris_model.predict_proba(X).max(axis=1))
+
+
+def test_predict_stream_bad_rows(client):
+    """Test unparseable rows get an error record in their place"""
+    body = b'[5.1, 3.5, 1.4, 0.2]\nnot json\n{"sepal_length": 5.1}\n[1, 2]\n[6.3, 3.3, 6.0, 2.5]'
+    response = client.post("/predict/stream", content=body)
+    results = [json.loads(line) for line in response.text.splitlines()]
+
+    assert len(results) == 5
+    assert "species" in results[0] and "species" in results[4]
+    assert [r.get("row") for r in results[1:4]] == [2, 3, 4]
+    assert all("error" in r for r in results[1:4])
+
+
+def test_predict_stream_line_too_long(client, monkeypatch):
+    """Test a line over the size limit ends the stream with an error"""
+    monkeypatch.setattr(app_module, "STREAM_MAX_LINE_BYTES", 100)
+    body = b"[5.1, 3.5, 1.4, 0.2]\n" + b"[" + b" " * 200
+    results = [json.loads(line) for line in client.post("/predict/stream", content=body).text.splitlines()]
+    assert "species" in results[0]
+    assert results[1]["row"] == 2
+    assert "error" in results[1]
+
+
+def test_ws_predict_pipelined(client, iris_model, iris_data):
+    """Test pipelined WebSocket messages are all answered with their ids"""
+    X, _ = iris_data
+    records = X.to_dict(orient="records")
+    with client.websocket_connect("/ws/predict") as ws:
+        for i, record in enumerate(records):
+            ws.send_text(json.dumps({"id": i, **record}))
+        ws.send_text("not json")
+        ws.send_bytes(b'{"id": "bad", "sepal_length": 5.1}')
+
+        replies = []
+        while len(replies) < len(records) + 2:
+            replies.extend(ws.receive_json())
+
+    assert [r["id"] for r in replies[:-2]] == list(range(len(records)))
+    assert [r["species"] for r in replies[:-2]] == iris_model.predict(X).tolist()
+    assert replies[-2]["id"] is None and replies[-2]["error"].startswith("Invalid JSON")
+    assert replies[-1] == {"id": "bad", "error": "Missing feature 'sepal_width'"}
+
+
+def test_score_messages_answers_in_one_frame(iris_model, iris_data):
+    """Test queued messages are scored together into one reply array"""
+    X, _ = iris_data
+    messages = [json.dumps({"id": i, **r}) for i, r in enumerate(X.to_dict(orient="records"))]
+    messages.insert(3, '[1, 2, 3, 4]')
+    replies = json.loads(app_module.score_messages(app_module.engine, messages))
+
+    assert len(replies) == len(messages)
+    assert replies[3] == {"id": None, "error": "Expected a JSON object"}
+    del replies[3]
+    assert [r["species"] for r in replies] == iris_model.predict(X).tolist()
+    assert np.allclose([r["confidence"] for r in replies], iris_model.predict_proba(X).max(axis=1))
+
+
+def test_ws_predict_without_model(monkeypatch):
+    """Test the WebSocket is closed with try-again-later when no model is loaded"""
+    monkeypatch.setattr(app_module, "model", None)
+    with TestClient(app_module.app).websocket_connect("/ws/predict") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_text()
+    assert closed.value.code == 1013
+
+
+def test_predict_batch_empty(client):
+    """Test an empty batch returns an empty prediction list"""
+    response = client.post("/predict/batch", json={"samples": []})
+    assert response.status_code == 200
+    assert response.json() == {"predictions": []}
+
+
+def test_predict_microbatch_mode(client, iris_model, iris_data, monkeypatch):
+    """Test /predict answers through the micro-batcher when enabled"""
+    batcher = MicroBatcher(
+        lambda X: app_module.predict_array(app_module.engine, X), max_batch_size=8, max_wait_us=100
+    )
+    monkeypatch.setattr(app_module, "batcher", batcher)
+    X, _ = iris_data
+
+    for i in (0, 60, 120):
+        response = client.post("/predict", json=X.iloc[i].to_dict())
+        assert response.status_code == 200
+        assert response.json()["species"] == iris_model.predict(X.iloc[[i]])[0]
+
+    stats = client.get("/batching/stats").json()
+    assert stats["enabled"] is True
+    assert stats["requests"] == 3
+
+
+def test_predict_cache_hit(client, iris_model, iris_data, monkeypatch):
+    """Test repeated /predict payloads are answered from the cache"""
+    monkeypatch.setattr(app_module, "prediction_cache", PredictionCache(maxsize=16))
+    X, _ = iris_data
+    payload = X.iloc[100].to_dict()
+
+    first = client.post("/predict", json=payload).json()
+    second = client.post("/predict", json=payload).json()
+    assert first == second
+
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_predict_cache_answer_does_not_depend_on_order(client, iris_model, iris_data,
+                                                       monkeypatch):
+    """Test rows quantizing to one cache key across a split get the key's answer"""
+    X, _ = iris_data
+    tree = iris_model.tree_
+    feature, threshold = FEATURES[tree.feature[0]], tree.threshold[0]
+    quantized = round(threshold, 4)
+    below, above = X.iloc[[0, 0]].copy(), X.iloc[[0, 0]].copy()
+    below[feature], above[feature] = quantized - 0.00004, quantized + 0.00004
+    assert iris_model.predict(below)[0] != iris_model.predict(above)[0]
+    expected = iris_model.predict(below.round(4))[0]
+
+    for first, second in ((below, above), (above, below)):
+        monkeypatch.setattr(app_module, "prediction_cache", PredictionCache(maxsize=16))
+        answers = [
+            client.post("/predict", json=rows.iloc[0].to_dict()).json()["species"]
+            for rows in (first, second)
+        ]
+        assert answers == [expected, expected]
+        assert client.get("/cache/stats").json()["hits"] == 1
+
+
+@pytest.mark.parametrize("mode, rows, inline", [
+    ("inline", 10_000, True),
+    ("threadpool", 1, False),
+    ("auto", 1, True),
+    ("auto", 10_000, False),
+])
+def test_run_prediction_execution_mode(monkeypatch, mode, rows, inline):
+    """Test prediction work runs on the event loop only when it should"""
+    monkeypatch.setattr(app_module, "EXECUTION_MODE", mode)
+    monkeypatch.setattr(app_module, "INLINE_MAX_ROWS", 256)
+
+    async def run():
+        worker = await app_module.run_prediction(threading.get_ident, rows=rows)
+        return worker == threading.get_ident()
+
+    assert asyncio.run(run()) is inline
+
+
+@pytest.fixture
+def registry(iris_data, tmp_path, monkeypatch):
+    """Registry over three small trees of different depths"""
+    import joblib
+    X, y = iris_data
+    for depth in (1, 2, 3):
+        model = DecisionTreeClassifier(max_depth=depth, random_state=0).fit(X, y)
+        joblib.dump(model, tmp_path / f"depth{depth}.joblib")
+    registry = ModelRegistry(str(tmp_path), memory_budget=10 ** 9)
+    monkeypatch.setattr(app_module, "registry", registry)
+    return registry
+
+
+def test_registry_models_load_lazily(client, registry, iris_data):
+    """Test registry models are listed, loaded on first use and scored"""
+    X, y = iris_data
+    listing = client.get("/models").json()
+    assert sorted(listing["models"]) == ["depth1", "depth2", "depth3"]
+    assert not any(m["loaded"] for m in listing["models"].values())
+
+    response = client.post("/models/depth1/predict", json=X.iloc[120].to_dict())
+    assert response.status_code == 200
+    assert response.json()["species"] == "versicolor"  # a stump cannot tell the other two apart
+
+    response = client.post("/models/depth3/predict/batch?format=columnar",
+                           json={"samples": X.to_dict(orient="records")})
+    assert response.status_code == 200
+    assert np.mean(np.array(response.json()["species"]) == y.to_numpy()) > 0.9
+
+    stats = client.get("/models").json()
+    assert stats["loads"] == 2
+    assert stats["models"]["depth1"]["loaded"] and stats["models"]["depth1"]["requests"] == 1
+    assert stats["models"]["depth1"]["memory_bytes"] > 0
+    assert not stats["models"]["depth2"]["loaded"]
+
+
+def test_registry_unknown_model(client, registry):
+    assert client.post("/models/nope/predict", json={
+        "sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2
+    }).status_code == 404
+    assert client.post("/models/..%2Fdepth1/predict/batch", json={"samples": []}).status_code == 404
+
+
+def test_registry_evicts_least_recently_used(registry):
+    """Test models beyond the memory budget are evicted oldest first"""
+    sizes = {name: registry.get(name).memory_bytes for name in ("depth1", "depth2", "depth3")}
+    registry.memory_budget = sum(sizes.values()) - 1
+    registry.get("depth1")
+    registry._loaded.pop("depth3")
+    registry.get("depth3")
+
+    assert registry.loaded("depth2") is None
+    assert registry.loaded("depth1") is not None
+    assert registry.loaded("depth3") is not None
+    assert registry.evictions == 1
+
+
+@pytest.fixture
+def reload_path(iris_data, tmp_path, monkeypatch):
+    """MODEL_PATH in a temp dir, watched by a fresh reloader"""
+    path = tmp_path / "model.joblib"
+    monkeypatch.setattr(app_module, "reloader", ModelReloader(str(path), FEATURES))
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    return path
+
+
+def dump_tree(path, X, y, depth):
+    import joblib
+    model = DecisionTreeClassifier(max_depth=depth, random_state=0).fit(X, y)
+    joblib.dump(model, path)
+    return model
+
+
+def test_admission_sheds_only_prediction_endpoints(iris_model):
+    """Test rejected predictions get a fast 429 while health checks pass"""
+    controller = AdmissionController(limit=1, queue_size=0)
+    client = TestClient(AdmissionMiddleware(
+        app_module.app, controller,
+        admits=lambda scope: app_module.endpoint_of(scope) in app_module.ADMITTED_ENDPOINTS,
+        retry_after=2
+    ))
+    sample = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+    assert client.post("/predict", json=sample).status_code == 200
+
+    controller.in_flight = 1  # a request being handled elsewhere
+    response = client.post("/predict", json=sample)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+    assert response.json() == {"detail": "Server is overloaded, retry later"}
+    assert client.get("/health").status_code == 200
+    controller.in_flight = 0
+
+    assert controller.stats()["admitted"] == 1
+    assert controller.stats()["shed"] == 1
+
+
+def test_admission_stats_when_disabled(client):
+    assert client.get("/admission/stats").json() == {"enabled": False}
+
+
+def test_admin_reload_swaps_model(client, iris_model, iris_data, reload_path):
+    """Test a reload serves the new file and clears results of the old model"""
+    X, y = iris_data
+    old_engine = app_module.engine
+    dump_tree(reload_path, X, y, depth=1)
+
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert app_module.engine is not old_engine
+    assert app_module.model.get_depth() == 1
+
+    # The stump cannot tell virginica apart, the depth-5 tree could
+    response = client.post("/predict", json=X.iloc[120].to_dict())
+    assert response.json()["species"] == "versicolor"
+    # An engine captured before the swap keeps answering as before
+    assert old_engine.predict_one(X.iloc[120].tolist())[0] == "virginica"
+
+
+def test_admin_reload_rejects_incompatible_model(client, iris_model, iris_data, reload_path):
+    """Test a model with other classes or features is rejected and the old one kept"""
+    X, y = iris_data
+    keep = y != "setosa"
+    dump_tree(reload_path, X[keep], y[keep], depth=2)
+
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 422
+    assert "classes" in response.json()["detail"]
+    assert app_module.model is iris_model
+
+    dump_tree(reload_path, X.iloc[:, :3], y, depth=2)
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "secret"}).status_code == 422
+
+    reload_path.write_bytes(b"not a model")
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "secret"}).status_code == 500
+    assert app_module.model is iris_model
+    assert client.get("/reload/stats").json()["failures"] == 3
+
+
+def test_admin_reload_requires_token(client, reload_path, monkeypatch):
+    assert client.post("/admin/reload").status_code == 401
+    assert client.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "")
+    assert client.post("/admin/reload", headers={"X-Admin-Token": ""}).status_code == 403
+
+
+def test_admin_profile(client, reload_path):
+    """Test the profiler samples for the requested time and needs the token"""
+    assert client.post("/admin/profile?seconds=0.05").status_code == 401
+    assert client.post("/admin/profile?seconds=3600", headers={"X-Admin-Token": "secret"}).status_code == 422
+
+    response = client.post(
+        "/admin/profile?seconds=0.05&interval_ms=1&include_idle=true",
+        headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 200
+    profile = response.json()
+    assert profile["samples"] > 0 and profile["duration"] >= 0.05
+    assert profile["top"] and profile["collapsed"].endswith("\n")
+
+    response = client.post(
+        "/admin/profile?seconds=0.05&include_idle=true&format=collapsed",
+        headers={"X-Admin-Token": "secret"}
+    )
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == "" or response.text.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+
+def test_model_watcher_reloads_changed_file(iris_model, iris_data, reload_path, monkeypatch):
+    """Test the watcher picks up a rewritten file and skips a broken one"""
+    X, y = iris_data
+    monkeypatch.setattr(app_module, "MODEL_WATCH_INTERVAL", 0.01)
+    reloader = app_module.reloader
+
+    async def watch_until(condition):
+        task = asyncio.get_running_loop().create_task(app_module.watch_model_file())
+        try:
+            for _ in range(500):
+                await asyncio.sleep(0.01)
+                if condition():
+                    return True
+            return False
+        finally:
+            task.cancel()
+
+    dump_tree(reload_path, X, y, depth=2)
+    assert asyncio.run(watch_until(lambda: reloader.version == 1))
+    assert app_module.model.get_depth() == 2
+
+    served = app_module.model
+    reload_path.write_bytes(b"partial write")
+    assert asyncio.run(watch_until(lambda: reloader.failures == 1))
+    assert not reloader.changed()
+    assert app_module.model is served
+
+
+def test_lifespan_loads_compiled_model(iris_data, reload_path, monkeypatch):
+    """Test start-up serves the compiled tree while it matches the model file"""
+    X, y = iris_data
+    monkeypatch.setattr(app_module, "model", None)
+    monkeypatch.setattr(app_module, "engine", None)
+    model = dump_tree(reload_path, X, y, depth=3)
+    compile_model_file(str(reload_path))
+
+    with TestClient(app_module.app) as client:
+        assert client.get("/health").status_code == 200
+        assert client.get("/reload/stats").json()["compiled"]
+        assert client.get("/model/info").json() == {
+            "model_type": "DecisionTreeClassifier",
+            "n_features": 4,
+            "classes": ["setosa", "versicolor", "virginica"]
+        }
+        response = client.post("/predict/batch?format=columnar",
+                               json={"samples": X.to_dict(orient="records")})
+        assert response.json()["species"] == model.predict(X).tolist()
+
+        # The compiled file is stale once the model file is replaced
+        dump_tree(reload_path, X, y, depth=1)
+        assert client.post("/admin/reload", headers={"X-Admin-Token": "secret"}).status_code == 200
+        assert not client.get("/reload/stats").json()["compiled"]
+        assert app_module.model.get_depth() == 1
+
+
+def test_preloaded_model_is_kept_at_startup(iris_data, reload_path, monkeypatch):
+    """Test workers forked after preload_model() do not load the model again"""
+    X, y = iris_data
+    monkeypatch.setattr(app_module, "model", None)
+    monkeypatch.setattr(app_module, "engine", None)
+    dump_tree(reload_path, X, y, depth=2)
+
+    app_module.preload_model()
+    engine = app_module.engine
+    with TestClient(app_module.app) as client:
+        assert client.get("/reload/stats").json()["version"] == 1
+        assert app_module.engine is engine
+
+
+def test_predict_without_model(monkeypatch):
+    """Test endpoints return 503 when no model is loaded"""
+    monkeypatch.setattr(app_module, "model", None)
+    monkeypatch.setattr(app_module, "engine", None)
+    client = TestClient(app_module.app)
+    assert client.post("/predict/batch", json={"samples": []}).status_code == 503
+    assert client.get("/health").status_code == 503
@@ -0,0 +1,46 @@
+"""
+Unit tests for the benchmark suite's regression gate
+"""
+
+import asyncio
+
+from benchmarks import suite
+
+
+def result(throughput, p50, p99):
+    return {"throughput": throughput, "p50_us": p50, "p99_us": p99}
+
+
+def test_compare_flags_only_slowdowns_past_threshold():
+    """Test each gated metric is judged in its own direction and limit"""
+    baseline = {"cases": {
+        "predict": result(1000, 100, 200),
+        "batch_100": result(500, 400, 800),
+        "model_info": result(2000, 50, 100),
+    }}
+    results = {
+        "predict": result(700, 100, 200),       # throughput down 43%
+        "batch_100": result(520, 380, 1100),    # faster, p99 up 37.5%
+        "model_info": result(2000, 70, 160),    # p50 up 40%, p99 up 60%
+        "new_case": result(1, 1, 1),
+    }
+    changes, regressions = suite.compare(results, baseline, threshold=0.25, tail_threshold=0.5)
+
+    assert set(changes) == {"predict", "batch_100", "model_info"}
+    assert changes["batch_100"]["p50_us"] < 0 < changes["batch_100"]["p99_us"]
+    assert [r.split(":")[0] for r in regressions] == [
+        "predict throughput", "model_info p50_us", "model_info p99_us"
+    ]
+
+
+def test_time_case_reports_percentiles(monkeypatch):
+    monkeypatch.setattr(suite, "MIN_SECONDS", 0.0)
+    calls = []
+
+    async def step():
+        calls.append(None)
+
+    timing = asyncio.run(suite.time_case(step, 50))
+    assert timing["iterations"] == 50 and len(calls) == 55
+    assert 0 < timing["p50_us"] <= timing["p95_us"] <= timing["p99_us"]
+    assert timing["throughput"] > 0
@@ -0,0 +1,77 @@
+"""
+Unit tests for the cached dataset loader
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset
+from dataset import load_dataset, load_frame
+
+CSV = (
+    "\ufeffsepal_length,sepal_width,petal_length,petal_width,species\n"
+    "5.1,3.5,1.4,0.2,setosa\n"
+    "6.7,3.1,4.4,1.4,versicolor\n"
+    "6.3,3.3,6.0,2.5,virginica\n"
+    "4.9,3.0,1.4,0.2,setosa\n"
+)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "iris.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return str(path)
+
+
+def test_first_load_parses_later_loads_map_the_cache(csv_path, monkeypatch):
+    first = load_dataset(csv_path)
+    assert first.feature_names == ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+    assert first.features.dtype == np.float32
+    assert first.classes == ["setosa", "versicolor", "virginica"]
+    assert first.labels().tolist() == ["setosa", "versicolor", "virginica", "setosa"]
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(pd, "read_csv", no_parsing)
+    second = load_dataset(csv_path)
+    assert isinstance(second.features, np.memmap)
+    np.testing.assert_array_equal(second.features, first.features)
+    np.testing.assert_array_equal(second.codes, first.codes)
+
+
+def test_editing_the_csv_invalidates_the_cache(csv_path, tmp_path):
+    load_dataset(csv_path)
+    with open(csv_path, "a") as f:
+        f.write("7.7,2.6,6.9,2.3,virginica\n")
+
+    reloaded = load_dataset(csv_path)
+    assert len(reloaded) == 5
+    assert reloaded.features[-1].tolist() == pytest.approx([7.7, 2.6, 6.9, 2.3])
+    # the entry for the old contents is gone
+    assert len(list((tmp_path / ".cache").iterdir())) == 1
+
+
+def test_frame_matches_pandas(csv_path):
+    frame = load_frame(csv_path)
+    expected = pd.read_csv(csv_path)
+    assert frame.columns.tolist() == expected.columns.tolist()
+    assert frame["species"].dtype == "category"
+    assert frame["species"].astype(str).tolist() == expected["species"].tolist()
+    np.testing.assert_allclose(frame.iloc[:, :4].to_numpy(), expected.iloc[:, :4].to_numpy(), rtol=1e-6)
+
+
+def test_non_numeric_features_are_rejected(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("sepal_length,colour,species\n5.1,red,setosa\n")
+    with pytest.raises(ValueError, match="colour"):
+        load_dataset(str(path))
+
+
+def test_cache_directory_can_be_moved(csv_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset, "CACHE_DIR", str(tmp_path / "elsewhere"))
+    load_dataset(csv_path)
+    assert len(list((tmp_path / "elsewhere").iterdir())) == 1
+    assert not (tmp_path / ".cache").exists()
@@ -0,0 +1,140 @@
+"""
+Unit tests for the out-of-core histogram tree trainer
+"""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import load_iris
+from sklearn.tree import DecisionTreeClassifier
+
+from histogram_tree import FEATURE_NAMES, HistogramTreeTrainer, array_chunks, csv_chunks
+from model_reload import CompiledModel, compile_model_file, read_model, validate_model
+from train import train_model_out_of_core
+
+
+@pytest.fixture(scope="module")
+def iris():
+    data = load_iris()
+    return data.data.astype(np.float32), data.target_names[data.target].astype(object)
+
+
+@pytest.fixture(scope="module")
+def noisy():
+    """Continuous features with many more distinct values than bins"""
+    rng = np.random.default_rng(0)
+    data = load_iris()
+    picks = rng.integers(0, len(data.data), 5000)
+    X = (data.data[picks] + rng.normal(0, 0.2, (5000, 4))).astype(np.float32)
+    return X, data.target_names[data.target[picks]].astype(object)
+
+
+def fit(X, y, chunk_rows=1000, **params):
+    params = {"holdout": 0.0, "log": lambda _: None, "chunk_rows": chunk_rows, **params}
+    return HistogramTreeTrainer(**params).fit(array_chunks(X, y, chunk_rows))
+
+
+def test_matches_sklearn_on_iris(iris):
+    X, y = iris
+    model = fit(X, y, max_depth=3).to_sklearn()
+    reference = DecisionTreeClassifier(max_depth=3, random_state=42).fit(X, y)
+
+    assert sorted(model.tree_.threshold) == pytest.approx(sorted(reference.tree_.threshold))
+    assert model.predict(X).tolist() == reference.predict(X).tolist()
+    assert model.predict_proba(X) == pytest.approx(reference.predict_proba(X))
+
+
+def test_chunk_size_does_not_change_the_tree(noisy, monkeypatch):
+    X, y = noisy
+    whole = fit(X, y, chunk_rows=len(X), max_depth=5, max_bins=32, holdout=0.3)
+
+    routed = []
+    route = HistogramTreeTrainer._route
+
+    def recording_route(self, codes, arrays):
+        routed.append(len(codes))
+        return route(self, codes, arrays)
+
+    # the passes over the binned rows read chunks of the trainer's size too
+    monkeypatch.setattr(HistogramTreeTrainer, "_route", recording_route)
+    chunked = fit(X, y, chunk_rows=333, max_depth=5, max_bins=32, holdout=0.3)
+    assert max(routed) == 333
+
+    for name in ("feature", "threshold", "children_left", "n_node_samples"):
+        assert getattr(whole.to_sklearn().tree_, name).tolist() == \
+            getattr(chunked.to_sklearn().tree_, name).tolist()
+    assert whole.n_holdout_ == chunked.n_holdout_
+    assert whole.holdout_accuracy_ == chunked.holdout_accuracy_ > 0.9
+
+
+def test_thresholds_route_rows_as_training_did(noisy):
+    X, y = noisy
+    trainer = fit(X, y, max_depth=6, max_bins=16)
+    tree = trainer.to_sklearn().tree_
+
+    reached = np.bincount(tree.decision_path(X).indices, minlength=tree.node_count)
+    assert reached.tolist() == tree.n_node_samples.tolist()
+    assert trainer.passes_ == trainer.depth + 1
+
+
+def test_depth_and_sample_limits(noisy):
+    X, y = noisy
+    tree = fit(X, y, max_depth=4, min_samples_split=400, min_samples_leaf=150).to_sklearn().tree_
+    internal = tree.children_left != -1
+
+    assert tree.max_depth <= 4
+    assert tree.n_node_samples[internal].min() >= 400
+    assert tree.n_node_samples[~internal].min() >= 150
+
+    unlimited = fit(X, y, max_depth=None)
+    assert unlimited.depth > 4
+
+
+def test_holdout_accuracy_is_that_of_the_exported_model(noisy):
+    X, y = noisy
+    trainer = fit(X, y, max_depth=4, holdout=0.3)
+    held_out = np.random.default_rng(42).random(len(X)) < 0.3
+
+    assert trainer.n_holdout_ == held_out.sum()
+    assert trainer.n_train_ == trainer.to_sklearn().tree_.n_node_samples[0]
+    accuracy = np.mean(trainer.to_sklearn().predict(X[held_out]) == y[held_out])
+    assert trainer.holdout_accuracy_ == pytest.approx(accuracy)
+
+
+def test_exported_model_loads_for_serving(noisy, tmp_path):
+    X, y = noisy
+    model = fit(X, y, max_depth=5).to_sklearn()
+    path = str(tmp_path / "model.joblib")
+    joblib.dump(model, path)
+
+    validate_model(joblib.load(path), FEATURE_NAMES)
+    compile_model_file(path)
+    served, tree = read_model(path)
+    assert isinstance(served, CompiledModel)
+    labels, _ = tree.predict(X)
+    assert labels.tolist() == model.predict(pd.DataFrame(X, columns=FEATURE_NAMES)).tolist()
+
+
+def test_train_model_out_of_core_streams_a_csv(noisy, tmp_path):
+    X, y = noisy
+    path = tmp_path / "data.csv"
+    frame = pd.DataFrame(X.round(2), columns=FEATURE_NAMES)
+    frame["species"] = y
+    frame.to_csv(path, index=False, encoding="utf-8-sig")
+
+    model, accuracy = train_model_out_of_core(str(path), max_depth=4, chunk_rows=700)
+    assert list(model.feature_names_in_) == FEATURE_NAMES
+    assert accuracy > 0.9
+
+    chunks = list(csv_chunks(str(path), chunk_rows=700)())
+    assert len(chunks) == 8
+    assert chunks[0][0].dtype == np.float32
+
+
+def test_rejects_missing_values_and_bad_limits(iris):
+    X, y = iris
+    with pytest.raises(ValueError, match="missing"):
+        fit(np.where(X > 7, np.nan, X).astype(np.float32), y)
+    with pytest.raises(ValueError, match="min_samples_leaf"):
+        HistogramTreeTrainer(min_samples_leaf=0)
@@ -0,0 +1,110 @@
+"""
+Unit tests for the parallel hyperparameter search
+"""
+
+import numpy as np
+import pytest
+from sklearn.datasets import load_iris
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+from hyperparameter_search import candidates, rung_sizes, run_search
+
+
+def test_grid_tries_every_combination():
+    space = {"params": {"max_depth": {"range": [1, 4]}, "criterion": ["gini", "entropy"]}}
+    params = candidates(space)
+    assert len(params) == 6
+    assert params[0] == {"max_depth": 1, "criterion": "gini"}
+    assert {p["max_depth"] for p in params} == {1, 2, 3}
+
+
+def test_random_space_is_seeded_and_bounded():
+    space = {
+        "strategy": "random", "samples": 200, "seed": 7,
+        "params": {
+            "max_depth": {"randint": [2, 5]},
+            "ccp_alpha": {"loguniform": [0.001, 0.1]},
+            "criterion": ["gini", "entropy"],
+        },
+    }
+    params = candidates(space)
+    assert params == candidates(space)
+    assert len(params) == 200
+    assert {p["max_depth"] for p in params} == {2, 3, 4, 5}
+    assert all(0.001 <= p["ccp_alpha"] <= 0.1 for p in params)
+
+    with pytest.raises(ValueError):
+        candidates({"strategy": "bayesian", "params": {}})
+
+
+def test_rung_sizes_end_on_full_training_set():
+    assert rung_sizes(100, 1000, 3, 30) == [37, 111, 333, 1000]
+    # few candidates limit the rungs as well
+    assert rung_sizes(5, 1000, 3, 30) == [333, 1000]
+    assert rung_sizes(1, 1000, 3, 30) == [1000]
+
+
+@pytest.fixture
+def iris_split():
+    X, y = load_iris(return_X_y=True)
+    return train_test_split(X, y, test_size=0.3, random_state=42)
+
+
+def test_parallel_search_matches_sequential_fits(iris_split):
+    X_train, X_test, y_train, y_test = iris_split
+    params_list = candidates({"params": {"max_depth": [1, 2, 3, None], "min_samples_leaf": [1, 5]}})
+
+    outcome = run_search(params_list, X_train, y_train, X_test, y_test, workers=2, log=lambda _: None)
+
+    results = outcome["results"]
+    assert sorted(result["id"] for result in results) == list(range(len(params_list)))
+    for result in results:
+        model = DecisionTreeClassifier(random_state=42, **result["params"]).fit(X_train, y_train)
+        assert result["accuracy"] == np.mean(model.predict(X_test) == y_test)
+    accuracies = [result["accuracy"] for result in results]
+    assert accuracies == sorted(accuracies, reverse=True)
+
+
+def test_successive_halving_discards_candidates(iris_split):
+    X_train, X_test, y_train, y_test = iris_split
+    params_list = candidates({"params": {"max_depth": {"range": [1, 10]}, "min_samples_leaf": [1, 2, 4]}})
+
+    outcome = run_search(params_list, X_train, y_train, X_test, y_test, workers=2,
+                         halving=True, min_resources=10, log=lambda _: None)
+
+    rungs = outcome["rungs"]
+    assert [rung["candidates"] for rung in rungs] == [27, 9, 3]
+    assert [rung["train_samples"] for rung in rungs] == [11, 35, 105]
+    assert len(outcome["results"]) == 3
+
+
+def test_mlflow_registers_exactly_the_winning_candidate(iris_split, tmp_path, monkeypatch):
+    mlflow = pytest.importorskip("mlflow")
+    import pandas as pd
+    from mlflow.tracking import MlflowClient
+    from train_mlflow import hyperparameter_tuning_with_mlflow
+
+    monkeypatch.chdir(tmp_path)
+    mlflow.set_tracking_uri(f"sqlite:///{tmp_path}/mlflow.db")
+    names = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+    X_train, X_test, y_train, y_test = iris_split
+    X_train, X_test = pd.DataFrame(X_train, columns=names), pd.DataFrame(X_test, columns=names)
+
+    # No max_depth in the space: the search fits unlimited trees
+    space = {"params": {"min_samples_leaf": [1, 5]}}
+    results = hyperparameter_tuning_with_mlflow(X_train, y_train, X_test, y_test,
+                                                space=space, workers=1)
+    best = results[0]["params"]
+
+    client = MlflowClient()
+    experiment = client.get_experiment_by_name("iris_hyperparameter_tuning")
+    final, = client.search_runs([experiment.experiment_id],
+                                filter_string="attributes.run_name LIKE 'dt_depth%'")
+    expected = DecisionTreeClassifier(random_state=42, **best).get_params()
+    for name in ("max_depth", "min_samples_split", "min_samples_leaf"):
+        assert final.data.params[name] == str(expected[name])
+
+    version = client.search_model_versions("name='iris_decision_tree'")[0]
+    registered = mlflow.sklearn.load_model(f"models:/iris_decision_tree/{version.version}")
+    assert registered.get_params() == expected
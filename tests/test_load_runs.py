@@ -0,0 +1,70 @@
+"""
+Unit tests for load test run recording and comparison
+"""
+
+import json
+
+import pytest
+
+from load_runs import RunRecorder, compare, load_run, run_metadata
+
+
+def make_recorder():
+    recorder = RunRecorder(run_metadata(name="test", mode="closed", requests=6, workers=2))
+    recorder.start(100.0)
+    recorder.record(100.2, 0.010, 200)
+    recorder.record(100.9, 0.030, 200, rows=10)
+    recorder.record(100.95, 0.001, 429)
+    recorder.record(102.5, 0.500, 500)
+    recorder.record(102.6, 0.020, 200)
+    return recorder
+
+
+def test_requests_bucketed_by_completion_second():
+    seconds = make_recorder().seconds()
+
+    assert [record["second"] for record in seconds] == [0, 1, 2]
+    first, gap, last = seconds
+    assert (first["ok"], first["rows"], first["shed"], first["errors"]) == (2, 11, 1, 0)
+    assert first["p50_ms"] == pytest.approx(10.0, rel=0.01)
+    assert first["max_ms"] == 30.0
+    # a second with nothing finishing is still written, as zeros
+    assert gap == {"second": 1, "ok": 0, "rows": 0, "errors": 0, "shed": 0}
+    # failed requests do not count towards latency
+    assert (last["ok"], last["errors"], last["max_ms"]) == (1, 1, 20.0)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    recorder = make_recorder()
+    path = tmp_path / "runs" / "a.jsonl"
+    recorder.save(str(path), {"throughput": 2.5, "p99": 30.0, "latencies": [0.01, 0.03]})
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[0])["run"]["name"] == "test"
+
+    run = load_run(str(path))
+    assert run["run"]["requests"] == 6
+    assert "started" in run["run"] and "python" in run["run"]
+    assert run["seconds"] == recorder.seconds()
+    # values that are not JSON scalars are dropped from the summary
+    assert run["summary"] == {"throughput": 2.5, "p99": 30.0}
+
+
+def test_compare_reports_change_against_first_run(tmp_path, capsys):
+    paths = []
+    for name, latency in (("a", 0.010), ("b", 0.015)):
+        recorder = RunRecorder(run_metadata(name=name))
+        recorder.start(0.0)
+        for i in range(4):
+            recorder.record(i + 0.5, latency, 200)
+        paths.append(str(tmp_path / f"{name}.jsonl"))
+        recorder.save(paths[-1], {"throughput": 1 / latency, "p99": latency * 1000})
+
+    compare([load_run(path) for path in paths], ["ok", "p99_ms"], every=2)
+    output = capsys.readouterr().out
+
+    assert "Throughput req/s" in output
+    assert "66.7 (-33%)" in output
+    assert "15.0 (+50%)" in output
+    assert "Per second: p99_ms" in output
@@ -0,0 +1,38 @@
+"""
+Unit tests for the load generator's latency histogram
+"""
+
+import numpy as np
+import pytest
+
+from load_test import LatencyHistogram
+
+
+def test_percentiles_within_one_percent():
+    """Test percentiles match the exact ones to HDR precision"""
+    rng = np.random.default_rng(0)
+    latencies = rng.lognormal(mean=-6, sigma=1.5, size=20_000)
+    histogram = LatencyHistogram()
+    for value in latencies:
+        histogram.record(value)
+
+    assert histogram.count == len(latencies)
+    for percent in (50, 90, 99, 99.9):
+        exact = np.percentile(latencies, percent, method="inverted_cdf")
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.01, abs=2e-6)
+    assert histogram.percentile(100) == histogram.max == latencies.max()
+    assert histogram.mean() == pytest.approx(latencies.mean())
+
+
+def test_small_values_are_exact_and_merge_adds_up():
+    first = LatencyHistogram()
+    second = LatencyHistogram()
+    for micros in range(1, 101):
+        (first if micros <= 50 else second).record(micros / 1_000_000)
+    first.merge(second)
+
+    assert first.count == 100
+    assert first.percentile(50) == pytest.approx(50e-6)
+    assert first.percentile(99) == pytest.approx(99e-6)
+    assert first.min == pytest.approx(1e-6) and first.max == pytest.approx(100e-6)
+    assert LatencyHistogram().percentile(99) == 0.0
@@ -0,0 +1,118 @@
+"""
+Unit tests for the local replica cluster's autoscaler and proxy
+"""
+
+import asyncio
+
+from local_cluster import (
+    Autoscaler, Backend, LoadBalancer, load_container, load_hpa, read_body, read_head
+)
+
+
+def test_manifests_are_read():
+    policy = load_hpa()
+    assert (policy["min_replicas"], policy["max_replicas"], policy["target_utilization"]) == (1, 3, 50)
+    assert policy["scaleDown"]["stabilizationWindowSeconds"] == 60
+    assert {p["type"] for p in policy["scaleUp"]["policies"]} == {"Percent", "Pods"}
+
+    container = load_container()
+    assert (container["cpu_request"], container["cpu_limit"]) == (0.1, 0.2)
+    assert container["env"]["ADMISSION_MAX_IN_FLIGHT"] == "8"
+
+
+def test_scale_up_limited_per_period():
+    """Test 100% or 2 replicas per 15s, whichever is more"""
+    autoscaler = Autoscaler({**load_hpa(), "max_replicas": 10}, cpu_request=0.1)
+
+    # 1 core wants 20 replicas at 0.05 cores each
+    assert autoscaler.desired_replicas(0, 1, 1, 1.0) == 3
+    assert autoscaler.desired_replicas(5, 3, 3, 1.0) == 3
+    assert autoscaler.desired_replicas(15, 3, 3, 1.0) == 6
+    assert autoscaler.desired_replicas(30, 6, 6, 1.0) == 10
+
+
+def test_scale_down_stabilized_then_halved():
+    autoscaler = Autoscaler({**load_hpa(), "max_replicas": 10}, cpu_request=0.1)
+    assert autoscaler.desired_replicas(0, 1, 1, 0.4) == 3
+    assert autoscaler.desired_replicas(15, 3, 3, 0.4) == 6
+
+    # idle from now on, but for 60s the window still holds a busy recommendation
+    for now in (30, 45, 60):
+        assert autoscaler.desired_replicas(now, 6, 6, 0.0) == 6
+    # then at most 50% per 15s
+    assert autoscaler.desired_replicas(75, 6, 6, 0.0) == 3
+    assert autoscaler.desired_replicas(80, 3, 3, 0.0) == 3
+    assert autoscaler.desired_replicas(90, 3, 3, 0.0) == 1
+
+
+def test_tolerance_and_unready_replicas():
+    autoscaler = Autoscaler(load_hpa(), cpu_request=0.1)
+    # within 10% of the target
+    assert autoscaler.desired_replicas(0, 2, 2, 0.105) == 2
+    # busy ready replica, but counting the starting ones as idle would mean fewer
+    assert autoscaler.desired_replicas(15, 3, 1, 0.09) == 3
+    # above maxReplicas, as after lowering it
+    autoscaler.max_replicas = 1
+    assert autoscaler.desired_replicas(30, 3, 3, 1.0) == 1
+
+
+async def fake_backend(name, chunked=False):
+    async def serve(reader, writer):
+        while True:
+            try:
+                _, headers, _ = await read_head(reader)
+            except asyncio.IncompleteReadError:
+                break
+            await read_body(reader, headers)
+            if chunked:
+                writer.write(b"HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n\r\n"
+                             b"1\r\n" + name + b"\r\n0\r\n\r\n")
+            else:
+                writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 1\r\n\r\n" + name)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    return server, Backend(server.sockets[0].getsockname()[1])
+
+
+async def send(port, count):
+    """Bodies of `count` POSTs over one keep-alive connection"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    bodies = []
+    for _ in range(count):
+        writer.write(b"POST /predict HTTP/1.1\r\nhost: x\r\ncontent-length: 2\r\n\r\n{}")
+        status_line, headers, _ = await read_head(reader)
+        bodies.append((int(status_line.split()[1]), await read_body(reader, headers)))
+    writer.close()
+    return bodies
+
+
+def test_proxy_balances_each_request():
+    responses = []
+
+    async def run():
+        (server_a, a), (server_b, b) = await fake_backend(b"A"), await fake_backend(b"B", True)
+        balancer = LoadBalancer(on_response=lambda backend, seconds, status: responses.append(status))
+        port = await balancer.start()
+        unavailable = await send(port, 1)
+        balancer.backends = [a, b]
+        bodies = await send(port, 4)
+        await balancer.close()
+        server_a.close()
+        server_b.close()
+        return unavailable, bodies
+
+    unavailable, bodies = asyncio.run(run())
+    assert unavailable[0][0] == 503
+    assert [body for _, body in bodies] == [b"A", b"1\r\nB\r\n0\r\n\r\n"] * 2
+    assert responses == [503, 200, 200, 200, 200]
+
+
+def test_least_connections_picks_least_busy():
+    balancer = LoadBalancer("least_connections")
+    balancer.backends = [Backend(1), Backend(2), Backend(3)]
+    balancer.backends[0].in_flight = 2
+    balancer.backends[1].in_flight = 1
+    balancer.backends[2].in_flight = 3
+    assert {balancer.choose().port for _ in range(4)} == {2}
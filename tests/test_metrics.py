@@ -0,0 +1,54 @@
+"""
+Unit tests for the Prometheus metrics
+"""
+
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, StageTimer
+
+
+def test_render_counter_and_gauge():
+    """Test series are rendered with escaped labels under HELP and TYPE lines"""
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests_total", "Requests", ("endpoint", "status")))
+    in_flight = registry.register(Gauge("in_flight", "In flight"))
+    requests.labels("/predict", 200).inc()
+    requests.labels("/predict", 200).inc(2)
+    requests.labels('/a"b', 404).inc()
+    in_flight.labels().inc()
+    in_flight.labels().dec()
+
+    assert registry.render().decode().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{endpoint="/a\\"b",status="404"} 1',
+        'requests_total{endpoint="/predict",status="200"} 3',
+        "# HELP in_flight In flight",
+        "# TYPE in_flight gauge",
+        "in_flight 0",
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.001, 0.01))
+    series = histogram.labels("parse")
+    for value in (0.0005, 0.001, 0.005, 2.0):
+        series.observe(value)
+
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{stage="parse",le="0.001"} 2',
+        'latency_seconds_bucket{stage="parse",le="0.01"} 3',
+        'latency_seconds_bucket{stage="parse",le="+Inf"} 4',
+        'latency_seconds_sum{stage="parse"} 2.0065',
+        'latency_seconds_count{stage="parse"} 4',
+    ]
+
+
+def test_stage_timer_records_each_stage_once():
+    histogram = Histogram("stage_seconds", "Stages", ("stage",))
+    series = {stage: histogram.labels(stage) for stage in ("parse", "inference")}
+    timer = StageTimer(series)
+    timer.mark("parse")
+    timer.restart()
+    timer.mark("inference")
+
+    assert [sum(s.counts) for s in series.values()] == [1, 1]
+    assert all(0 <= s.sum < 1 for s in series.values())
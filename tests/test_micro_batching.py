@@ -0,0 +1,64 @@
+"""
+Unit tests for the micro-batching scheduler
+"""
+
+import asyncio
+
+from micro_batching import MicroBatcher
+
+
+def fake_predict(X):
+    """Label each row by its first feature so results can be matched up"""
+    return X[:, 0].astype(int).astype(str), X[:, 1]
+
+
+def test_concurrent_requests_share_batches():
+    """Test concurrent submits are grouped and get their own result back"""
+    batcher = MicroBatcher(fake_predict, max_batch_size=16, max_wait_us=50_000)
+
+    async def run():
+        rows = [(float(i), i / 100, 0.0, 0.0) for i in range(40)]
+        results = await asyncio.gather(*(batcher.submit(row) for row in rows))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert results == [(str(i), i / 100) for i in range(40)]
+
+    stats = batcher.stats()
+    assert stats["requests"] == 40
+    assert stats["batches"] == 3
+    assert stats["batch_size_histogram"]["le_16"] == 2
+    assert sum(stats["batch_size_histogram"].values()) == 3
+
+
+def test_flushes_after_max_wait():
+    """Test a lone request is not held longer than the wait budget"""
+    batcher = MicroBatcher(fake_predict, max_batch_size=64, max_wait_us=1000)
+
+    async def run():
+        result = await asyncio.wait_for(batcher.submit((3.0, 0.5, 0.0, 0.0)), timeout=1)
+        await batcher.stop()
+        return result
+
+    assert asyncio.run(run()) == ("3", 0.5)
+    assert batcher.stats()["batch_size_histogram"]["le_1"] == 1
+
+
+def test_errors_reach_every_caller():
+    """Test a failing model call raises in each waiting request"""
+    def broken_predict(X):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(broken_predict, max_batch_size=4, max_wait_us=10_000)
+
+    async def run():
+        results = await asyncio.gather(
+            *(batcher.submit((1.0, 2.0, 3.0, 4.0)) for _ in range(3)),
+            return_exceptions=True
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
@@ -0,0 +1,57 @@
+"""
+Unit tests for the LRU prediction cache
+"""
+
+from prediction_cache import PredictionCache
+
+MODEL = object()
+
+
+def test_hit_and_miss_counters():
+    """Test a stored prediction is returned and counted as a hit"""
+    cache = PredictionCache(maxsize=4)
+    key = cache.key((5.1, 3.5, 1.4, 0.2))
+    assert cache.get(MODEL, key) is None
+    cache.put(MODEL, key, ('setosa', 1.0))
+    assert cache.get(MODEL, key) == ('setosa', 1.0)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_quantized_keys():
+    """Test rows that differ below the precision share an entry"""
+    cache = PredictionCache(precision=1)
+    assert cache.key((5.1, 3.5, 1.4, 0.2)) == cache.key((5.1000001, 3.49999, 1.4, 0.2))
+    assert cache.key((5.1, 3.5, 1.4, 0.2)) != cache.key((5.2, 3.5, 1.4, 0.2))
+
+
+def test_lru_eviction():
+    """Test the least recently used entry is evicted first"""
+    cache = PredictionCache(maxsize=2)
+    cache.put(MODEL, (1,), 'a')
+    cache.get(MODEL, (1,))
+    cache.put(MODEL, (2,), 'b')
+    cache.get(MODEL, (1,))
+    cache.put(MODEL, (3,), 'c')
+
+    assert cache.get(MODEL, (2,)) is None
+    assert cache.get(MODEL, (1,)) == 'a'
+    assert cache.get(MODEL, (3,)) == 'c'
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_model_change_clears_cache():
+    """Test entries from a previous model are never served"""
+    cache = PredictionCache()
+    old_model, new_model = object(), object()
+    cache.get(old_model, (1,))
+    cache.put(old_model, (1,), 'old')
+
+    assert cache.get(new_model, (1,)) is None
+    cache.put(old_model, (1,), 'stale')
+    assert cache.get(new_model, (1,)) is None
+    assert cache.stats()["size"] == 0
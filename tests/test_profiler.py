@@ -0,0 +1,68 @@
+"""
+Unit tests for the sampling profiler
+"""
+
+import threading
+import time
+
+from profiler import cpu_sampling, sample
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=spin, args=(stop,), name="busy")
+    thread.start()
+    return stop, thread
+
+
+def test_wall_sampling_finds_busy_thread():
+    """Test the spinning function is the hottest one and stacks are collapsed"""
+    stop, thread = busy_thread()
+    try:
+        profile = sample(0.2, 0.001)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profile.clock == "wall"
+    assert profile.samples > 10
+    assert profile.top(1)[0]["function"].startswith("spin (test_profiler.py:")
+
+    line = profile.collapsed().splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert stack.startswith("busy;") and int(count) > 0
+
+
+def test_idle_threads_are_left_out():
+    """Test threads blocked waiting are only recorded with include_idle"""
+    event = threading.Event()
+    waiter = threading.Thread(target=event.wait, name="waiter")
+    waiter.start()
+    try:
+        quiet = sample(0.02, 0.005)
+        everything = sample(0.02, 0.005, include_idle=True)
+    finally:
+        event.set()
+        waiter.join()
+
+    assert not any(stack[0] == "waiter" for stack in quiet.stacks)
+    assert any(stack[0] == "waiter" for stack in everything.stacks)
+
+
+def test_cpu_sampling_interrupts_main_thread():
+    """Test SIGPROF samples land in code running on the main thread"""
+    with cpu_sampling(0.001) as sampler:
+        deadline = time.process_time() + 0.1
+        while time.process_time() < deadline:
+            sum(range(1000))
+    profile = sampler.profile()
+
+    assert profile.clock == "cpu"
+    assert profile.samples > 10
+    assert all(stack[0] == "MainThread" for stack in profile.stacks)
+    assert profile.top(1)[0]["function"].startswith("test_cpu_sampling_interrupts_main_thread")
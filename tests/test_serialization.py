@@ -0,0 +1,119 @@
+"""
+Unit tests for batch request/response encoding
+"""
+
+import io
+import json
+
+import pytest
+import numpy as np
+
+from serialization import (
+    accepts_gzip, decode_features, encode_json, encode_predictions, prediction_dtype
+)
+
+
+def npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_decode_raw_rows(dtype):
+    """Test raw rows are viewed without copying"""
+    X = np.arange(12, dtype=dtype).reshape(3, 4)
+    body = X.astype(X.dtype.newbyteorder("<")).tobytes()
+    decoded, is_npy = decode_features(body, dtype)
+
+    assert not is_npy
+    assert np.array_equal(decoded, X)
+    assert not decoded.flags.owndata
+
+
+@pytest.mark.parametrize("dtype", ["<f4", "<f8"])
+def test_decode_npy(dtype):
+    """Test .npy payloads are detected and read at their header offset"""
+    X = np.random.default_rng(0).random((5, 4)).astype(dtype)
+    decoded, is_npy = decode_features(npy_bytes(X))
+
+    assert is_npy
+    assert decoded.dtype == np.dtype(dtype)
+    assert np.array_equal(decoded, X)
+
+
+@pytest.mark.parametrize("body", [
+    b"\x00" * 15,
+    npy_bytes(np.zeros((3, 5), dtype="<f4")),
+    npy_bytes(np.zeros((3, 4), dtype="<i4")),
+    npy_bytes(np.asfortranarray(np.zeros((3, 4), dtype="<f8"))),
+    npy_bytes(np.zeros((3, 4), dtype="<f4"))[:-4],
+])
+def test_decode_rejects_bad_bodies(body):
+    """Test wrong sizes, shapes, dtypes and layouts raise ValueError"""
+    with pytest.raises(ValueError):
+        decode_features(body)
+
+
+def test_decode_rejects_unknown_dtype():
+    with pytest.raises(ValueError):
+        decode_features(b"\x00" * 16, "int8")
+
+
+def test_encode_predictions_round_trip():
+    """Test raw and .npy responses decode to the same records"""
+    class_index = np.array([0, 2, 1])
+    confidence = np.array([1.0, 0.5, 0.75])
+    dtype = prediction_dtype(np.dtype("<f4"))
+
+    raw = np.frombuffer(encode_predictions(class_index, confidence, np.dtype("<f4")), dtype=dtype)
+    npy = np.load(io.BytesIO(encode_predictions(class_index, confidence, np.dtype("<f4"), as_npy=True)))
+
+    for records in (raw, npy):
+        assert records["class_index"].tolist() == [0, 2, 1]
+        assert records["confidence"].tolist() == [1.0, 0.5, 0.75]
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.8", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("identity", False),
+    ("", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_encode_json_layouts():
+    """Test the three JSON layouts encode the same predictions"""
+    class_index = np.array([2, 0])
+    confidence = np.array([0.5, 1.0])
+    classes = np.array(['setosa', 'versicolor', 'virginica'], dtype=object)
+
+    assert json.loads(encode_json(class_index, confidence, classes)) == {"predictions": [
+        {"species": "virginica", "confidence": 0.5},
+        {"species": "setosa", "confidence": 1.0},
+    ]}
+    assert json.loads(encode_json(class_index, confidence, classes, "columnar")) == {
+        "species": ["virginica", "setosa"], "confidence": [0.5, 1.0]
+    }
+    assert json.loads(encode_json(class_index, confidence, classes, "indexed")) == {
+        "classes": ["setosa", "versicolor", "virginica"],
+        "class_index": [2, 0],
+        "confidence": [0.5, 1.0],
+    }
+    with pytest.raises(ValueError):
+        encode_json(class_index, confidence, classes, "xml")
+
+
+def test_dumps_without_orjson(monkeypatch):
+    """Test the stdlib fallback produces the same JSON"""
+    import serialization
+    class_index = np.array([1])
+    confidence = np.array([0.75])
+    classes = np.array(['setosa', 'versicolor'], dtype=object)
+    fast = encode_json(class_index, confidence, classes)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert json.loads(encode_json(class_index, confidence, classes)) == json.loads(fast)
@@ -0,0 +1,136 @@
+"""
+Unit tests for the compiled decision tree engine
+"""
+
+import glob
+import warnings
+
+import pytest
+import joblib
+import numpy as np
+from sklearn.datasets import load_iris
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from tree_engine import CompiledTree, DecisionGrid, SklearnEngine, build_engine, save_compiled
+
+
+def load_models():
+    """Trees of several depths, including the committed poisoned variants"""
+    X, y = load_iris(return_X_y=True)
+    labels = np.array(['setosa', 'versicolor', 'virginica'])[y]
+    models = [
+        DecisionTreeClassifier(max_depth=depth, random_state=42).fit(X, labels)
+        for depth in (1, 3, 10)
+    ]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        models += [joblib.load(path) for path in sorted(glob.glob('models/poisoned/*.joblib'))]
+    return models
+
+
+@pytest.fixture(params=load_models(), ids=lambda m: f"depth{m.get_depth()}-{m.tree_.node_count}")
+def model(request):
+    return request.param
+
+
+@pytest.fixture(params=["tree", "grid", "saved"])
+def make_engine(request, tmp_path):
+    """Build the tree walker, the decision-region lookup table, or the
+    tree walker read back from a compiled tree file"""
+    def make(model):
+        if request.param == "saved":
+            save_compiled(model, tmp_path / "model.npz")
+            tree, metadata = CompiledTree.load(tmp_path / "model.npz")
+            assert metadata["model_type"] == "DecisionTreeClassifier"
+            return tree
+        tree = CompiledTree.from_model(model)
+        return tree if request.param == "tree" else DecisionGrid(tree)
+    return make
+
+
+def random_rows(model, n=2000, seed=0):
+    """Random rows plus rows sitting exactly on and next to every threshold"""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 8, size=(n, model.n_features_in_))
+    split = model.tree_.feature >= 0
+    for feature, threshold in zip(model.tree_.feature[split], model.tree_.threshold[split]):
+        for value in (threshold, np.nextafter(threshold, np.inf), np.nextafter(threshold, -np.inf)):
+            row = X[rng.integers(n)].copy()
+            row[feature] = value
+            X = np.vstack([X, row])
+    return X
+
+
+def sklearn_predict(model, X):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        proba = model.predict_proba(X)
+        return model.predict(X), proba.max(axis=1)
+
+
+def test_vectorized_matches_sklearn(model, make_engine):
+    """Test batch path reproduces predict and predict_proba exactly"""
+    X = random_rows(model)
+    engine = make_engine(model)
+    species, confidence = engine.predict(X)
+    expected_species, expected_confidence = sklearn_predict(model, X)
+    assert species.tolist() == expected_species.tolist()
+    assert np.array_equal(confidence, expected_confidence)
+
+
+def test_scalar_matches_sklearn(model, make_engine):
+    """Test single-row path reproduces sklearn exactly"""
+    X = random_rows(model, n=200)
+    engine = make_engine(model)
+    expected_species, expected_confidence = sklearn_predict(model, X)
+    for row, species, confidence in zip(X.tolist(), expected_species, expected_confidence):
+        assert engine.predict_one(row) == (species, confidence)
+
+
+def test_missing_values_match_sklearn(model, make_engine):
+    """Test NaN features follow the same missing-value branch as sklearn"""
+    X = random_rows(model, n=300)
+    X[::3, 2] = np.nan
+    X[::7, 0] = np.nan
+    engine = make_engine(model)
+    species, confidence = engine.predict(X)
+    expected_species, expected_confidence = sklearn_predict(model, X)
+    assert species.tolist() == expected_species.tolist()
+    assert np.array_equal(confidence, expected_confidence)
+    assert engine.predict_one(X[0].tolist()) == (expected_species[0], expected_confidence[0])
+
+
+def test_rejects_wrong_shape_and_infinity(model, make_engine):
+    """Test invalid input raises ValueError like sklearn"""
+    engine = make_engine(model)
+    with pytest.raises(ValueError):
+        engine.predict_one([1.0, 2.0, 3.0])
+    with pytest.raises(ValueError):
+        engine.predict(np.ones((2, 5)))
+    with pytest.raises(ValueError):
+        engine.predict_one([1.0, np.inf, 3.0, 4.0])
+
+
+def test_grid_size_limit(model):
+    """Test grids over the cell limit fall back to walking the tree"""
+    assert isinstance(build_engine(model), CompiledTree)
+    grid = build_engine(model, min_grid_depth=0)
+    assert isinstance(grid, DecisionGrid)
+    assert grid.n_cells == np.prod([len(edges) + 1 for edges in grid.edges])
+
+    engine = build_engine(model, max_grid_cells=grid.n_cells - 1, min_grid_depth=0)
+    assert isinstance(engine, CompiledTree)
+    with pytest.raises(ValueError):
+        DecisionGrid(engine, max_cells=grid.n_cells - 1)
+
+
+def test_build_engine_fallback():
+    """Test non-tree estimators are served through sklearn"""
+    X, y = load_iris(return_X_y=True)
+    model = LogisticRegression(max_iter=500).fit(X, y)
+    engine = build_engine(model)
+    assert isinstance(engine, SklearnEngine)
+    species, confidence = engine.predict(X[:5])
+    assert species.tolist() == model.predict(X[:5]).tolist()
+    assert engine.predict_one(X[0].tolist())[0] == model.predict(X[:1])[0]
@@ -0,0 +1,81 @@
+"""
+Unit tests for the load test workload profiles
+"""
+
+from collections import Counter
+import glob
+import json
+import os
+
+import pytest
+
+from workload import Workload, load_profile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_workload(seed=1, **overrides):
+    profile = {
+        "seed": 0,
+        "datasets": ["data/poisoned/*.csv"],
+        "jitter": 0.05,
+        "duplicate_rate": 0.3,
+        "duplicate_window": 1000,
+        "endpoints": [
+            {"path": "/predict", "weight": 3},
+            {"path": "/predict/batch", "weight": 1, "batch_sizes": {"2": 1, "50": 1}},
+        ],
+        **overrides,
+    }
+    return Workload(profile, seed, base_dir=ROOT)
+
+
+def test_same_seed_replays_same_requests():
+    """Test a seed fully determines the request stream"""
+    assert make_workload(seed=7).requests(200) == make_workload(seed=7).requests(200)
+    assert make_workload(seed=7).requests(200) != make_workload(seed=8).requests(200)
+
+
+def test_endpoint_mix_and_batch_sizes():
+    """Test endpoints follow their weights and batches their size distribution"""
+    requests = make_workload().requests(4000)
+    paths = Counter(request.path for request in requests)
+    assert paths["/predict"] / len(requests) == pytest.approx(0.75, abs=0.03)
+
+    for request in requests:
+        body = json.loads(request.body)
+        if request.path == "/predict":
+            assert request.rows == 1 and set(body) == {
+                "sepal_length", "sepal_width", "petal_length", "petal_width"
+            }
+        else:
+            assert request.rows in (2, 50) and len(body["samples"]) == request.rows
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.25, 0.8])
+def test_duplicate_rate_controls_repeats(rate):
+    """Test only the duplicate knob makes single-prediction payloads repeat"""
+    workload = make_workload(duplicate_rate=rate, endpoints=[{"path": "/predict", "weight": 1}])
+    bodies = [request.body for request in workload.requests(3000)]
+    repeated = 1 - len(set(bodies)) / len(bodies)
+    assert repeated == pytest.approx(rate, abs=0.03)
+
+
+def test_shipped_profiles_load():
+    for path in glob.glob(os.path.join(ROOT, "workloads", "*.json")):
+        profile = load_profile(path)
+        assert Workload(profile, base_dir=ROOT).requests(5)
+
+
+def test_invalid_profiles_are_rejected(tmp_path):
+    path = tmp_path / "profile.json"
+    path.write_text(json.dumps({"endpoints": [{"path": "/predict/batch", "weight": 1}]}))
+    with pytest.raises(ValueError, match="batch_sizes"):
+        load_profile(path)
+
+    path.write_text(json.dumps({"duplicate_rate": 1.5}))
+    with pytest.raises(ValueError, match="duplicate_rate"):
+        load_profile(path)
+
+    with pytest.raises(ValueError, match="No dataset"):
+        make_workload(datasets=["data/missing/*.csv"])
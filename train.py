@@ -9,12 +9,16 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeClassifier
 from sklearn import metrics
+import argparse
 import joblib
 import os
 
+from dataset import load_frame
+from histogram_tree import CHUNK_ROWS, HistogramTreeTrainer, csv_chunks
+
 def load_data(data_path='data/data.csv'):
-    """Load IRIS dataset"""
-    data = pd.read_csv(data_path)
+    """Load IRIS dataset (parsed once, then memory-mapped from the cache)"""
+    data = load_frame(data_path)
     return data
 
 def prepare_features(data):
@@ -23,12 +27,32 @@ def prepare_features(data):
     y = data['species']
     return X, y
 
-def train_model(X_train, y_train, max_depth=3, random_state=42):
+def train_model(X_train, y_train, max_depth=3, random_state=42, min_samples_split=2,
+                min_samples_leaf=1):
     """Train Decision Tree classifier"""
-    model = DecisionTreeClassifier(max_depth=max_depth, random_state=random_state)
+    model = DecisionTreeClassifier(
+        max_depth=max_depth, min_samples_split=min_samples_split,
+        min_samples_leaf=min_samples_leaf, random_state=random_state
+    )
     model.fit(X_train, y_train)
     return model
 
+def train_model_out_of_core(data_path='data/data.csv', max_depth=3, min_samples_split=2,
+                            min_samples_leaf=1, chunk_rows=CHUNK_ROWS, random_state=42):
+    """Train Decision Tree from CSV chunks with bounded memory (see histogram_tree.py)
+
+    Holds out 30% of the rows like main() and returns the model and its
+    accuracy on them.
+    """
+    trainer = HistogramTreeTrainer(
+        max_depth=max_depth, min_samples_split=min_samples_split,
+        min_samples_leaf=min_samples_leaf, holdout=0.3, chunk_rows=chunk_rows,
+        random_state=random_state
+    )
+    trainer.fit(csv_chunks(data_path, chunk_rows=chunk_rows))
+    print(f"Training samples: {trainer.n_train_}, Test samples: {trainer.n_holdout_}")
+    return trainer.to_sklearn(), trainer.holdout_accuracy_
+
 def evaluate_model(model, X_test, y_test):
     """Evaluate model performance"""
     predictions = model.predict(X_test)
@@ -41,10 +65,40 @@ def save_model(model, model_path='models/iris_model.joblib'):
     joblib.dump(model, model_path)
     print(f"Model saved to {model_path}")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the IRIS classifier")
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="stream the CSV in chunks and train from histograms, for data larger than RAM")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"rows per chunk with --out-of-core (default: {CHUNK_ROWS})")
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--min-samples-split", type=int, default=2)
+    parser.add_argument("--min-samples-leaf", type=int, default=1)
+    return parser.parse_args(argv)
+
+def main_out_of_core(args):
+    """Training pipeline for datasets larger than memory"""
+    print(f"Training model out of core on {args.data}...")
+    model, accuracy = train_model_out_of_core(
+        args.data, max_depth=args.max_depth, min_samples_split=args.min_samples_split,
+        min_samples_leaf=args.min_samples_leaf, chunk_rows=args.chunk_rows
+    )
+    print(f"Model Accuracy: {accuracy:.3f}")
+    
+    print("Saving model...")
+    save_model(model)
+    
+    return model, accuracy
+
+def main(argv=None):
     """Main training pipeline"""
+    args = parse_args(argv)
+    if args.out_of_core:
+        return main_out_of_core(args)
+
     print("Loading data...")
-    data = load_data()
+    data = load_data(args.data)
     
     print("Preparing features...")
     X, y = prepare_features(data)
@@ -58,7 +112,10 @@ def main():
     print(f"Training samples: {len(X_train)}, Test samples: {len(X_test)}")
     
     print("Training model...")
-    model = train_model(X_train, y_train)
+    model = train_model(
+        X_train, y_train, max_depth=args.max_depth,
+        min_samples_split=args.min_samples_split, min_samples_leaf=args.min_samples_leaf
+    )
     
     print("Evaluating model...")
     accuracy, predictions = evaluate_model(model, X_test, y_test)
@@ -6,7 +6,7 @@ Week 5 - MLOps Assignment
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeClassifier
 from sklearn import metrics
 import mlflow
@@ -14,12 +14,15 @@ import mlflow.sklearn
 import os
 from datetime import datetime
 
+from dataset import load_frame
+from hyperparameter_search import candidates, run_search
+
 # Set MLflow tracking URI (local for now)
 mlflow.set_tracking_uri("file:./mlruns")
 
 def load_data(data_path='data/data.csv'):
-    """Load IRIS dataset"""
-    data = pd.read_csv(data_path)
+    """Load IRIS dataset (parsed once, then memory-mapped from the cache)"""
+    data = load_frame(data_path)
     return data
 
 def prepare_features(data):
@@ -30,8 +33,8 @@ def prepare_features(data):
 
 def train_model_with_mlflow(X_train, y_train, X_test, y_test, 
                             max_depth=3, min_samples_split=2, 
-                            min_samples_leaf=1, random_state=42):
-    """Train Decision Tree with MLflow logging"""
+                            min_samples_leaf=1, random_state=42, **extra_params):
+    """Train Decision Tree with MLflow logging; extra_params go to the tree as well"""
     
     # Start MLflow run
     with mlflow.start_run(run_name=f"dt_depth{max_depth}"):
@@ -44,13 +47,16 @@ def train_model_with_mlflow(X_train, y_train, X_test, y_test,
         mlflow.log_param("model_type", "DecisionTree")
         mlflow.log_param("train_samples", len(X_train))
         mlflow.log_param("test_samples", len(X_test))
+        for name, value in extra_params.items():
+            mlflow.log_param(name, value)
         
         # Train model
         model = DecisionTreeClassifier(
             max_depth=max_depth,
             min_samples_split=min_samples_split,
             min_samples_leaf=min_samples_leaf,
-            random_state=random_state
+            random_state=random_state,
+            **extra_params
         )
         model.fit(X_train, y_train)
         
@@ -86,8 +92,15 @@ def train_model_with_mlflow(X_train, y_train, X_test, y_test,
         
         return model, test_accuracy
 
-def hyperparameter_tuning_with_mlflow(X_train, y_train, X_test, y_test):
-    """Run multiple experiments with different hyperparameters"""
+def hyperparameter_tuning_with_mlflow(X_train, y_train, X_test, y_test, space=None,
+                                      workers=None, halving=False, eta=3):
+    """
+    Search hyperparameters in parallel, then train and register the best
+
+    `space` is a search space as in hyperparameter_search.py; without
+    one the six combinations below are tried. Every worker logs its share
+    of the candidates as a run nested under one "parallel_search" run.
+    """
     
     # Set experiment name
     mlflow.set_experiment("iris_hyperparameter_tuning")
@@ -104,32 +117,52 @@ def hyperparameter_tuning_with_mlflow(X_train, y_train, X_test, y_test):
         {"max_depth": 5, "min_samples_split": 5, "min_samples_leaf": 2},
         {"max_depth": 10, "min_samples_split": 10, "min_samples_leaf": 4},
     ]
-    
-    results = []
-    
-    for i, params in enumerate(param_combinations, 1):
-        print(f"\n🧪 Experiment {i}/{len(param_combinations)}")
-        print(f"   Parameters: {params}")
-        
-        model, accuracy = train_model_with_mlflow(
-            X_train, y_train, X_test, y_test,
-            max_depth=params["max_depth"],
-            min_samples_split=params["min_samples_split"],
-            min_samples_leaf=params["min_samples_leaf"]
+    if space is not None:
+        param_combinations = candidates(space)
+    print(f"   {len(param_combinations)} candidates, {workers or os.cpu_count()} workers"
+          f"{', successive halving' if halving else ''}")
+    
+    with mlflow.start_run(run_name="parallel_search") as parent:
+        mlflow.log_params({
+            "candidates": len(param_combinations),
+            "workers": workers or os.cpu_count(),
+            "halving": halving,
+            "eta": eta,
+        })
+        tracking = {
+            "uri": mlflow.get_tracking_uri(),
+            "experiment_id": parent.info.experiment_id,
+            "parent_run_id": parent.info.run_id,
+        }
+        outcome = run_search(
+            param_combinations, X_train, y_train, X_test, y_test,
+            workers=workers, halving=halving, eta=eta, tracking=tracking
         )
-        
-        results.append({
-            "params": params,
-            "accuracy": accuracy
+        mlflow.log_metrics({
+            "best_accuracy": outcome["results"][0]["accuracy"],
+            "search_seconds": outcome["seconds"],
         })
     
+    results = [
+        {"params": result["params"], "accuracy": result["accuracy"]}
+        for result in outcome["results"]
+    ]
+    
     print("\n" + "="*60)
     print("🎯 All experiments completed!")
     
-    # Find best parameters
-    best_result = max(results, key=lambda x: x["accuracy"])
+    # Train, log and register the best parameters on the full training set
+    best_result = results[0]
     print(f"\n🏆 Best Parameters: {best_result['params']}")
     print(f"🏆 Best Accuracy: {best_result['accuracy']:.3f}")
+    # Parameters the space leaves out keep the tree's defaults, as in the
+    # search, rather than train_model_with_mlflow's
+    defaults = DecisionTreeClassifier().get_params()
+    best_params = {
+        name: defaults[name] for name in ("max_depth", "min_samples_split", "min_samples_leaf")
+    }
+    best_params.update(best_result["params"])
+    train_model_with_mlflow(X_train, y_train, X_test, y_test, **best_params)
     
     return results
 
@@ -13,6 +13,8 @@ import mlflow.sklearn
 import joblib
 import os
 
+from dataset import load_frame
+
 def train_model_with_poisoning(data_path: str, poison_level: str, experiment_name: str = "iris_data_poisoning"):
     """
     Train model on potentially poisoned data and log to MLflow
@@ -26,7 +28,7 @@ def train_model_with_poisoning(data_path: str, poison_level: str, experiment_nam
     mlflow.set_experiment(experiment_name)
     
     # Load data
-    data = pd.read_csv(data_path)
+    data = load_frame(data_path)
     print(f"\n{'='*70}")
     print(f"📊 Training on: {poison_level} poisoned data")
     print(f"   Data: {data_path}")
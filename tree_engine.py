@@ -0,0 +1,348 @@
+"""
+Compiled Decision Tree Inference Engine
+Reads a fitted DecisionTreeClassifier once and predicts without sklearn
+"""
+
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+TREE_LEAF = -1
+
+# Decision grids larger than this fall back to walking the tree
+DEFAULT_MAX_GRID_CELLS = 262144
+
+# Below this depth walking the tree is cheaper than one binary search per
+# feature (measured on the iris trees: ~1.4us per grid lookup against
+# ~0.6us + 0.1us per level for the scalar walk)
+DEFAULT_MIN_GRID_DEPTH = 12
+
+
+class Engine:
+    """
+    Common interface of the inference engines
+
+    Subclasses implement predict_one(row) -> (label, confidence) and
+    predict_index(X) -> (class indices, confidences).
+    """
+
+    def predict(self, X):
+        """Predict labels and confidences for an (N, n_features) array"""
+        class_index, confidence = self.predict_index(X)
+        return self.classes_.take(class_index), confidence
+
+
+# Arguments of CompiledTree, as stored by save_compiled
+TREE_ARRAYS = (
+    "feature", "threshold", "children_left", "children_right",
+    "missing_go_to_left", "value", "classes", "n_features_in",
+)
+
+
+def tree_arrays(model):
+    """The arrays CompiledTree needs from a fitted DecisionTreeClassifier"""
+    tree = model.tree_
+    if tree.n_outputs != 1:
+        raise ValueError("Only single-output classification trees are supported")
+
+    nodes = tree.__getstate__()["nodes"]
+    if "missing_go_to_left" in nodes.dtype.names:
+        missing_go_to_left = nodes["missing_go_to_left"]
+    else:
+        missing_go_to_left = np.zeros(tree.node_count, dtype=bool)
+
+    return {
+        "feature": tree.feature,
+        "threshold": tree.threshold,
+        "children_left": tree.children_left,
+        "children_right": tree.children_right,
+        "missing_go_to_left": missing_go_to_left,
+        "value": tree.value[:, 0, :len(model.classes_)],
+        "classes": model.classes_,
+        "n_features_in": model.n_features_in_,
+    }
+
+
+def save_compiled(model, path, **metadata):
+    """
+    Write the flattened tree of `model` to an uncompressed .npz file
+
+    `metadata` entries (strings, numbers or arrays) are stored alongside
+    and handed back by CompiledTree.load.
+    """
+    arrays = tree_arrays(model)
+    if arrays["classes"].dtype == object:
+        # Object arrays would need pickle to load again
+        arrays["classes"] = arrays["classes"].astype(str)
+    np.savez(path, **arrays, model_type=type(model).__name__,
+             feature_names=np.asarray(getattr(model, "feature_names_in_", []), dtype=str),
+             **metadata)
+
+
+class CompiledTree(Engine):
+    """
+    Flattened copy of a fitted classification tree
+
+    Label and confidence come out of a single traversal. Inputs are rounded
+    to float32 before comparing against the float64 thresholds, exactly as
+    sklearn's tree does, so results are identical to predict/predict_proba.
+    """
+
+    def __init__(self, feature, threshold, children_left, children_right,
+                 missing_go_to_left, value, classes, n_features_in):
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features_in)
+
+        feature = np.asarray(feature, dtype=np.intp)
+        threshold = np.asarray(threshold, dtype=np.float64)
+        children_left = np.asarray(children_left, dtype=np.intp)
+        children_right = np.asarray(children_right, dtype=np.intp)
+        missing_go_to_left = np.asarray(missing_go_to_left, dtype=bool)
+        value = np.asarray(value, dtype=np.float64)
+
+        # Same normalisation as DecisionTreeClassifier.predict_proba
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba = value / normalizer
+        class_index = proba.argmax(axis=1)
+
+        self.node_count = len(feature)
+        self.class_index = class_index
+        self.confidence = proba[np.arange(self.node_count), class_index]
+        self.max_depth = self._depth(children_left, children_right)
+
+        # Vectorized path: leaves point at themselves so every row can
+        # take max_depth steps without masking; children[2 * node + 1]
+        # is the right child
+        nodes = np.arange(self.node_count)
+        is_leaf = children_left == TREE_LEAF
+        self.is_leaf = is_leaf
+        self.feature = np.where(is_leaf, 0, feature)
+        self.threshold = threshold
+        self.missing_go_to_right = ~missing_go_to_left
+        self.children = np.stack([
+            np.where(is_leaf, nodes, children_left),
+            np.where(is_leaf, nodes, children_right),
+        ], axis=1).ravel()
+
+        # Scalar path: plain Python lists index far faster than ndarrays
+        self._feature = feature.tolist()
+        self._threshold = threshold.tolist()
+        self._left = children_left.tolist()
+        self._right = children_right.tolist()
+        self._labels = self.classes_.take(class_index).tolist()
+        self._confidence = self.confidence.tolist()
+
+    @classmethod
+    def from_model(cls, model):
+        """Flatten the tree_ arrays of a fitted DecisionTreeClassifier"""
+        return cls(**tree_arrays(model))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a tree written by save_compiled
+
+        Returns (CompiledTree, metadata dict). Only numpy is needed, so
+        serving from this file skips importing sklearn altogether.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in TREE_ARRAYS}
+            metadata = {
+                name: data[name].item() if data[name].ndim == 0 else data[name]
+                for name in data.files if name not in TREE_ARRAYS
+            }
+        return cls(**arrays), metadata
+
+    @staticmethod
+    def _depth(children_left, children_right):
+        depth = 0
+        level = [0]
+        while True:
+            level = [child
+                     for node in level if children_left[node] != TREE_LEAF
+                     for child in (children_left[node], children_right[node])]
+            if not level:
+                return depth
+            depth += 1
+
+    def _check_row(self, row):
+        if len(row) != self.n_features_in_:
+            raise ValueError(
+                f"X has {len(row)} features, but the model expects {self.n_features_in_}"
+            )
+
+    def predict_one(self, row):
+        """Predict (label, confidence) for a single sample"""
+        self._check_row(row)
+        x = array('f', row)
+        total = sum(x)
+        if total - total != 0:
+            # NaN or infinity: let the vectorized path route or reject it
+            labels, confidence = self.predict([x])
+            return labels[0], float(confidence[0])
+
+        feature = self._feature
+        threshold = self._threshold
+        left = self._left
+        right = self._right
+
+        node = 0
+        while left[node] != TREE_LEAF:
+            if x[feature[node]] <= threshold[node]:
+                node = left[node]
+            else:
+                node = right[node]
+        return self._labels[node], self._confidence[node]
+
+    def leaves(self, X):
+        """Return the leaf index reached by every row of a 2D float array"""
+        X = np.ascontiguousarray(X)
+        flat = X.ravel()
+        offsets = np.arange(len(X)) * X.shape[1]
+        has_nan = np.isnan(flat).any()
+
+        node = np.zeros(len(X), dtype=np.intp)
+        for _ in range(self.max_depth):
+            values = flat[offsets + self.feature[node]]
+            go_right = values > self.threshold[node]
+            if has_nan:
+                go_right |= np.isnan(values) & self.missing_go_to_right[node]
+            node = self.children[2 * node + go_right]
+        return node
+
+    def predict_index(self, X):
+        """
+        Predict class indices and confidences for an (N, n_features) array
+
+        Walks all rows down the tree one level at a time.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Expected a 2D array, got {X.ndim}D")
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}"
+            )
+        if np.isinf(X).any():
+            raise ValueError("Input X contains infinity")
+
+        node = self.leaves(X)
+        return self.class_index[node], self.confidence[node]
+
+
+class DecisionGrid(Engine):
+    """
+    Lookup table of the tree's decision regions
+
+    A tree only ever compares each feature against its own few thresholds,
+    so those thresholds cut feature space into a grid in which every cell
+    ends in the same leaf. The leaf of every cell is computed once; a
+    prediction is then one binary search per feature plus a table lookup,
+    whatever the depth of the tree.
+    """
+
+    def __init__(self, tree, max_cells=DEFAULT_MAX_GRID_CELLS):
+        self.tree = tree
+        self.classes_ = tree.classes_
+        self.n_features_in_ = tree.n_features_in_
+
+        self.edges = [
+            np.unique(tree.threshold[~tree.is_leaf & (tree.feature == f)])
+            for f in range(self.n_features_in_)
+        ]
+        shape = [len(edges) + 1 for edges in self.edges]
+        self.n_cells = int(np.prod(shape, dtype=np.float64))
+        if self.n_cells > max_cells:
+            raise ValueError(
+                f"Decision grid needs {self.n_cells} cells, limit is {max_cells}"
+            )
+        self.strides = np.array(
+            [int(np.prod(shape[f + 1:])) for f in range(len(shape))], dtype=np.intp
+        )
+
+        # A threshold value is itself a point of the cell just left of it;
+        # +inf stands for the cell right of the last threshold
+        representatives = [np.append(edges, np.inf) for edges in self.edges]
+        points = np.stack(
+            [axis.ravel() for axis in np.meshgrid(*representatives, indexing='ij')],
+            axis=1
+        )
+        leaf = tree.leaves(points)
+        self.cell_class_index = tree.class_index[leaf]
+        self.cell_confidence = tree.confidence[leaf]
+
+        self._edges = [edges.tolist() for edges in self.edges]
+        self._strides = self.strides.tolist()
+        self._cell_labels = self.classes_.take(self.cell_class_index).tolist()
+        self._cell_confidence = self.cell_confidence.tolist()
+
+    def predict_one(self, row):
+        """Predict (label, confidence) for a single sample"""
+        self.tree._check_row(row)
+        x = array('f', row)
+        total = sum(x)
+        if total - total != 0:
+            return self.tree.predict_one(row)
+
+        cell = 0
+        for value, edges, stride in zip(x, self._edges, self._strides):
+            cell += bisect_left(edges, value) * stride
+        return self._cell_labels[cell], self._cell_confidence[cell]
+
+    def predict_index(self, X):
+        """Predict class indices and confidences for an (N, n_features) array"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_ or not np.isfinite(X).all():
+            # Shape errors and missing values are handled by the tree
+            return self.tree.predict_index(X)
+
+        cell = np.zeros(len(X), dtype=np.intp)
+        for f, (edges, stride) in enumerate(zip(self.edges, self.strides)):
+            cell += np.searchsorted(edges, X[:, f], side='left') * stride
+        return self.cell_class_index[cell], self.cell_confidence[cell]
+
+
+class SklearnEngine(Engine):
+    """Fallback engine for estimators that are not a single decision tree"""
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+
+    def predict_one(self, row):
+        probabilities = self.model.predict_proba(np.asarray([row], dtype=np.float64))[0]
+        best = probabilities.argmax()
+        return self.classes_[best], float(probabilities[best])
+
+    def predict_index(self, X):
+        probabilities = self.model.predict_proba(np.asarray(X, dtype=np.float64))
+        best = probabilities.argmax(axis=1)
+        return best, probabilities[np.arange(len(best)), best]
+
+
+def build_engine(model, max_grid_cells=DEFAULT_MAX_GRID_CELLS,
+                 min_grid_depth=DEFAULT_MIN_GRID_DEPTH):
+    """
+    Return the fastest engine that reproduces the model's predictions
+
+    Decision trees at least min_grid_depth deep get a DecisionGrid when it
+    fits in max_grid_cells, other trees a CompiledTree; anything else goes
+    through sklearn. `model` may also be an already compiled tree.
+    """
+    if isinstance(model, CompiledTree) or (
+        hasattr(model, "tree_") and hasattr(model, "classes_")
+    ):
+        try:
+            tree = model if isinstance(model, CompiledTree) else CompiledTree.from_model(model)
+        except ValueError:
+            return SklearnEngine(model)
+        if tree.max_depth < min_grid_depth:
+            return tree
+        try:
+            return DecisionGrid(tree, max_grid_cells)
+        except ValueError:
+            return tree
+    return SklearnEngine(model)
@@ -0,0 +1,142 @@
+"""
+Workload Profiles for Load Testing
+Replayable request streams sampled from the real IRIS datasets
+
+A profile is a JSON file such as workloads/mixed.json:
+
+    {
+      "seed": 42,
+      "datasets": ["data/data.csv", "data/poisoned/*.csv"],
+      "jitter": 0.05,
+      "duplicate_rate": 0.2,
+      "endpoints": [
+        {"path": "/predict", "weight": 9},
+        {"path": "/predict/batch", "weight": 1,
+         "batch_sizes": {"10": 6, "100": 3, "1000": 1}}
+      ]
+    }
+
+Each request picks an endpoint by weight, and a batch size by weight for
+batch endpoints (paths ending in /batch). Each row is, with probability
+`duplicate_rate`, a copy of one of the last `duplicate_window` rows sent
+to the same endpoint (so that it can hit that endpoint's cache),
+otherwise a fresh dataset row moved by Gaussian noise of `jitter` times
+each feature's standard deviation, so that only duplicates can repeat a
+payload. The same profile and seed always give the same requests.
+"""
+
+from collections import deque, namedtuple
+import csv
+import glob
+import json
+import os
+import random
+import statistics
+
+FEATURE_NAMES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+DEFAULTS = {
+    "seed": 0,
+    "datasets": ["data/data.csv"],
+    "jitter": 0.0,
+    "duplicate_rate": 0.0,
+    "duplicate_window": 1000,
+    "endpoints": [{"path": "/predict", "weight": 1}],
+}
+
+Request = namedtuple("Request", ["path", "body", "rows"])
+
+
+def load_rows(patterns, base_dir="."):
+    """Feature rows of every CSV file matching `patterns`, relative to base_dir"""
+    rows = []
+    for pattern in patterns:
+        paths = sorted(glob.glob(os.path.join(base_dir, pattern)))
+        if not paths:
+            raise ValueError(f"No dataset matches {pattern!r}")
+        for path in paths:
+            # data/data.csv starts with a byte-order mark
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                for record in csv.DictReader(f):
+                    rows.append(tuple(float(record[name]) for name in FEATURE_NAMES))
+    return rows
+
+
+def load_profile(path):
+    """Read a profile file, filling in defaults and checking its fields"""
+    with open(path) as f:
+        profile = {**DEFAULTS, **json.load(f)}
+
+    if not 0 <= profile["duplicate_rate"] <= 1:
+        raise ValueError("duplicate_rate must be between 0 and 1")
+    if not profile["endpoints"]:
+        raise ValueError("A profile needs at least one endpoint")
+    for endpoint in profile["endpoints"]:
+        if endpoint["path"].endswith("/batch") and not endpoint.get("batch_sizes"):
+            raise ValueError(f"{endpoint['path']} needs batch_sizes")
+    return profile
+
+
+class Workload:
+    """Deterministic stream of requests drawn from a profile"""
+
+    def __init__(self, profile, seed=None, base_dir="."):
+        self.profile = profile
+        self.source = None
+        self.seed = profile["seed"] if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.rows = load_rows(profile["datasets"], base_dir)
+        self.noise = [
+            profile["jitter"] * statistics.pstdev(column) for column in zip(*self.rows)
+        ]
+        self.recent = {
+            endpoint["path"]: deque(maxlen=profile["duplicate_window"])
+            for endpoint in profile["endpoints"]
+        }
+
+        self.endpoints = profile["endpoints"]
+        self.endpoint_weights = [endpoint["weight"] for endpoint in self.endpoints]
+        self.batch_sizes = [
+            (
+                [int(size) for size in endpoint["batch_sizes"]],
+                list(endpoint["batch_sizes"].values())
+            )
+            if endpoint.get("batch_sizes") else None
+            for endpoint in self.endpoints
+        ]
+
+    @classmethod
+    def from_file(cls, path, seed=None, base_dir="."):
+        workload = cls(load_profile(path), seed, base_dir)
+        workload.source = path
+        return workload
+
+    def row(self, path):
+        """One feature row for `path`: a recent duplicate or a fresh jittered dataset row"""
+        recent = self.recent[path]
+        if recent and self.rng.random() < self.profile["duplicate_rate"]:
+            return self.rng.choice(recent)
+        base = self.rng.choice(self.rows)
+        row = tuple(
+            round(max(0.0, value + self.rng.gauss(0, noise)), 4) if noise else value
+            for value, noise in zip(base, self.noise)
+        )
+        recent.append(row)
+        return row
+
+    def next_request(self):
+        i = self.rng.choices(range(len(self.endpoints)), self.endpoint_weights)[0]
+        path = self.endpoints[i]["path"]
+        if self.batch_sizes[i] is None:
+            body = dict(zip(FEATURE_NAMES, self.row(path)))
+            return Request(path, json.dumps(body).encode(), 1)
+
+        sizes, weights = self.batch_sizes[i]
+        size = self.rng.choices(sizes, weights)[0]
+        samples = [dict(zip(FEATURE_NAMES, self.row(path))) for _ in range(size)]
+        return Request(path, json.dumps({"samples": samples}).encode(), size)
+
+    def requests(self, count):
+        """The next `count` requests, built up front so that encoding them
+        does not compete with sending them"""
+        return [self.next_request() for _ in range(count)]